@@ -0,0 +1,149 @@
+"""Online deviation detection for sensor readings
+
+Each sensor keeps an exponentially weighted mean and variance of its own
+readings plus a two-sided CUSUM of the standardized values. Scoring a
+reading touches only that state, so memory is constant per sensor and no
+history is re-read. Sudden spikes are caught by the z-score, slow drifts
+that stay inside the thresholds by the CUSUM.
+"""
+import math
+from datetime import datetime
+from typing import Dict, Optional
+
+class DetectorState:
+    """Running statistics for one sensor"""
+
+    __slots__ = ("count", "mean", "variance", "cusum_high", "cusum_low", "last_z", "last_value",
+                 "last_reading", "last_deviation")
+
+    def __init__(self, value: float, timestamp: datetime):
+        self.count = 1
+        self.mean = value
+        self.variance = 0.0
+        self.cusum_high = 0.0
+        self.cusum_low = 0.0
+        self.last_z = 0.0
+        self.last_value = value
+        self.last_reading = timestamp
+        self.last_deviation: Optional[datetime] = None
+
+class AnomalyDetector:
+    """EWMA z-score and CUSUM detectors, one per sensor
+
+    alpha weights the newest reading in the running mean and variance.
+    A reading deviates when its z-score exceeds z_threshold, or when the
+    CUSUM, accumulating z-scores beyond the slack cusum_k, exceeds
+    cusum_h. Nothing is reported during the first warmup readings of a
+    sensor, nor within cooldown seconds of its previous deviation.
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.05,
+        z_threshold: float = 4.0,
+        cusum_k: float = 0.5,
+        cusum_h: float = 8.0,
+        warmup: int = 30,
+        cooldown: float = 300.0
+    ):
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.cusum_k = cusum_k
+        self.cusum_h = cusum_h
+        self.warmup = warmup
+        self.cooldown = cooldown
+        self._states: Dict[str, DetectorState] = {}
+        self.deviations = 0
+
+    def update(self, sensor_id: str, value: float, timestamp: datetime) -> Optional[dict]:
+        """Score a reading against the sensor's history, then fold it in
+
+        Returns a description of the deviation when one should be
+        reported, otherwise None.
+        """
+        state = self._states.get(sensor_id)
+        if state is None:
+            self._states[sensor_id] = DetectorState(value, timestamp)
+            return None
+
+        # Score against the statistics before this reading
+        std = math.sqrt(state.variance)
+        z = (value - state.mean) / std if std > 1e-9 else 0.0
+
+        deviation = None
+        if state.count >= self.warmup:
+            # Only accumulate once the variance is settled, the huge
+            # z-scores of the first few readings would read as a drift
+            state.cusum_high = max(0.0, state.cusum_high + z - self.cusum_k)
+            state.cusum_low = max(0.0, state.cusum_low - z - self.cusum_k)
+            cusum = max(state.cusum_high, state.cusum_low)
+            if abs(z) > self.z_threshold:
+                kind = "spike"
+                probability = math.erf(abs(z) / math.sqrt(2))
+            elif cusum > self.cusum_h:
+                kind = "drift_up" if state.cusum_high > state.cusum_low else "drift_down"
+                probability = 1 - math.exp(-cusum / self.cusum_h)
+            else:
+                kind = None
+
+            if kind:
+                deviation = {
+                    "kind": kind,
+                    "value": value,
+                    "expected": round(state.mean, 4),
+                    "std": round(std, 4),
+                    "z_score": round(z, 2),
+                    "probability": round(probability * 100, 1)
+                }
+                # A detected shift starts accumulating from zero again
+                state.cusum_high = state.cusum_low = 0.0
+                cooling = (
+                    state.last_deviation is not None
+                    and (timestamp - state.last_deviation).total_seconds() < self.cooldown
+                )
+                if cooling:
+                    deviation = None
+                else:
+                    state.last_deviation = timestamp
+                    self.deviations += 1
+
+        # Incremental exponentially weighted mean and variance
+        diff = value - state.mean
+        increment = self.alpha * diff
+        state.mean += increment
+        state.variance = (1 - self.alpha) * (state.variance + diff * increment)
+        state.count += 1
+        state.last_z = z
+        state.last_value = value
+        state.last_reading = timestamp
+        return deviation
+
+    def state(self, sensor_id: str) -> Optional[dict]:
+        """Current detector state of a sensor"""
+        state = self._states.get(sensor_id)
+        if state is None:
+            return None
+        return {
+            "sensor_id": sensor_id,
+            "readings": state.count,
+            "warmed_up": state.count >= self.warmup,
+            "mean": round(state.mean, 4),
+            "std": round(math.sqrt(state.variance), 4),
+            "last_value": state.last_value,
+            "last_z_score": round(state.last_z, 2),
+            "cusum_high": round(state.cusum_high, 2),
+            "cusum_low": round(state.cusum_low, 2),
+            "cusum_limit": self.cusum_h,
+            "last_reading": state.last_reading,
+            "last_deviation": state.last_deviation
+        }
+
+    def clear(self):
+        """Forget every sensor, which then warms up again"""
+        self._states.clear()
+
+    def stats(self) -> dict:
+        return {
+            "sensors": len(self._states),
+            "deviations": self.deviations
+        }
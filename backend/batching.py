@@ -0,0 +1,146 @@
+"""Micro-batching between fast producers and a bulk writer
+
+Producers hand items over one at a time, a single writer task flushes
+them in batches. Items are flushed in the order they were put, so the
+writer sees each sensor's readings in time order.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List
+
+logger = logging.getLogger(__name__)
+
+class AsyncBatcher:
+    """Collect items into batches flushed by size or age
+
+    A batch is flushed once it holds batch_size items or its first item
+    has waited linger seconds. put() waits while max_pending items are
+    queued, so a producer that outruns the writer is slowed down instead
+    of growing memory; put_nowait() raises asyncio.QueueFull instead.
+
+    A flush that raises stops the writer rather than skipping the batch,
+    so a later batch is never flushed past a failed one. From then on
+    put() raises, waiting producers included, and stop() re-raises the
+    error; flush is expected to handle what it can retry itself.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[List], Awaitable],
+        batch_size: int = 1000,
+        linger: float = 0.05,
+        max_pending: int = 50000
+    ):
+        self.flush = flush
+        self.batch_size = batch_size
+        self.linger = linger
+        self._queue = asyncio.Queue(max_pending)
+        self._task = None
+        self._closed = False
+        self.error = None
+        self.flushed = 0
+        self.batches = 0
+        self.failed = 0
+        self.flush_seconds = 0.0
+
+    async def put(self, item):
+        self._check_open()
+        await self._put(item)
+
+    def put_nowait(self, item):
+        self._check_open()
+        self._queue.put_nowait(item)
+
+    def _check_open(self):
+        if self.error is not None:
+            raise RuntimeError("Batcher stopped after a failed flush") from self.error
+        if self._closed:
+            raise RuntimeError("Batcher is stopped")
+
+    async def _put(self, item):
+        """Queue an item, giving up if the writer stops while the queue is full"""
+        if self._task is None or not self._queue.full():
+            await self._queue.put(item)
+            return
+        putter = asyncio.ensure_future(self._queue.put(item))
+        await asyncio.wait([putter, self._task], return_when=asyncio.FIRST_COMPLETED)
+        if not putter.done():
+            putter.cancel()
+            self._check_open()
+        putter.result()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything already queued, then stop the writer"""
+        if self._task is None:
+            return
+        if not self._closed:
+            self._closed = True
+            await self._put(None)
+        # Raises the error that stopped the writer, if any
+        await self._task
+
+    async def _next_batch(self) -> List:
+        """Wait for one item, then gather more until the batch is full or lingered"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.linger
+        while len(batch) < self.batch_size and batch[-1] is not None:
+            # Take what is already queued before waiting for more
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            stopping = batch[-1] is None
+            if stopping:
+                batch.pop()
+            if batch:
+                await self._write(batch)
+            if stopping:
+                return
+
+    async def _write(self, batch: List):
+        started = time.perf_counter()
+        try:
+            await self.flush(batch)
+            self.flushed += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            self.error = e
+            self._closed = True
+            logger.error(f"Batch flush of {len(batch)} items failed, stopping the writer: {e}")
+            raise
+        finally:
+            self.batches += 1
+            self.flush_seconds += time.perf_counter() - started
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._queue.qsize(),
+            "max_pending": self._queue.maxsize,
+            "batch_size": self.batch_size,
+            "linger": self.linger,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "error": str(self.error) if self.error else None,
+            "batches": self.batches,
+            "avg_batch": round(self.flushed / self.batches, 1) if self.batches else 0.0,
+            "avg_flush_ms": round(self.flush_seconds / self.batches * 1000, 2) if self.batches else 0.0
+        }
@@ -0,0 +1,172 @@
+"""Lossy compression of stored sensor history
+
+Each sensor type can be given a method and a tolerance in the sensor's
+unit. A reading is only stored when the history cannot be rebuilt
+without it by linear interpolation between the stored points:
+
+    deadband        store when the value moves more than the tolerance
+                    away from the last stored value, together with the
+                    reading just before the move
+    swinging_door   store the end of the longest straight line that
+                    stays within the tolerance of every reading it skips
+
+A steady signal then stores a few points per max_interval instead of
+every sample. Each sensor keeps only its last stored point, the reading
+held back as the candidate end of the current line and the two slopes
+bounding that line, so compressing a reading is constant time.
+"""
+import math
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+METHODS = ("deadband", "swinging_door")
+
+Point = Tuple[datetime, float]
+
+class CompressionState:
+    """Last stored point and the reading held back for one sensor"""
+
+    __slots__ = ("stored_at", "stored_value", "held", "slope_low", "slope_high")
+
+    def __init__(self, timestamp: datetime, value: float):
+        self.stored_at = timestamp
+        self.stored_value = value
+        self.held: Optional[Point] = None
+        self.slope_low = -math.inf
+        self.slope_high = math.inf
+
+    def store(self, point: Point):
+        self.stored_at, self.stored_value = point
+        self.held = None
+        self.slope_low = -math.inf
+        self.slope_high = math.inf
+
+class HistoryCompressor:
+    """Deadband and swinging door compression, one state per sensor
+
+    settings maps a sensor type to {"method", "tolerance", "max_interval"};
+    sensor types without settings are stored verbatim. max_interval is the
+    longest time in seconds a sensor goes without a stored point while it
+    keeps reporting.
+    """
+
+    def __init__(self, settings: Dict[str, dict]):
+        for sensor_type, config in settings.items():
+            if config.get("method") not in METHODS:
+                raise ValueError(f"Unknown compression method for {sensor_type}: {config.get('method')}")
+        self.settings = settings
+        self._states: Dict[str, CompressionState] = {}
+        self.received = 0
+        self.stored = 0
+
+    def update(
+        self,
+        sensor_id: str,
+        sensor_type: str,
+        value: float,
+        timestamp: datetime,
+        force: bool = False
+    ) -> List[Point]:
+        """Take a reading and return the points to store, oldest first
+
+        force stores the reading whatever the tolerance, e.g. on a status
+        change, so that the exact transition stays in the history.
+        """
+        self.received += 1
+        config = self.settings.get(sensor_type)
+        state = self._states.get(sensor_id)
+        point = (timestamp, value)
+
+        if config is None:
+            points = [point]
+        elif state is None:
+            self._states[sensor_id] = CompressionState(timestamp, value)
+            points = [point]
+        elif timestamp <= (state.held[0] if state.held else state.stored_at):
+            # Late readings are stored as they are and leave the line alone
+            points = [point]
+        elif force:
+            points = [state.held, point] if state.held else [point]
+            state.store(point)
+        else:
+            points = self._compress(state, config, point)
+
+        self.stored += len(points)
+        return points
+
+    def _compress(self, state: CompressionState, config: dict, point: Point) -> List[Point]:
+        points = []
+        timestamp, value = point
+        tolerance = config["tolerance"]
+
+        # Close the current line when it has run for max_interval
+        if state.held and (timestamp - state.stored_at).total_seconds() > config["max_interval"]:
+            points.append(state.held)
+            state.store(state.held)
+
+        if config["method"] == "deadband":
+            if abs(value - state.stored_value) > tolerance:
+                if state.held:
+                    points.append(state.held)
+                points.append(point)
+                state.store(point)
+            else:
+                state.held = point
+            return points
+
+        # The reading can end the line if the line from the stored point to
+        # it passes within the tolerance of every reading skipped so far
+        elapsed = (timestamp - state.stored_at).total_seconds()
+        slope = (value - state.stored_value) / elapsed
+        if not state.slope_low <= slope <= state.slope_high:
+            points.append(state.held)
+            state.store(state.held)
+            elapsed = (timestamp - state.stored_at).total_seconds()
+
+        state.held = point
+        state.slope_low = max(state.slope_low, (value - tolerance - state.stored_value) / elapsed)
+        state.slope_high = min(state.slope_high, (value + tolerance - state.stored_value) / elapsed)
+        return points
+
+    def pending(self, sensor_id: str) -> Optional[Point]:
+        """Reading held back for a sensor, not stored yet"""
+        state = self._states.get(sensor_id)
+        return state.held if state else None
+
+    def flush(self) -> List[Tuple[str, datetime, float]]:
+        """Store every held reading, e.g. before shutting down"""
+        points = []
+        for sensor_id, state in self._states.items():
+            if state.held:
+                points.append((sensor_id, *state.held))
+                state.store(state.held)
+        self.stored += len(points)
+        return points
+
+    def clear(self):
+        """Forget every sensor, dropping the readings held back"""
+        self._states.clear()
+
+    def stats(self) -> dict:
+        return {
+            "sensors": len(self._states),
+            "received": self.received,
+            "stored": self.stored,
+            "ratio": round(self.received / self.stored, 2) if self.stored else 0.0,
+            "settings": self.settings
+        }
+
+def interpolate(points: Sequence[Point], grid: Sequence[datetime]) -> List[Optional[float]]:
+    """Linearly interpolate stored points at each grid time
+
+    Grid times before the first or after the last point get None.
+    """
+    if not points:
+        return [None] * len(grid)
+    times = np.array([p[0].timestamp() for p in points])
+    values = np.array([p[1] for p in points], dtype=float)
+    at = np.array([t.timestamp() for t in grid])
+    result = np.interp(at, times, values, left=np.nan, right=np.nan)
+    return [None if math.isnan(v) else float(v) for v in result]
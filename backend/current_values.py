@@ -0,0 +1,128 @@
+"""Latest value of each sensor, written to MongoDB only when it matters
+
+Every reading updates the in-memory entry of its sensor. The sensors
+collection is only written when the status changes, when the value
+moves beyond a deadband from the value last written, or when the
+written value has been stale for max_staleness seconds. Readings in
+between are kept in memory, flushed in bulk by a background task and
+overlaid on sensor documents read back from MongoDB.
+"""
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+class CurrentValue:
+    """Latest reading of one sensor and what MongoDB has of it"""
+
+    __slots__ = ("value", "status", "timestamp", "written_value", "written_at", "dirty")
+
+    def __init__(self, value: float, status: str, timestamp: datetime):
+        self.value = value
+        self.status = status
+        self.timestamp = timestamp
+        self.written_value = value
+        self.written_at = time.monotonic()
+        self.dirty = False
+
+class CurrentValueBuffer:
+    """In-memory current values with write-through on change"""
+
+    def __init__(self, max_staleness: float = 30.0):
+        self.max_staleness = max_staleness
+        self._entries: Dict[str, CurrentValue] = {}
+        self.updates = 0
+        self.writes = 0
+
+    def update(self, sensor_id: str, value: float, status: str, timestamp: datetime, deadband: float) -> bool:
+        """Record a reading and tell whether it must be written now
+
+        A True answer counts the value as written; call mark_dirty if the
+        write then fails.
+        """
+        self.updates += 1
+        entry = self._entries.get(sensor_id)
+        if entry is None:
+            self._entries[sensor_id] = CurrentValue(value, status, timestamp)
+            self.writes += 1
+            return True
+        if timestamp < entry.timestamp:
+            return False
+
+        write = (
+            status != entry.status
+            or abs(value - entry.written_value) > deadband
+            or time.monotonic() - entry.written_at >= self.max_staleness
+        )
+        entry.value = value
+        entry.status = status
+        entry.timestamp = timestamp
+        if write:
+            self._written(entry)
+        else:
+            entry.dirty = True
+        return write
+
+    def _written(self, entry: CurrentValue):
+        entry.written_value = entry.value
+        entry.written_at = time.monotonic()
+        entry.dirty = False
+        self.writes += 1
+
+    def take_dirty(self, stale_only: bool = True) -> List[Tuple[str, float, str, datetime]]:
+        """Values MongoDB is behind on, counted as written
+
+        With stale_only, only those not written for max_staleness seconds.
+        """
+        now = time.monotonic()
+        taken = []
+        for sensor_id, entry in self._entries.items():
+            if not entry.dirty or (stale_only and now - entry.written_at < self.max_staleness):
+                continue
+            self._written(entry)
+            taken.append((sensor_id, entry.value, entry.status, entry.timestamp))
+        return taken
+
+    def mark_dirty(self, sensor_ids: Iterable[str]):
+        """Flush these sensors again, after a failed write"""
+        for sensor_id in sensor_ids:
+            entry = self._entries.get(sensor_id)
+            if entry is not None:
+                entry.dirty = True
+                entry.written_at = 0.0
+
+    def get(self, sensor_id: str) -> Optional[CurrentValue]:
+        return self._entries.get(sensor_id)
+
+    def overlay(self, sensors: List[dict]) -> List[dict]:
+        """Replace stored current values with newer ones held in memory"""
+        for sensor in sensors:
+            entry = self._entries.get(sensor.get("sensor_id"))
+            if entry is None or not entry.dirty:
+                continue
+            stored = sensor.get("last_reading")
+            if stored is not None and _as_datetime(stored) >= entry.timestamp:
+                continue
+            sensor["current_value"] = entry.value
+            sensor["status"] = entry.status
+            sensor["last_reading"] = entry.timestamp.isoformat() if isinstance(stored, str) else entry.timestamp
+        return sensors
+
+    def clear(self):
+        """Forget every sensor, including values not written yet"""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "sensors": len(self._entries),
+            "dirty": sum(1 for entry in self._entries.values() if entry.dirty),
+            "updates": self.updates,
+            "writes": self.writes,
+            "max_staleness": self.max_staleness
+        }
+
+def _as_datetime(value) -> datetime:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
@@ -0,0 +1,183 @@
+"""Prometheus metrics for the API, MongoDB, the LLM and ingestion
+
+Routes on api_router are timed by MetricsRoute, labelled with the route
+template rather than the raw path so sensor ids do not multiply series.
+MongoDB commands are timed by a PyMongo command listener, which also
+logs the shape of any command slower than the slow query threshold:
+its filter with every value replaced by "?", so logs show which query
+pattern is slow without leaking data.
+"""
+import json
+import logging
+import time
+from typing import Callable
+
+from fastapi import Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from prometheus_client import Counter, Gauge, Histogram
+from pymongo import monitoring
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+logger = logging.getLogger(__name__)
+
+REQUEST_DURATION = Histogram(
+    "guardianfire_http_request_duration_seconds",
+    "API request latency by route",
+    ["method", "route", "status"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "guardianfire_http_requests_in_progress",
+    "API requests being handled by route",
+    ["method", "route"]
+)
+
+MONGO_COMMAND_DURATION = Histogram(
+    "guardianfire_mongodb_command_duration_seconds",
+    "MongoDB command latency by collection and command",
+    ["collection", "command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "guardianfire_mongodb_command_failures_total",
+    "MongoDB commands that failed, by collection and command",
+    ["collection", "command"]
+)
+MONGO_SLOW_COMMANDS = Counter(
+    "guardianfire_mongodb_slow_commands_total",
+    "MongoDB commands over the slow query threshold",
+    ["collection", "command"]
+)
+
+LLM_DURATION = Histogram(
+    "guardianfire_llm_request_duration_seconds",
+    "Risk analysis LLM call latency, including failed calls",
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+)
+LLM_REQUESTS = Counter("guardianfire_llm_requests_total", "Risk analysis LLM calls")
+LLM_FAILURES = Counter("guardianfire_llm_failures_total", "Risk analysis LLM calls that raised")
+
+READINGS_RECEIVED = Counter(
+    "guardianfire_readings_received_total",
+    "Sensor readings received, by source (api, bulk, mqtt)",
+    ["source"]
+)
+READINGS_REJECTED = Counter("guardianfire_readings_rejected_total", "Readings for unknown sensors")
+READINGS_STORED = Counter(
+    "guardianfire_readings_stored_total",
+    "Readings written to the history after compression"
+)
+DEVIATIONS_DETECTED = Counter("guardianfire_deviations_total", "Readings flagged by the deviation detector")
+
+class MetricsRoute(APIRoute):
+    """APIRoute that records latency and in-flight requests per route"""
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        route = self.path_format
+
+        async def timed_handler(request: Request) -> Response:
+            in_progress = REQUESTS_IN_PROGRESS.labels(request.method, route)
+            in_progress.inc()
+            started = time.perf_counter()
+            status = 500
+            try:
+                response = await handler(request)
+                status = response.status_code
+                return response
+            except StarletteHTTPException as e:
+                status = e.status_code
+                raise
+            except RequestValidationError:
+                # Turned into a 422 response by FastAPI's default handler
+                status = 422
+                raise
+            finally:
+                in_progress.dec()
+                REQUEST_DURATION.labels(request.method, route, str(status)).observe(time.perf_counter() - started)
+
+        return timed_handler
+
+# Where each command keeps the filter worth showing in the slow query log
+FILTER_FIELDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+    "aggregate": "pipeline"
+}
+
+def query_shape(value):
+    """The value with every scalar replaced by "?", keeping keys and operators"""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = []
+        for item in value:
+            shape = query_shape(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return "?"
+
+def command_shape(name: str, command) -> dict:
+    """Filter, sort and statement count of a command, as shapes"""
+    shape = {}
+    if name in FILTER_FIELDS and FILTER_FIELDS[name] in command:
+        shape[FILTER_FIELDS[name]] = query_shape(command[FILTER_FIELDS[name]])
+    if name == "find" and "sort" in command:
+        shape["sort"] = dict(command["sort"])
+    for field, key in (("updates", "q"), ("deletes", "q")):
+        statements = command.get(field)
+        if statements:
+            shape[field] = len(statements)
+            shape["filter"] = query_shape([statement.get(key) for statement in statements])
+    if name == "insert":
+        shape["documents"] = len(command.get("documents", []))
+    return shape
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Time every MongoDB command and log the slow ones
+
+    Listeners run on PyMongo's threads; the in-flight map is only touched
+    with single dict operations.
+    """
+
+    def __init__(self, slow_ms: float = 100.0):
+        self.slow_ms = slow_ms
+        self._started = {}
+
+    @staticmethod
+    def _key(event):
+        return (event.connection_id, event.request_id, event.operation_id)
+
+    def started(self, event):
+        command = event.command
+        collection = command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = command.get("collection")
+        if not isinstance(collection, str):
+            collection = ""
+        # The command document is kept, not copied, and only shaped when slow
+        self._started[self._key(event)] = (collection, command)
+
+    def _finished(self, event, failed: bool):
+        collection, command = self._started.pop(self._key(event), ("", None))
+        name = event.command_name
+        seconds = event.duration_micros / 1e6
+        MONGO_COMMAND_DURATION.labels(collection, name).observe(seconds)
+        if failed:
+            MONGO_COMMAND_FAILURES.labels(collection, name).inc()
+        if seconds * 1000 >= self.slow_ms and command is not None:
+            MONGO_SLOW_COMMANDS.labels(collection, name).inc()
+            logger.warning(
+                f"Slow MongoDB {name} on {collection or event.database_name}: "
+                f"{seconds * 1000:.1f} ms {json.dumps(command_shape(name, command), default=str)}"
+            )
+
+    def succeeded(self, event):
+        self._finished(event, failed=False)
+
+    def failed(self, event):
+        self._finished(event, failed=True)
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""One-shot data migrations for GuardianFire
+
+Run from the backend directory with the same .env as the API:
+
+    python migrations.py readings
+    python migrations.py sensor-created-at
+    python migrations.py dates
+    python migrations.py rollups
+"""
+import argparse
+import asyncio
+from collections import Counter
+
+from pymongo import ReplaceOne, UpdateOne
+
+from server import (
+    db,
+    logger,
+    ensure_datetime,
+    rollup_aggregates,
+    rollup_bucket,
+    READINGS_COLLECTION,
+    READINGS_TIMESERIES,
+)
+
+LEGACY_READINGS_COLLECTION = f"{READINGS_COLLECTION}_legacy"
+
+# Date fields once stored as ISO strings, per collection
+DATE_FIELDS = {
+    "alerts": ["created_at", "last_seen_at", "resolved_at"],
+    "work_orders": ["created_at", "due_date", "completed_at"],
+    "sectors": ["created_at"],
+    "sensors": ["created_at"],
+    "rules": ["created_at"],
+    "behavioral_reports": ["created_at"],
+    # The TTL index only expires sessions whose expires_at is a date
+    "user_sessions": ["expires_at"],
+}
+
+# Indexes replaced by longer ones in server.INDEXES
+SUPERSEDED_INDEXES = {
+    "work_orders": [
+        "status_1_created_at_-1_order_id_-1",
+        "sector_id_1_status_1_created_at_-1_order_id_-1",
+    ],
+}
+
+async def collection_type(name: str) -> str:
+    """Return 'timeseries', 'collection' or '' when the collection is missing"""
+    cursor = await db.list_collections(filter={"name": name})
+    collections = await cursor.to_list(1)
+    return collections[0].get("type", "collection") if collections else ""
+
+async def migrate_readings(batch_size: int = 10000, keep_legacy: bool = False):
+    """Copy sensor readings into the time-series collection with BSON dates
+
+    The plain collection is renamed out of the way and copied in _id
+    order. The last copied _id is kept in the migrations collection, so
+    an interrupted run can simply be started again; the batch in flight
+    at the interruption is copied again without the readings that made
+    it across. The legacy collection is only dropped once everything is
+    copied, and kept with keep_legacy. Stop ingestion while this runs:
+    readings written between the rename and the creation of the new
+    collection would land in a plain collection.
+    """
+    current_type = await collection_type(READINGS_COLLECTION)
+    legacy_type = await collection_type(LEGACY_READINGS_COLLECTION)
+    progress = await db.migrations.find_one({"_id": "readings"}) or {}
+
+    if current_type == "timeseries" and (not legacy_type or progress.get("done")):
+        logger.info(f"{READINGS_COLLECTION} is already a time-series collection")
+        return 0
+
+    if current_type == "collection":
+        if legacy_type:
+            raise RuntimeError(
+                f"Both {READINGS_COLLECTION} and {LEGACY_READINGS_COLLECTION} exist as plain "
+                "collections, merge them manually before migrating"
+            )
+        await db[READINGS_COLLECTION].rename(LEGACY_READINGS_COLLECTION)
+        await db.migrations.delete_one({"_id": "readings"})
+        progress = {}
+        current_type = ""
+
+    if not current_type:
+        await db.create_collection(READINGS_COLLECTION, timeseries=READINGS_TIMESERIES)
+
+    legacy = db[LEGACY_READINGS_COLLECTION]
+    copied_to = progress.get("copied_to")
+    pending_to = progress.get("pending_to")
+    migrated = 0
+    while True:
+        query = {"_id": {"$gt": copied_to}} if copied_to is not None else {}
+        batch = await legacy.find(query).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+
+        docs = [
+            {
+                "sensor_id": doc["sensor_id"],
+                "value": doc["value"],
+                "timestamp": ensure_datetime(doc["timestamp"])
+            }
+            for doc in batch
+        ]
+        if pending_to is not None and batch[-1]["_id"] <= pending_to:
+            # The run before stopped while copying this batch
+            docs = await without_copied(docs)
+        await db.migrations.update_one(
+            {"_id": "readings"},
+            {"$set": {"copied_to": copied_to, "pending_to": batch[-1]["_id"]}},
+            upsert=True
+        )
+        if docs:
+            await db[READINGS_COLLECTION].insert_many(docs, ordered=False)
+        copied_to = batch[-1]["_id"]
+        await db.migrations.update_one(
+            {"_id": "readings"},
+            {"$set": {"copied_to": copied_to, "pending_to": None}}
+        )
+        pending_to = None
+        migrated += len(docs)
+        logger.info(f"Migrated {migrated} readings")
+
+    await db.migrations.update_one({"_id": "readings"}, {"$set": {"done": True}}, upsert=True)
+    if not keep_legacy:
+        await legacy.drop()
+
+    return migrated
+
+async def without_copied(docs: list) -> list:
+    """Readings of an interrupted batch that are not in the time-series collection yet"""
+    existing = await db[READINGS_COLLECTION].find(
+        {
+            "sensor_id": {"$in": list({doc["sensor_id"] for doc in docs})},
+            "timestamp": {"$in": list({doc["timestamp"] for doc in docs})}
+        },
+        {"_id": 0, "sensor_id": 1, "value": 1, "timestamp": 1}
+    ).to_list(None)
+    copied = Counter((doc["sensor_id"], ensure_datetime(doc["timestamp"]), doc["value"]) for doc in existing)
+    remaining = []
+    for doc in docs:
+        key = (doc["sensor_id"], doc["timestamp"], doc["value"])
+        if copied[key]:
+            copied[key] -= 1
+        else:
+            remaining.append(doc)
+    return remaining
+
+async def backfill_sensor_created_at():
+    """Give sensors created before created_at existed a sort key for pagination"""
+    result = await db.sensors.update_many(
+        {"created_at": {"$exists": False}},
+        [{"$set": {"created_at": {"$toDate": "$last_reading"}}}]
+    )
+    return result.modified_count
+
+async def migrate_dates(batch_size: int = 10000):
+    """Convert ISO string dates to BSON datetimes
+
+    Covers alert and work order dates, the created_at pagination key of
+    sectors, sensors, rules and reports, and session expiry, which the
+    TTL index on user_sessions ignores while it is a string. Strings and
+    dates do not compare with each other, so until this has run, date
+    filters and cursors skip the documents still holding strings. Safe
+    to run again; converted documents are not matched.
+    """
+    converted = 0
+    for collection, fields in DATE_FIELDS.items():
+        query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+        while True:
+            batch = await db[collection].find(query, {field: 1 for field in fields}).to_list(batch_size)
+            if not batch:
+                break
+
+            await db[collection].bulk_write([
+                UpdateOne({"_id": doc["_id"]}, {"$set": {
+                    field: ensure_datetime(doc[field])
+                    for field in fields
+                    if isinstance(doc.get(field), str)
+                }})
+                for doc in batch
+            ], ordered=False)
+            converted += len(batch)
+            logger.info(f"Converted dates on {converted} documents")
+
+    for collection, names in SUPERSEDED_INDEXES.items():
+        existing = await db[collection].index_information()
+        for name in names:
+            if name in existing:
+                await db[collection].drop_index(name)
+                logger.info(f"Dropped superseded index {collection}.{name}")
+
+    return converted
+
+async def build_rollups(batch_size: int = 10000, replace: bool = False):
+    """Aggregate the readings already in the history into sensor_rollups
+
+    Rollups are otherwise only built as readings arrive, so history
+    stored before they existed has none. Each sensor's readings are read
+    in time order and a bucket is written once no later reading can fall
+    into it. Buckets that already have a rollup are left alone, so this
+    is safe to run again and alongside ingestion; with replace they are
+    rebuilt from the history, which needs ingestion stopped. Readings
+    history compression left out are missing from rebuilt rollups.
+    """
+    readings = db[READINGS_COLLECTION]
+    written = 0
+
+    async def write(buckets: dict, keys: list):
+        nonlocal written
+        if not keys:
+            return
+        operations = []
+        for key in keys:
+            sensor_id, resolution, bucket = key
+            rollup = {"sensor_id": sensor_id, "resolution": resolution, "bucket": bucket, **buckets.pop(key)}
+            filter = {"sensor_id": sensor_id, "resolution": resolution, "bucket": bucket}
+            if replace:
+                operations.append(ReplaceOne(filter, rollup, upsert=True))
+            else:
+                operations.append(UpdateOne(filter, {"$setOnInsert": rollup}, upsert=True))
+        await db.sensor_rollups.bulk_write(operations, ordered=False)
+        written += len(operations)
+        logger.info(f"Wrote {written} rollups")
+
+    for sensor_id in await readings.distinct("sensor_id"):
+        cursor = readings.find(
+            {"sensor_id": sensor_id},
+            {"_id": 0, "sensor_id": 1, "value": 1, "timestamp": 1}
+        ).sort("timestamp", 1)
+        buckets = {}
+        batch = []
+        async for reading in cursor:
+            batch.append(reading)
+            if len(batch) < batch_size:
+                continue
+            rollup_aggregates(batch, buckets)
+            latest = ensure_datetime(batch[-1]["timestamp"])
+            batch = []
+            # Buckets before the latest reading's are complete
+            await write(buckets, [
+                key for key in buckets
+                if key[2] < rollup_bucket(latest, key[1])
+            ])
+        rollup_aggregates(batch, buckets)
+        await write(buckets, list(buckets))
+
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="GuardianFire data migrations")
+    subparsers = parser.add_subparsers(dest="migration", required=True)
+
+    readings_parser = subparsers.add_parser(
+        "readings",
+        help="Convert sensor_readings into a time-series collection"
+    )
+    readings_parser.add_argument("--batch-size", type=int, default=10000)
+    readings_parser.add_argument(
+        "--keep-legacy",
+        action="store_true",
+        help="Keep the legacy collection and its readings instead of dropping it"
+    )
+
+    subparsers.add_parser(
+        "sensor-created-at",
+        help="Backfill created_at on sensors from their last reading time"
+    )
+
+    dates_parser = subparsers.add_parser(
+        "dates",
+        help="Store ISO string dates as BSON datetimes"
+    )
+    dates_parser.add_argument("--batch-size", type=int, default=10000)
+
+    rollups_parser = subparsers.add_parser(
+        "rollups",
+        help="Build sensor_rollups from the readings already stored"
+    )
+    rollups_parser.add_argument("--batch-size", type=int, default=10000)
+    rollups_parser.add_argument(
+        "--replace",
+        action="store_true",
+        help="Rebuild existing rollups too (stop ingestion first)"
+    )
+
+    args = parser.parse_args()
+    if args.migration == "readings":
+        migrated = asyncio.run(migrate_readings(args.batch_size, args.keep_legacy))
+        print(f"Migrated {migrated} readings")
+    elif args.migration == "sensor-created-at":
+        updated = asyncio.run(backfill_sensor_created_at())
+        print(f"Backfilled created_at on {updated} sensors")
+    elif args.migration == "dates":
+        converted = asyncio.run(migrate_dates(args.batch_size))
+        print(f"Converted dates on {converted} documents")
+    elif args.migration == "rollups":
+        written = asyncio.run(build_rollups(args.batch_size, args.replace))
+        print(f"Wrote {written} rollups")
+
+if __name__ == "__main__":
+    main()
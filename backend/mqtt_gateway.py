@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""MQTT ingestion gateway for GuardianFire
+
+Subscribes to one topic per sensor,
+
+    <MQTT_TOPIC_PREFIX>/<sensor_id>/reading
+
+whose payload is either JSON, {"value": 42.1, "timestamp": "..."} with an
+optional timestamp, or a bare number. Readings are committed through a
+WriteBehindIngest, the same path as POST /api/sensors/{id}/reading with
+WRITE_BEHIND on: each one is appended to a write-ahead log, then batched
+into MongoDB. A batch MongoDB cannot take is retried, and moved to a
+dead-letter file if it keeps being rejected, instead of being dropped;
+readings still in the log when the gateway stops are replayed on start.
+
+Run it next to the API with the same .env:
+
+    python mqtt_gateway.py
+
+or set MQTT_ENABLED=true to run it inside the API process, where it
+shares the API's write-behind when WRITE_BEHIND is on. Otherwise it keeps
+its own log in MQTT_WAL_DIR, so run only one gateway per directory.
+
+QoS 1 messages are acknowledged by hand, once their reading is in the
+write-ahead log (on disk with WAL_FSYNC). While the batch queue is full
+the gateway stops reading messages and so stops acknowledging them; the
+broker stops delivering once its in-flight window of unacknowledged
+messages is full (max_inflight_messages in Mosquitto, 20 by default), so
+nothing piles up in the client and the gateway discards nothing. The
+backlog is then the broker's to hold: size Mosquitto's
+max_queued_messages for it. Brokers without an in-flight window, such as
+amqtt, keep delivering into the client's unbounded queue. Unacknowledged
+messages are delivered again after a reconnect, so a reading logged just
+before a crash may be ingested twice. The session is persistent, so
+messages published while the gateway is down are held by the broker
+until it reconnects.
+
+Throughput is unverified: the target of tens of thousands of readings/s
+has not been measured against Mosquitto or a production broker. Run
+mqtt_gateway_test.py against one before relying on it; the in-process
+amqtt broker only reaches a few hundred readings/s.
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Optional
+
+import aiomqtt
+from pydantic import ValidationError
+
+from metrics import READINGS_RECEIVED
+from server import (
+    SensorReading,
+    WriteBehindIngest,
+    content_version,
+    flush_compressed_history,
+    flush_current_values,
+    flush_current_values_periodically,
+    reload_rules,
+    reload_rules_periodically,
+    MQTT_HOST,
+    MQTT_PORT,
+    MQTT_USERNAME,
+    MQTT_PASSWORD,
+    MQTT_TOPIC_PREFIX,
+    MQTT_QOS,
+    MQTT_WAL_DIR,
+    WAL_FSYNC,
+    WAL_SEGMENT_BYTES,
+)
+from wal import WriteAheadLog
+
+logger = logging.getLogger(__name__)
+
+MQTT_CLIENT_ID = os.environ.get('MQTT_CLIENT_ID', 'guardianfire-gateway')
+
+# Seconds between reconnect attempts, doubling up to the maximum
+RECONNECT_DELAY = 1.0
+RECONNECT_DELAY_MAX = 30.0
+
+class MqttGateway:
+    """Feed sensor readings published over MQTT into write-behind ingestion"""
+
+    def __init__(
+        self,
+        ingest: WriteBehindIngest,
+        host: str = MQTT_HOST,
+        port: int = MQTT_PORT,
+        topic_prefix: str = MQTT_TOPIC_PREFIX,
+        qos: int = MQTT_QOS,
+        username: Optional[str] = MQTT_USERNAME,
+        password: Optional[str] = MQTT_PASSWORD,
+        client_id: str = MQTT_CLIENT_ID
+    ):
+        self.ingest = ingest
+        self.host = host
+        self.port = port
+        self.topic_prefix = topic_prefix.rstrip("/")
+        self.qos = qos
+        self.username = username
+        self.password = password
+        self.client_id = client_id
+        self.connected = False
+        self.received = 0
+        self.malformed = 0
+
+    def parse(self, topic: str, payload: bytes) -> Optional[SensorReading]:
+        """Turn one message into a reading, or None when it is malformed"""
+        parts = topic[len(self.topic_prefix) + 1:].split("/")
+        if len(parts) != 2 or parts[1] != "reading" or not parts[0]:
+            return None
+
+        try:
+            data = json.loads(payload)
+            if not isinstance(data, dict):
+                data = {"value": data}
+            return SensorReading(**{**data, "sensor_id": parts[0]})
+        except (ValueError, TypeError, ValidationError):
+            return None
+
+    async def consume(self, client: aiomqtt.Client):
+        await client.subscribe(f"{self.topic_prefix}/+/reading", qos=self.qos)
+        self.connected = True
+        logger.info(f"MQTT gateway subscribed to {self.topic_prefix}/+/reading on {self.host}:{self.port}")
+
+        async for message in client.messages:
+            self.received += 1
+            reading = self.parse(message.topic.value, message.payload)
+            if reading is None:
+                self.malformed += 1
+            else:
+                READINGS_RECEIVED.labels("mqtt").inc()
+                # Blocks while the batch queue is full, leaving the message
+                # unacknowledged so the broker holds back further deliveries
+                await self.ingest.put(reading)
+            if message.qos > 0:
+                # aiomqtt has no public ack, the paho client underneath does
+                client._client.ack(message.mid, message.qos)
+
+    async def run(self):
+        """Consume messages forever, reconnecting with backoff"""
+        delay = RECONNECT_DELAY
+        while True:
+            try:
+                client = aiomqtt.Client(
+                    self.host,
+                    self.port,
+                    username=self.username,
+                    password=self.password,
+                    identifier=self.client_id,
+                    clean_session=False
+                )
+                # Before connecting, as the broker delivers held messages right away
+                client._client.manual_ack_set(True)
+                async with client:
+                    delay = RECONNECT_DELAY
+                    await self.consume(client)
+            except aiomqtt.MqttError as e:
+                self.connected = False
+                logger.warning(f"MQTT connection lost ({e}), reconnecting in {delay:.0f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_DELAY_MAX)
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.connected,
+            "received": self.received,
+            "malformed": self.malformed,
+            "ingest": self.ingest.stats()
+        }
+
+def create_gateway(ingest: Optional[WriteBehindIngest] = None, **kwargs) -> MqttGateway:
+    """Gateway committing through ingest, or its own write-behind on MQTT_WAL_DIR
+
+    A gateway with its own write-behind has to start and stop it.
+    """
+    if ingest is None:
+        ingest = WriteBehindIngest(WriteAheadLog(MQTT_WAL_DIR, WAL_FSYNC, WAL_SEGMENT_BYTES))
+    return MqttGateway(ingest, **kwargs)
+
+async def main():
+    # Readings are checked against the same rules as in the API
+    await reload_rules()
+    rules_task = asyncio.create_task(reload_rules_periodically())
+    flush_task = asyncio.create_task(flush_current_values_periodically())
+    
+    gateway = create_gateway()
+    # Readings a previous run left in the log are committed first
+    await gateway.ingest.start()
+    try:
+        await gateway.run()
+    finally:
+        rules_task.cancel()
+        flush_task.cancel()
+        await gateway.ingest.stop()
+        await asyncio.gather(
+            flush_compressed_history(),
+            flush_current_values(stale_only=False),
+            content_version.flush()
+        )
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
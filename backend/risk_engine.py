@@ -0,0 +1,112 @@
+"""Deterministic sector risk scoring, vectorized with NumPy
+
+Scores every sector in one pass from its sensors' position relative to
+their thresholds, recent behavioral reports and the plant context. The
+result uses the same 0-100 scale and safe/warning/critical statuses as
+the LLM analysis, so either can be stored as a sector's risk level.
+"""
+from typing import Dict, List
+
+import numpy as np
+
+# Share of the final score taken by each component
+SENSOR_WEIGHT = 70.0
+REPORT_WEIGHT = 15.0
+CONTEXT_WEIGHT = 15.0
+
+# Sector status cut-offs, matching the dashboard colours
+CRITICAL_SCORE = 70.0
+WARNING_SCORE = 40.0
+
+# Reports needed for the report component to reach ~63%
+REPORT_SCALE = 3.0
+
+def sensor_severity(values: np.ndarray, min_thresholds: np.ndarray, max_thresholds: np.ndarray) -> np.ndarray:
+    """Map readings to 0-1, reaching 0.5 at the warning band and 1 at the limit
+
+    Mirrors classify_reading: warnings start at 80% of the max threshold
+    or 120% of the min threshold, critical at the thresholds themselves.
+    """
+    high_ratio = np.divide(values, max_thresholds, out=np.zeros_like(values), where=max_thresholds > 0)
+    high = np.clip((high_ratio - 0.6) / 0.4, 0.0, 1.0)
+
+    low_ratio = np.divide(values, min_thresholds, out=np.full_like(values, np.inf), where=min_thresholds > 0)
+    low = np.clip((1.4 - low_ratio) / 0.4, 0.0, 1.0)
+
+    return np.maximum(high, low)
+
+def context_score(context: dict) -> float:
+    """Score plant-wide conditions that make every sector riskier"""
+    factors = np.array([
+        (context.get("machine_load", 70) - 50) / 50,
+        context.get("team_fatigue", 30) / 100,
+        context.get("last_maintenance_days", 7) / 30,
+        (context.get("temperature_external", 25) - 25) / 15,
+        (40 - context.get("humidity", 50)) / 30,
+    ])
+    return float(np.clip(factors, 0.0, 1.0).mean())
+
+def risk_status(scores: np.ndarray) -> np.ndarray:
+    """Map scores to safe/warning/critical"""
+    return np.select(
+        [scores >= CRITICAL_SCORE, scores >= WARNING_SCORE],
+        ["critical", "warning"],
+        default="safe"
+    )
+
+def score_sectors(
+    sector_ids: List[str],
+    sensors: List[dict],
+    report_counts: Dict[str, int],
+    context: dict
+) -> Dict[str, dict]:
+    """Score many sectors at once
+
+    Returns, per sector id, the risk score and status plus the components
+    behind them and the sensor contributing most to the score.
+    """
+    index = {sector_id: i for i, sector_id in enumerate(sector_ids)}
+    sensors = [s for s in sensors if s["sector_id"] in index]
+    n_sectors = len(sector_ids)
+
+    sector_idx = np.fromiter((index[s["sector_id"]] for s in sensors), dtype=np.int64, count=len(sensors))
+    values = np.fromiter((s.get("current_value", 0.0) for s in sensors), dtype=np.float64, count=len(sensors))
+    min_t = np.fromiter((s.get("min_threshold", 0.0) for s in sensors), dtype=np.float64, count=len(sensors))
+    max_t = np.fromiter((s.get("max_threshold", 100.0) for s in sensors), dtype=np.float64, count=len(sensors))
+
+    severity = sensor_severity(values, min_t, max_t)
+
+    # Worst sensor dominates, the average keeps several warnings visible
+    worst = np.zeros(n_sectors)
+    np.maximum.at(worst, sector_idx, severity)
+    counts = np.bincount(sector_idx, minlength=n_sectors)
+    mean = np.bincount(sector_idx, weights=severity, minlength=n_sectors) / np.maximum(counts, 1)
+    sensor_scores = 0.85 * worst + 0.15 * mean
+
+    reports = np.array([report_counts.get(sector_id, 0) for sector_id in sector_ids], dtype=np.float64)
+    report_scores = 1.0 - np.exp(-reports / REPORT_SCALE)
+
+    ctx = context_score(context)
+    scores = np.round(
+        SENSOR_WEIGHT * sensor_scores + REPORT_WEIGHT * report_scores + CONTEXT_WEIGHT * ctx,
+        1
+    )
+    statuses = risk_status(scores)
+
+    # Sensor with the highest severity per sector, sorted so the last write wins
+    top_sensor = [None] * n_sectors
+    for i in np.lexsort((severity, sector_idx)):
+        if severity[i] > 0:
+            top_sensor[sector_idx[i]] = sensors[i]
+
+    return {
+        sector_id: {
+            "risk_score": float(scores[i]),
+            "risk_status": str(statuses[i]),
+            "sensor_score": round(float(sensor_scores[i]), 3),
+            "report_score": round(float(report_scores[i]), 3),
+            "context_score": round(ctx, 3),
+            "top_sensor": top_sensor[i]
+        }
+        for sector_id, i in index.items()
+    }
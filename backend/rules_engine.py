@@ -0,0 +1,262 @@
+"""Prescriptive rules compiled into predicates and indexed by scope
+
+A rule fires on one kind of event (a sensor reading or a new alert),
+optionally scoped to a sector and a sensor type, when all of its
+conditions hold:
+
+    {"event": "alert", "conditions": [
+        {"field": "probability", "op": ">", "value": 70},
+        {"field": "shift", "op": "==", "value": "turno_noite"}
+    ]}
+
+Rules are compiled once when loaded. Each event only looks at the rules
+in its own (event, sector, sensor type) buckets, and within a bucket the
+rules with a numeric bound on the main field (value for readings,
+probability for alerts) are kept sorted so that a bisect skips every
+rule whose bound the event does not reach; rules bounded on both sides
+are sorted by each bound and looked up through the shorter match. Reloading builds a new index
+and swaps it in whole, so evaluation never waits on a reload.
+"""
+import operator
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Fields each event type exposes to rule conditions
+EVENT_FIELDS = {
+    "reading": {"value", "status", "sensor_type", "sector_id", "sensor_id", "hour", "shift"},
+    "alert": {"probability", "severity", "alert_type", "sector_id", "sensor_id", "hour", "shift"}
+}
+
+# Numeric field whose bounds are indexed for each event type
+RANGE_FIELDS = {"reading": "value", "alert": "probability"}
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "in": lambda left, right: left in right,
+    "not_in": lambda left, right: left not in right
+}
+
+Predicate = Callable[[dict], bool]
+
+def compile_condition(event: str, condition: dict) -> Predicate:
+    """Turn one {field, op, value} condition into a closure"""
+    field = condition.get("field")
+    op = condition.get("op")
+    expected = condition.get("value")
+
+    if field not in EVENT_FIELDS[event]:
+        raise ValueError(f"Unknown field '{field}' for {event} rules")
+    if op not in OPERATORS:
+        raise ValueError(f"Unknown operator '{op}'")
+    if op in ("in", "not_in"):
+        if not isinstance(expected, list):
+            raise ValueError(f"Operator '{op}' needs a list value")
+        expected = frozenset(expected)
+    compare = OPERATORS[op]
+
+    def predicate(data: dict) -> bool:
+        actual = data.get(field)
+        if actual is None:
+            return False
+        try:
+            return compare(actual, expected)
+        except TypeError:
+            return False
+    return predicate
+
+class CompiledRule:
+    """A rule with its conditions compiled, ready for the index"""
+
+    __slots__ = ("rule", "rule_id", "predicates", "lower", "upper", "cooldown")
+
+    def __init__(self, rule: dict):
+        event = rule.get("event")
+        if event not in EVENT_FIELDS:
+            raise ValueError(f"Unknown event '{event}'")
+        if event == "alert" and rule.get("sensor_type"):
+            raise ValueError("Alert rules cannot be scoped to a sensor type")
+        conditions = rule.get("conditions") or []
+        if not conditions:
+            raise ValueError("A rule needs at least one condition")
+
+        self.rule = rule
+        self.rule_id = rule["rule_id"]
+        self.cooldown = float(rule.get("cooldown_seconds", 0))
+        self.lower: Optional[Tuple[float, bool]] = None
+        self.upper: Optional[Tuple[float, bool]] = None
+
+        # The first numeric bound on the range field goes to the index,
+        # every other condition is checked by a predicate
+        self.predicates: List[Predicate] = []
+        range_field = RANGE_FIELDS[event]
+        for condition in conditions:
+            predicate = compile_condition(event, condition)
+            numeric = isinstance(condition["value"], (int, float)) and not isinstance(condition["value"], bool)
+            if condition["field"] == range_field and numeric:
+                if condition["op"] in (">", ">=") and self.lower is None:
+                    self.lower = (float(condition["value"]), condition["op"] == ">=")
+                    continue
+                if condition["op"] in ("<", "<=") and self.upper is None:
+                    self.upper = (float(condition["value"]), condition["op"] == "<=")
+                    continue
+            self.predicates.append(predicate)
+
+    def matches(self, data: dict) -> bool:
+        for predicate in self.predicates:
+            if not predicate(data):
+                return False
+        return True
+
+class RuleBucket:
+    """Rules sharing one (event, sector, sensor type) scope"""
+
+    def __init__(self, rules: List[CompiledRule], range_field: str):
+        self.range_field = range_field
+        self.other = [r for r in rules if r.lower is None and r.upper is None]
+
+        # Rules with only a lower bound, sorted by it; rules with only an
+        # upper bound, sorted by it descending via negation
+        self.lower_rules, self.lower_keys = _sorted_by(
+            [r for r in rules if r.lower is not None and r.upper is None], lambda r: r.lower[0]
+        )
+        self.upper_rules, self.upper_keys = _sorted_by(
+            [r for r in rules if r.lower is None and r.upper is not None], lambda r: -r.upper[0]
+        )
+        # Rules with both bounds, sorted once by each
+        both = [r for r in rules if r.lower is not None and r.upper is not None]
+        self.both_by_lower, self.both_lower_keys = _sorted_by(both, lambda r: r.lower[0])
+        self.both_by_upper, self.both_upper_keys = _sorted_by(both, lambda r: -r.upper[0])
+
+    def candidates(self, data: dict):
+        yield from self.other
+
+        value = data.get(self.range_field)
+        if not isinstance(value, (int, float)):
+            return
+
+        # Rules whose lower bound is at or below the value
+        for i in range(bisect_right(self.lower_keys, value)):
+            rule = self.lower_rules[i]
+            if _above(value, rule.lower):
+                yield rule
+
+        # Rules whose upper bound is at or above the value
+        for i in range(bisect_right(self.upper_keys, -value)):
+            rule = self.upper_rules[i]
+            if _below(value, rule.upper):
+                yield rule
+
+        # Rules with both bounds: walk the shorter of the rules whose lower
+        # bound the value reaches and those whose upper bound it stays under
+        reached = bisect_right(self.both_lower_keys, value)
+        under = bisect_right(self.both_upper_keys, -value)
+        rules = self.both_by_lower if reached <= under else self.both_by_upper
+        for i in range(min(reached, under)):
+            rule = rules[i]
+            if _above(value, rule.lower) and _below(value, rule.upper):
+                yield rule
+
+def _sorted_by(rules: List[CompiledRule], key) -> Tuple[List[CompiledRule], List[float]]:
+    """Rules sorted by key, with the keys alongside for bisecting"""
+    rules = sorted(rules, key=key)
+    return rules, [key(r) for r in rules]
+
+def _above(value: float, bound: Tuple[float, bool]) -> bool:
+    limit, inclusive = bound
+    return value > limit or (inclusive and value == limit)
+
+def _below(value: float, bound: Tuple[float, bool]) -> bool:
+    limit, inclusive = bound
+    return value < limit or (inclusive and value == limit)
+
+class RuleEngine:
+    """Indexed rule set with copy-on-write reloads and per-subject cooldowns"""
+
+    def __init__(self):
+        self._index: Dict[tuple, RuleBucket] = {}
+        self._last_fired: Dict[tuple, datetime] = {}
+        self.rules = 0
+        self.errors: Dict[str, str] = {}
+        self.evaluations = 0
+        self.matches = 0
+
+    def load(self, rules: List[dict]):
+        """Compile a full rule set and swap it in
+
+        Rules that fail to compile are skipped and listed in errors.
+        """
+        grouped = defaultdict(list)
+        errors = {}
+        for rule in rules:
+            if not rule.get("enabled", True):
+                continue
+            try:
+                compiled = CompiledRule(rule)
+            except (ValueError, KeyError, TypeError) as e:
+                errors[rule.get("rule_id", "?")] = str(e)
+                continue
+            grouped[(rule["event"], rule.get("sector_id"), rule.get("sensor_type"))].append(compiled)
+
+        index = {
+            key: RuleBucket(compiled, RANGE_FIELDS[key[0]])
+            for key, compiled in grouped.items()
+        }
+        rule_ids = {compiled.rule_id for bucket in grouped.values() for compiled in bucket}
+
+        # Single assignments, so an evaluation sees either set whole
+        self._index = index
+        self._last_fired = {key: fired for key, fired in self._last_fired.items() if key[0] in rule_ids}
+        self.rules = len(rule_ids)
+        self.errors = errors
+
+    def evaluate(self, event: str, data: dict, timestamp: datetime) -> List[dict]:
+        """Return the rules an event fires, honouring each rule's cooldown"""
+        index = self._index
+        self.evaluations += 1
+        sector_id = data.get("sector_id")
+        sensor_type = data.get("sensor_type")
+        scopes = dict.fromkeys([
+            (event, sector_id, sensor_type),
+            (event, sector_id, None),
+            (event, None, sensor_type),
+            (event, None, None)
+        ])
+
+        fired = []
+        subject = data.get("sensor_id") or sector_id
+        for scope in scopes:
+            bucket = index.get(scope)
+            if bucket is None:
+                continue
+            for rule in bucket.candidates(data):
+                if not rule.matches(data):
+                    continue
+                key = (rule.rule_id, subject)
+                last = self._last_fired.get(key)
+                if last is not None and (timestamp - last).total_seconds() < rule.cooldown:
+                    continue
+                self._last_fired[key] = timestamp
+                fired.append(rule.rule)
+
+        self.matches += len(fired)
+        return fired
+
+    def clear_cooldowns(self):
+        """Let every rule fire again right away"""
+        self._last_fired = {}
+
+    def stats(self) -> dict:
+        return {
+            "rules": self.rules,
+            "buckets": len(self._index),
+            "invalid_rules": len(self.errors),
+            "evaluations": self.evaluations,
+            "matches": self.matches
+        }
@@ -1,26 +1,59 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Response, Request, Depends
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Response, Request, Depends, Query
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, DeleteOne, IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError, ConnectionFailure, DuplicateKeyError, PyMongoError
+from bson import json_util
+import base64
 import os
+import json
 import logging
 import asyncio
+import time
 import resend
 import httpx
 from pathlib import Path
+from collections import OrderedDict, defaultdict
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from typing import Any, Iterable, List, Optional
 import uuid
 import random
+import hashlib
+import re
+import unicodedata
+import numpy as np
 from datetime import datetime, timezone, timedelta
+from zoneinfo import ZoneInfo
+from risk_engine import score_sectors
+from anomaly import AnomalyDetector
+from rules_engine import RuleEngine, CompiledRule
+from batching import AsyncBatcher
+from wal import WriteAheadLog
+from compression import HistoryCompressor, interpolate
+from current_values import CurrentValueBuffer
+from metrics import (
+    MetricsRoute, MongoCommandMetrics, LLM_DURATION, LLM_REQUESTS, LLM_FAILURES,
+    READINGS_RECEIVED, READINGS_REJECTED, READINGS_STORED, DEVIATIONS_DETECTED
+)
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+import synthetic
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB commands slower than this are logged with their filter shape
+MONGO_SLOW_QUERY_MS = float(os.environ.get('MONGO_SLOW_QUERY_MS', '100'))
+
+# MongoDB connection, every command timed for /metrics
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    tz_aware=True,
+    event_listeners=[MongoCommandMetrics(MONGO_SLOW_QUERY_MS)]
+)
 db = client[os.environ['DB_NAME']]
 
 # Resend config
@@ -30,11 +63,138 @@ SENDER_EMAIL = os.environ.get('SENDER_EMAIL', 'onboarding@resend.dev')
 # LLM config
 EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY', '')
 
+# Ingestion config
+BULK_READINGS_MAX = int(os.environ.get('BULK_READINGS_MAX', '10000'))
+
+# Sensor readings live in a time-series collection keyed by sensor
+READINGS_COLLECTION = "sensor_readings"
+READINGS_TIMESERIES = {
+    "timeField": "timestamp",
+    "metaField": "sensor_id",
+    "granularity": "seconds"
+}
+
+# Precomputed history rollups, finest first
+ROLLUP_RESOLUTIONS = {
+    "1m": timedelta(minutes=1),
+    "1h": timedelta(hours=1),
+    "1d": timedelta(days=1)
+}
+
+# Stored history compression per sensor type, see compression.py.
+# Tolerances are in the sensor's unit, types not listed keep every reading.
+# HISTORY_COMPRESSION_SETTINGS (JSON) overrides or adds sensor types.
+HISTORY_COMPRESSION = os.environ.get('HISTORY_COMPRESSION', 'true').lower() == 'true'
+HISTORY_COMPRESSION_SETTINGS = {
+    "temperature": {"method": "swinging_door", "tolerance": 0.2, "max_interval": 900},
+    "humidity": {"method": "swinging_door", "tolerance": 0.5, "max_interval": 900},
+    "energy": {"method": "swinging_door", "tolerance": 2.0, "max_interval": 900},
+    "smoke": {"method": "deadband", "tolerance": 0.5, "max_interval": 900},
+    **json.loads(os.environ.get('HISTORY_COMPRESSION_SETTINGS', '{}'))
+}
+# Current values are written to the sensors collection on status changes,
+# moves beyond CURRENT_VALUE_DEADBAND (a fraction of the threshold range)
+# or after CURRENT_VALUE_MAX_STALENESS seconds, see current_values.py
+CURRENT_VALUE_DEADBAND = float(os.environ.get('CURRENT_VALUE_DEADBAND', '0.01'))
+CURRENT_VALUE_MAX_STALENESS = float(os.environ.get('CURRENT_VALUE_MAX_STALENESS', '30'))
+CURRENT_VALUE_FLUSH_INTERVAL = float(os.environ.get('CURRENT_VALUE_FLUSH_INTERVAL', '5'))
+
+# Most points an interpolated history request returns
+HISTORY_MAX_POINTS = int(os.environ.get('HISTORY_MAX_POINTS', '10000'))
+
+# Cache config
+SENSOR_CACHE_SIZE = int(os.environ.get('SENSOR_CACHE_SIZE', '10000'))
+SENSOR_CACHE_TTL = float(os.environ.get('SENSOR_CACHE_TTL', '300'))
+SESSION_CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE', '10000'))
+# Also how long other workers may keep accepting a session after logout
+SESSION_CACHE_TTL = float(os.environ.get('SESSION_CACHE_TTL', '30'))
+DASHBOARD_CACHE_TTL = float(os.environ.get('DASHBOARD_CACHE_TTL', '5'))
+# How long a worker reuses the shared content version before reading it again
+CONTENT_VERSION_TTL = float(os.environ.get('CONTENT_VERSION_TTL', '1'))
+
+# Risk analysis cache config
+RISK_ANALYSIS_CACHE_SIZE = int(os.environ.get('RISK_ANALYSIS_CACHE_SIZE', '1000'))
+RISK_ANALYSIS_CACHE_TTL = float(os.environ.get('RISK_ANALYSIS_CACHE_TTL', '900'))
+
+# Concurrent LLM calls per batch risk analysis
+RISK_ANALYSIS_CONCURRENCY = int(os.environ.get('RISK_ANALYSIS_CONCURRENCY', '4'))
+RISK_BATCH_MAX_SECTORS = int(os.environ.get('RISK_BATCH_MAX_SECTORS', '100'))
+
+# Local risk score from which the LLM is asked for prescriptive actions
+RISK_LLM_THRESHOLD = float(os.environ.get('RISK_LLM_THRESHOLD', '40'))
+
+# Per-sensor deviation detection config, see anomaly.py. With the
+# defaults a reading is a spike beyond 4 running standard deviations, a
+# drift once the CUSUM of z-scores beyond 0.5 passes 8 (about 16 readings
+# of a one sigma shift), nothing is reported for a sensor's first 30
+# readings nor within 5 minutes of its last report. Steady gaussian noise
+# still reports about one spike per 3000 readings.
+ANOMALY_ALPHA = float(os.environ.get('ANOMALY_ALPHA', '0.05'))
+ANOMALY_Z_THRESHOLD = float(os.environ.get('ANOMALY_Z_THRESHOLD', '4'))
+ANOMALY_CUSUM_K = float(os.environ.get('ANOMALY_CUSUM_K', '0.5'))
+ANOMALY_CUSUM_H = float(os.environ.get('ANOMALY_CUSUM_H', '8'))
+ANOMALY_WARMUP = int(os.environ.get('ANOMALY_WARMUP', '30'))
+ANOMALY_COOLDOWN = float(os.environ.get('ANOMALY_COOLDOWN', '300'))
+
+# MQTT gateway config, see mqtt_gateway.py
+MQTT_ENABLED = os.environ.get('MQTT_ENABLED', 'false').lower() == 'true'
+MQTT_HOST = os.environ.get('MQTT_HOST', 'localhost')
+MQTT_PORT = int(os.environ.get('MQTT_PORT', '1883'))
+MQTT_USERNAME = os.environ.get('MQTT_USERNAME') or None
+MQTT_PASSWORD = os.environ.get('MQTT_PASSWORD') or None
+MQTT_TOPIC_PREFIX = os.environ.get('MQTT_TOPIC_PREFIX', 'guardianfire/sensors')
+MQTT_QOS = int(os.environ.get('MQTT_QOS', '1'))
+# The gateway's own write-ahead log, used unless it shares the API's write-behind
+MQTT_WAL_DIR = Path(os.environ.get('MQTT_WAL_DIR', str(ROOT_DIR / 'mqtt_wal')))
+
+# Batched ingestion: flush at INGEST_BATCH_SIZE readings or after
+# INGEST_LINGER seconds, block producers past INGEST_MAX_PENDING
+INGEST_BATCH_SIZE = int(os.environ.get('INGEST_BATCH_SIZE', '1000'))
+INGEST_LINGER = float(os.environ.get('INGEST_LINGER', '0.05'))
+INGEST_MAX_PENDING = int(os.environ.get('INGEST_MAX_PENDING', '50000'))
+
+# Write-behind for single readings: acknowledge once in the local
+# write-ahead log, commit to MongoDB in groups using the INGEST_* batching
+WRITE_BEHIND = os.environ.get('WRITE_BEHIND', 'false').lower() == 'true'
+WAL_DIR = Path(os.environ.get('WAL_DIR', str(ROOT_DIR / 'wal')))
+WAL_FSYNC = os.environ.get('WAL_FSYNC', 'false').lower() == 'true'
+WAL_SEGMENT_BYTES = int(os.environ.get('WAL_SEGMENT_BYTES', str(64 * 1024 * 1024)))
+WRITE_BEHIND_STOP_TIMEOUT = float(os.environ.get('WRITE_BEHIND_STOP_TIMEOUT', '10'))
+# Commits MongoDB rejects are tried this many times before their readings
+# go to a dead-letter file; commits failing because it is unreachable are
+# retried until it is back
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.environ.get('WRITE_BEHIND_MAX_ATTEMPTS', '5'))
+
+# Rules engine config
+RULES_RELOAD_INTERVAL = float(os.environ.get('RULES_RELOAD_INTERVAL', '30'))
+PLANT_TIMEZONE = ZoneInfo(os.environ.get('PLANT_TIMEZONE', 'America/Sao_Paulo'))
+NIGHT_SHIFT_START = int(os.environ.get('NIGHT_SHIFT_START', '22'))
+NIGHT_SHIFT_END = int(os.environ.get('NIGHT_SHIFT_END', '6'))
+
+# Synthetic plant generator config, see synthetic.py
+SYNTHETIC_MAX_READINGS = int(os.environ.get('SYNTHETIC_MAX_READINGS', '5000000'))
+SYNTHETIC_BATCH_SIZE = int(os.environ.get('SYNTHETIC_BATCH_SIZE', '10000'))
+SYNTHETIC_WRITE_CONCURRENCY = int(os.environ.get('SYNTHETIC_WRITE_CONCURRENCY', '4'))
+
+# Active alerts not acknowledged within this many minutes are overdue
+ALERT_ACK_DEADLINE_MINUTES = float(os.environ.get('ALERT_ACK_DEADLINE_MINUTES', '30'))
+
+# Work orders past their due date in these statuses are overdue
+OPEN_WORK_ORDER_STATUSES = ["pending", "in_progress"]
+
+# List routes return their projected documents encoded with orjson instead
+# of validating every item through the response model, see list_response
+FAST_LIST_RESPONSES = os.environ.get('FAST_LIST_RESPONSES', 'false').lower() == 'true'
+
+# Push channel config
+EVENTS_QUEUE_SIZE = int(os.environ.get('EVENTS_QUEUE_SIZE', '256'))
+EVENTS_KEEPALIVE = float(os.environ.get('EVENTS_KEEPALIVE', '15'))
+
 # Create the main app
 app = FastAPI(title="GuardianFire AI")
 
-# Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+# Create a router with the /api prefix, its routes timed for /metrics
+api_router = APIRouter(prefix="/api", route_class=MetricsRoute)
 
 # Configure logging
 logging.basicConfig(
@@ -78,6 +238,7 @@ class Sensor(BaseModel):
     max_threshold: float = 100.0
     status: str = "normal"  # normal, warning, critical
     last_reading: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class SensorCreate(BaseModel):
     sector_id: str
@@ -97,14 +258,17 @@ class Alert(BaseModel):
     alert_id: str = Field(default_factory=lambda: f"alert_{uuid.uuid4().hex[:8]}")
     sector_id: str
     sensor_id: Optional[str] = None
-    alert_type: str  # prediction, incident, maintenance
+    alert_type: str  # prediction, incident, maintenance, deviation, rule
     severity: str  # low, medium, high, critical
     title: str
     description: str
     probability: float  # 0-100
     prescribed_action: str
     status: str = "active"  # active, acknowledged, resolved
+    dedup_key: Optional[str] = None  # sha1 of sector, sensor, type and normalized title
+    occurrences: int = 1
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    last_seen_at: Optional[datetime] = None
     resolved_at: Optional[datetime] = None
 
 class AlertCreate(BaseModel):
@@ -173,19 +337,541 @@ class EmailRequest(BaseModel):
 class RiskAnalysisRequest(BaseModel):
     sector_id: str
 
+class SyntheticPlantRequest(BaseModel):
+    sectors: int = Field(10, ge=1, le=10000)
+    sensors_per_sector: int = Field(5, ge=1, le=1000)
+    days: float = Field(1.0, gt=0, le=365)
+    interval_seconds: float = Field(60.0, ge=1)
+    alerts_per_sector: int = Field(5, ge=0)
+    work_orders_per_sector: int = Field(3, ge=0)
+    reports_per_sector: int = Field(3, ge=0)
+    rollups: bool = True
+    seed: int = 42
+
+class RuleCondition(BaseModel):
+    field: str  # value, status, sensor_type, probability, severity, alert_type, sector_id, sensor_id, hour, shift
+    op: str  # >, >=, <, <=, ==, !=, in, not_in
+    value: Any
+
+class Rule(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    rule_id: str = Field(default_factory=lambda: f"rule_{uuid.uuid4().hex[:8]}")
+    name: str
+    event: str = "reading"  # reading, alert
+    sector_id: Optional[str] = None
+    sensor_type: Optional[str] = None
+    conditions: List[RuleCondition]
+    actions: List[str] = ["alert"]  # alert, work_order
+    severity: str = "high"  # low, medium, high, critical
+    title: Optional[str] = None
+    prescribed_action: str = ""
+    cooldown_seconds: float = 300
+    enabled: bool = True
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class RuleCreate(BaseModel):
+    name: str
+    event: str = "reading"
+    sector_id: Optional[str] = None
+    sensor_type: Optional[str] = None
+    conditions: List[RuleCondition]
+    actions: List[str] = ["alert"]
+    severity: str = "high"
+    title: Optional[str] = None
+    prescribed_action: str = ""
+    cooldown_seconds: float = 300
+    enabled: bool = True
+
+class BatchRiskAnalysisRequest(BaseModel):
+    sector_ids: List[str]
+
+# ============== CACHES ==============
+
+class TTLCache:
+    """Bounded in-process LRU cache with per-entry expiry"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._epoch = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] < time.monotonic():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+        self._epoch += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._epoch += 1
+
+    async def get_or_load(self, key, loader, ttl: Optional[float] = None):
+        """Return the cached value, running loader once for concurrent misses"""
+        value = self.get(key)
+        if value is not None:
+            return value
+        pending = self._inflight.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._load(key, loader, ttl))
+            self._inflight[key] = pending
+        return await asyncio.shield(pending)
+
+    async def _load(self, key, loader, ttl: Optional[float]):
+        epoch = self._epoch
+        try:
+            value = await loader()
+            # Don't cache a result that was invalidated while it was loading
+            if epoch == self._epoch:
+                self.set(key, value, ttl)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+# Sensor fields needed on the reading hot path
+SENSOR_META_PROJECTION = {
+    "_id": 0,
+    "sensor_id": 1,
+    "sector_id": 1,
+    "name": 1,
+    "sensor_type": 1,
+    "unit": 1,
+    "min_threshold": 1,
+    "max_threshold": 1,
+    "status": 1
+}
+
+sensor_meta_cache = TTLCache(SENSOR_CACHE_SIZE, SENSOR_CACHE_TTL)
+
+# Session token -> (User, session expiry), never used past that expiry
+session_cache = TTLCache(SESSION_CACHE_SIZE, SESSION_CACHE_TTL)
+
+# Dashboard stats, shared by every viewer for DASHBOARD_CACHE_TTL seconds
+dashboard_cache = TTLCache(1, DASHBOARD_CACHE_TTL)
+
+# Encoded dashboard snapshot, keyed by the content version it was built at
+snapshot_cache = TTLCache(1, 300)
+
+# LLM risk analyses, keyed by sector and a fingerprint of the prompt inputs
+risk_analysis_cache = TTLCache(RISK_ANALYSIS_CACHE_SIZE, RISK_ANALYSIS_CACHE_TTL)
+
+CACHES = {
+    "sensor_meta": sensor_meta_cache,
+    "sessions": session_cache,
+    "dashboard": dashboard_cache,
+    "snapshot": snapshot_cache,
+    "risk_analysis": risk_analysis_cache
+}
+
+class ContentVersion:
+    """Counter bumped on every change visible on the dashboard
+
+    The counter is kept in MongoDB so that every API worker and the MQTT
+    gateway see each other's changes. bump() only counts in memory; a
+    background task adds the count with one $inc, however many bumps
+    arrive while the previous write is in flight.
+
+    The shared counter is read at most once per ttl seconds, with this
+    worker's own bumps added on top in between, so revalidating an ETag
+    usually does not touch MongoDB. Changes from other workers show up
+    within ttl.
+    """
+
+    def __init__(self, key: str = "dashboard", ttl: float = CONTENT_VERSION_TTL):
+        self.key = key
+        self.ttl = ttl
+        self.pending = 0
+        self._task = None
+        self.bumps = 0
+        self._shared = None
+        self._read_at = 0.0
+        # Bumps of this worker the shared counter read may not include
+        self._unread_from = 0
+
+    def bump(self):
+        self.pending += 1
+        self.bumps += 1
+        if self._task is None:
+            try:
+                self._task = asyncio.get_running_loop().create_task(self._write())
+            except RuntimeError:
+                # No event loop: written by the next flush
+                pass
+
+    async def _write(self):
+        try:
+            while self.pending:
+                count, self.pending = self.pending, 0
+                try:
+                    await db.content_versions.update_one(
+                        {"_id": self.key},
+                        # A new epoch if the counter is ever dropped and restarts
+                        {"$inc": {"value": count}, "$setOnInsert": {"epoch": uuid.uuid4().hex[:8]}},
+                        upsert=True
+                    )
+                except PyMongoError as e:
+                    # Kept in the local ETag until a later bump writes it
+                    self.pending += count
+                    logger.warning(f"Content version update failed: {e}")
+                    return
+        finally:
+            self._task = None
+
+    async def flush(self):
+        """Wait for bumps made so far to reach MongoDB"""
+        if self._task is None and self.pending:
+            self._task = asyncio.create_task(self._write())
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    async def etag(self) -> str:
+        if self._shared is None or time.monotonic() - self._read_at >= self.ttl:
+            await self.flush()
+            # Bumps whose write failed, or made during the read, may be
+            # missing from it; counting one twice only changes the ETag
+            unread_from = self.bumps - self.pending
+            self._shared = await db.content_versions.find_one({"_id": self.key}) or {}
+            self._read_at = time.monotonic()
+            self._unread_from = unread_from
+        return f'W/"{self._shared.get("epoch", "0")}-{self._shared.get("value", 0) + self.bumps - self._unread_from}"'
+
+content_version = ContentVersion()
+
+def invalidate_dashboard_stats():
+    """Drop cached dashboard stats after a write that changes them"""
+    dashboard_cache.clear()
+    content_version.bump()
+
+async def get_sensor_meta(sensor_id: str) -> Optional[dict]:
+    """Get sensor thresholds from cache, falling back to MongoDB"""
+    meta = sensor_meta_cache.get(sensor_id)
+    if meta is None:
+        meta = await db.sensors.find_one({"sensor_id": sensor_id}, SENSOR_META_PROJECTION)
+        if meta:
+            sensor_meta_cache.set(sensor_id, meta)
+    return meta
+
+async def get_sensor_meta_many(sensor_ids: List[str]) -> dict:
+    """Get sensor thresholds for many sensors with at most one query"""
+    found = {}
+    missing = []
+    for sensor_id in sensor_ids:
+        meta = sensor_meta_cache.get(sensor_id)
+        if meta is None:
+            missing.append(sensor_id)
+        else:
+            found[sensor_id] = meta
+    
+    if missing:
+        sensors = await db.sensors.find(
+            {"sensor_id": {"$in": missing}},
+            SENSOR_META_PROJECTION
+        ).to_list(len(missing))
+        for meta in sensors:
+            sensor_meta_cache.set(meta["sensor_id"], meta)
+            found[meta["sensor_id"]] = meta
+    return found
+
+# ============== INDEXES ==============
+
+# Indexes per collection, shaped after the route queries that use them
+INDEXES = {
+    "users": [
+        IndexModel([("user_id", ASCENDING)], unique=True),
+        IndexModel([("email", ASCENDING)], unique=True),
+    ],
+    "user_sessions": [
+        IndexModel([("session_token", ASCENDING)], unique=True),
+        # Mongo removes sessions once expires_at has passed
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "sectors": [
+        IndexModel([("sector_id", ASCENDING)], unique=True),
+        IndexModel([("created_at", ASCENDING), ("sector_id", ASCENDING)]),
+    ],
+    "sensors": [
+        IndexModel([("sensor_id", ASCENDING)], unique=True),
+        IndexModel([("created_at", ASCENDING), ("sensor_id", ASCENDING)]),
+        IndexModel([("sector_id", ASCENDING), ("created_at", ASCENDING), ("sensor_id", ASCENDING)]),
+        IndexModel([("status", ASCENDING)]),
+    ],
+    READINGS_COLLECTION: [
+        IndexModel([("sensor_id", ASCENDING), ("timestamp", DESCENDING)]),
+    ],
+    "history_held": [
+        IndexModel([("sensor_id", ASCENDING)], unique=True),
+    ],
+    "sensor_rollups": [
+        IndexModel(
+            [("sensor_id", ASCENDING), ("resolution", ASCENDING), ("bucket", ASCENDING)],
+            unique=True
+        ),
+    ],
+    "alerts": [
+        IndexModel([("alert_id", ASCENDING)], unique=True),
+        IndexModel([("created_at", DESCENDING), ("alert_id", DESCENDING)]),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("alert_id", DESCENDING)]),
+        IndexModel([("sector_id", ASCENDING), ("created_at", DESCENDING), ("alert_id", DESCENDING)]),
+        IndexModel([
+            ("sector_id", ASCENDING), ("status", ASCENDING),
+            ("created_at", DESCENDING), ("alert_id", DESCENDING)
+        ]),
+        # At most one active alert per concern; resolved ones leave the index
+        IndexModel(
+            [("dedup_key", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"status": "active", "dedup_key": {"$exists": True}}
+        ),
+    ],
+    "work_orders": [
+        IndexModel([("order_id", ASCENDING)], unique=True),
+        IndexModel([("created_at", DESCENDING), ("order_id", DESCENDING)]),
+        IndexModel([("sector_id", ASCENDING), ("created_at", DESCENDING), ("order_id", DESCENDING)]),
+        # due_date trails the sort keys so overdue pages are read in order
+        # and filtered on index keys alone
+        IndexModel([
+            ("status", ASCENDING),
+            ("created_at", DESCENDING), ("order_id", DESCENDING), ("due_date", ASCENDING)
+        ]),
+        IndexModel([
+            ("sector_id", ASCENDING), ("status", ASCENDING),
+            ("created_at", DESCENDING), ("order_id", DESCENDING), ("due_date", ASCENDING)
+        ]),
+        IndexModel([
+            ("priority", ASCENDING), ("status", ASCENDING),
+            ("created_at", DESCENDING), ("order_id", DESCENDING), ("due_date", ASCENDING)
+        ]),
+    ],
+    "behavioral_reports": [
+        IndexModel([("report_id", ASCENDING)], unique=True),
+        IndexModel([("created_at", DESCENDING), ("report_id", DESCENDING)]),
+        IndexModel([("sector_id", ASCENDING), ("created_at", DESCENDING), ("report_id", DESCENDING)]),
+    ],
+    "context_variables": [
+        IndexModel([("timestamp", DESCENDING)]),
+    ],
+    "rules": [
+        IndexModel([("rule_id", ASCENDING)], unique=True),
+        IndexModel([("created_at", ASCENDING), ("rule_id", ASCENDING)]),
+        IndexModel([("event", ASCENDING), ("created_at", ASCENDING), ("rule_id", ASCENDING)]),
+        IndexModel([("sector_id", ASCENDING), ("created_at", ASCENDING), ("rule_id", ASCENDING)]),
+    ],
+}
+
+async def ensure_indexes():
+    """Create every registered index; existing identical indexes are a no-op"""
+    for collection, indexes in INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except Exception as e:
+            logger.error(f"Failed to create indexes on {collection}: {e}")
+
+# ============== DATE HELPERS ==============
+
+def ensure_datetime(value):
+    """Coerce an ISO string or naive datetime into an aware UTC datetime"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value is not None and value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+def created_at_window(query: dict, since: Optional[datetime], until: Optional[datetime]) -> dict:
+    """Restrict a list query to items created in [since, until)"""
+    since = ensure_datetime(since)
+    until = ensure_datetime(until)
+    if since and until and since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    window = {}
+    if since:
+        window["$gte"] = since
+    if until:
+        window["$lt"] = until
+    if window:
+        query["created_at"] = window
+    return query
+
+# ============== EVENT STREAM ==============
+
+class EventBroker:
+    """Fan out change events to server-sent event subscribers
+
+    Each event is encoded once and handed to the bounded queue of every
+    matching subscriber. A subscriber that falls behind loses its oldest
+    events rather than slowing down the publisher.
+
+    The broker lives in one process: a subscriber only hears about changes
+    made by the worker it is connected to. With several API workers, or
+    an MQTT gateway running outside the API, /events misses the others'
+    changes; serve it from a single worker that also runs the gateway, or
+    publish from MongoDB change streams, which need a replica set.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.published = 0
+        self.dropped = 0
+        self._all = set()
+        self._by_sector = defaultdict(set)
+        self._filters = {}
+
+    def subscribe(self, sector_id: Optional[str] = None) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._filters[queue] = sector_id
+        if sector_id:
+            self._by_sector[sector_id].add(queue)
+        else:
+            self._all.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        sector_id = self._filters.pop(queue, None)
+        if sector_id:
+            subscribers = self._by_sector[sector_id]
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._by_sector[sector_id]
+        else:
+            self._all.discard(queue)
+
+    def publish(self, event_type: str, data: dict, sector_id: Optional[str] = None):
+        self.published += 1
+        targets = self._all | self._by_sector.get(sector_id, set()) if sector_id else self._all
+        if not targets:
+            return
+        
+        payload = f"event: {event_type}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+        for queue in targets:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(payload)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._filters),
+            "published": self.published,
+            "dropped": self.dropped
+        }
+
+event_broker = EventBroker(EVENTS_QUEUE_SIZE)
+
+# ============== PAGINATION ==============
+
+def encode_cursor(created_at, last_id: str) -> str:
+    """Encode the sort key of the last item of a page as an opaque cursor"""
+    raw = json_util.dumps([created_at, last_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> list:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, last_id = json_util.loads(raw)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return [created_at, last_id]
+
+def model_projection(model) -> dict:
+    """Projection keeping only the fields of a response model"""
+    return {"_id": 0, **{name: 1 for name in model.model_fields}}
+
+async def paginate(
+    collection,
+    query: dict,
+    id_field: str,
+    limit: int,
+    cursor: Optional[str],
+    response: Response,
+    descending: bool = True,
+    projection: Optional[dict] = None
+) -> List[dict]:
+    """Return one page ordered by (created_at, id) using keyset pagination
+
+    The cursor for the next page is sent in the X-Next-Cursor header and
+    is absent on the last page. Documents without created_at sort before
+    every date, so they come last going down and first going up.
+    """
+    direction = DESCENDING if descending else ASCENDING
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        op = "$lt" if descending else "$gt"
+        if created_at is None:
+            # Comparing with null matches nothing; going up, every dated document follows
+            after = [{"created_at": {"$ne": None}}] if not descending else []
+        else:
+            after = [{"created_at": {op: created_at}}]
+            if descending:
+                after.append({"created_at": None})
+        after.append({"created_at": created_at, id_field: {op: last_id}})
+        query = {"$and": [query, {"$or": after}]}
+    
+    docs = await collection.find(query, projection or {"_id": 0}).sort(
+        [("created_at", direction), (id_field, direction)]
+    ).limit(limit + 1).to_list(limit + 1)
+    
+    if len(docs) > limit:
+        docs = docs[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(docs[-1].get("created_at"), docs[-1][id_field])
+    return docs
+
+def list_response(docs: List[dict], response: Response):
+    """Send a page of documents, encoded directly when FAST_LIST_RESPONSES is on
+
+    The fast path trusts documents projected with model_projection and
+    written by this API, skipping the route's response_model, so fields
+    missing from old documents are left out instead of defaulted.
+    Headers set on response, such as X-Next-Cursor, are carried over.
+    """
+    if not FAST_LIST_RESPONSES:
+        return docs
+    headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return ORJSONResponse(docs, headers=headers)
+
 # ============== AUTH HELPERS ==============
 
-async def get_current_user(request: Request) -> Optional[User]:
-    """Get user from session token in cookie or Authorization header"""
+def get_session_token(request: Request) -> Optional[str]:
+    """Get session token from cookie or Authorization header"""
     session_token = request.cookies.get("session_token")
     if not session_token:
         auth_header = request.headers.get("Authorization")
         if auth_header and auth_header.startswith("Bearer "):
             session_token = auth_header.split(" ")[1]
-    
-    if not session_token:
-        return None
-    
+    return session_token
+
+async def load_session_user(session_token: str) -> Optional[tuple]:
+    """Look up the user of a session and when the session expires"""
     session_doc = await db.user_sessions.find_one(
         {"session_token": session_token},
         {"_id": 0}
@@ -194,15 +880,6 @@ async def get_current_user(request: Request) -> Optional[User]:
     if not session_doc:
         return None
     
-    expires_at = session_doc.get("expires_at")
-    if isinstance(expires_at, str):
-        expires_at = datetime.fromisoformat(expires_at)
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
-    
-    if expires_at < datetime.now(timezone.utc):
-        return None
-    
     user_doc = await db.users.find_one(
         {"user_id": session_doc["user_id"]},
         {"_id": 0}
@@ -211,7 +888,23 @@ async def get_current_user(request: Request) -> Optional[User]:
     if not user_doc:
         return None
     
-    return User(**user_doc)
+    return User(**user_doc), ensure_datetime(session_doc.get("expires_at"))
+
+async def get_current_user(request: Request) -> Optional[User]:
+    """Get user from session token in cookie or Authorization header"""
+    session_token = get_session_token(request)
+    if not session_token:
+        return None
+    
+    # Loaded through the cache so a logout during the lookup is not undone
+    session = await session_cache.get_or_load(session_token, lambda: load_session_user(session_token))
+    if session is None:
+        return None
+    
+    user, expires_at = session
+    if expires_at <= datetime.now(timezone.utc):
+        return None
+    return user
 
 # ============== AUTH ROUTES ==============
 
@@ -265,7 +958,7 @@ async def create_session(request: Request, response: Response):
     await db.user_sessions.insert_one({
         "user_id": user_id,
         "session_token": session_token,
-        "expires_at": expires_at.isoformat(),
+        "expires_at": expires_at,
         "created_at": datetime.now(timezone.utc).isoformat()
     })
     
@@ -294,27 +987,36 @@ async def get_me(request: Request):
 @api_router.post("/auth/logout")
 async def logout(request: Request, response: Response):
     """Logout user"""
-    session_token = request.cookies.get("session_token")
+    session_token = get_session_token(request)
     if session_token:
+        # Invalidated after the delete, so no lookup can cache it again
         await db.user_sessions.delete_one({"session_token": session_token})
+        session_cache.invalidate(session_token)
     response.delete_cookie("session_token", path="/")
     return {"message": "Logged out"}
 
 # ============== SECTOR ROUTES ==============
 
 @api_router.get("/sectors", response_model=List[Sector])
-async def get_sectors():
-    """Get all sectors"""
-    sectors = await db.sectors.find({}, {"_id": 0}).to_list(100)
-    return sectors
+async def get_sectors(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None
+):
+    """Get sectors, oldest first, one page at a time"""
+    sectors = await paginate(
+        db.sectors, {}, "sector_id", limit, cursor, response,
+        descending=False, projection=model_projection(Sector)
+    )
+    return list_response(sectors, response)
 
 @api_router.post("/sectors", response_model=Sector)
 async def create_sector(sector_data: SectorCreate):
     """Create a new sector"""
     sector = Sector(**sector_data.model_dump())
     doc = sector.model_dump()
-    doc["created_at"] = doc["created_at"].isoformat()
     await db.sectors.insert_one(doc)
+    invalidate_dashboard_stats()
     return sector
 
 @api_router.get("/sectors/{sector_id}", response_model=Sector)
@@ -332,16 +1034,536 @@ async def update_sector_risk(sector_id: str, risk_level: float, status: str):
         {"sector_id": sector_id},
         {"$set": {"risk_level": risk_level, "status": status}}
     )
+    invalidate_dashboard_stats()
+    event_broker.publish(
+        "sector.risk",
+        {"sector_id": sector_id, "risk_level": risk_level, "status": status},
+        sector_id
+    )
     return {"message": "Risk updated"}
 
+# ============== SENSOR HISTORY ROLLUPS ==============
+
+def rollup_bucket(timestamp: datetime, resolution: str) -> datetime:
+    """Floor a timestamp to the start of its rollup bucket"""
+    step = int(ROLLUP_RESOLUTIONS[resolution].total_seconds())
+    epoch = int(ensure_datetime(timestamp).timestamp())
+    return datetime.fromtimestamp(epoch - epoch % step, tz=timezone.utc)
+
+def rollup_aggregates(readings: Iterable[dict], buckets: Optional[dict] = None) -> dict:
+    """Fold readings into aggregates keyed by (sensor_id, resolution, bucket)"""
+    buckets = {} if buckets is None else buckets
+    for reading in readings:
+        value = reading["value"]
+        timestamp = ensure_datetime(reading["timestamp"])
+        for resolution in ROLLUP_RESOLUTIONS:
+            key = (reading["sensor_id"], resolution, rollup_bucket(timestamp, resolution))
+            agg = buckets.get(key)
+            if agg is None:
+                buckets[key] = {
+                    "min": value, "max": value, "sum": value, "count": 1,
+                    "last": value, "last_at": timestamp
+                }
+                continue
+            agg["min"] = min(agg["min"], value)
+            agg["max"] = max(agg["max"], value)
+            agg["sum"] += value
+            agg["count"] += 1
+            if timestamp >= agg["last_at"]:
+                agg["last"] = value
+                agg["last_at"] = timestamp
+    return buckets
+
+def rollup_operations(readings: List[dict]) -> List[UpdateOne]:
+    """Build one upsert per sensor/resolution/bucket touched by the readings"""
+    buckets = rollup_aggregates(readings)
+    # Pipeline updates keep "last" correct even when readings arrive out of order
+    return [
+        UpdateOne(
+            {"sensor_id": sensor_id, "resolution": resolution, "bucket": bucket},
+            [{"$set": {
+                "min": {"$min": ["$min", agg["min"]]},
+                "max": {"$max": ["$max", agg["max"]]},
+                "sum": {"$add": [{"$ifNull": ["$sum", 0]}, agg["sum"]]},
+                "count": {"$add": [{"$ifNull": ["$count", 0]}, agg["count"]]},
+                "last": {"$cond": [
+                    {"$gte": [agg["last_at"], {"$ifNull": ["$last_at", agg["last_at"]]}]},
+                    agg["last"],
+                    "$last"
+                ]},
+                "last_at": {"$max": ["$last_at", agg["last_at"]]}
+            }}],
+            upsert=True
+        )
+        for (sensor_id, resolution, bucket), agg in buckets.items()
+    ]
+
+def pick_rollup_resolution(start: datetime, end: datetime, max_points: int) -> str:
+    """Pick the finest rollup whose bucket count over the range fits in max_points"""
+    span = end - start
+    for resolution, step in ROLLUP_RESOLUTIONS.items():
+        if span / step <= max_points:
+            return resolution
+    return "1d"
+
+# ============== HISTORY COMPRESSION ==============
+
+# Decides which readings are stored in sensor_readings; rollups still
+# aggregate every reading. The reading each sensor holds back is mirrored
+# in history_held, so a crash does not lose it once its batch is written
+history_compressor = HistoryCompressor(HISTORY_COMPRESSION_SETTINGS if HISTORY_COMPRESSION else {})
+
+def compress_reading(sensor: dict, reading: SensorReading, force: bool) -> List[dict]:
+    """History documents to store for a reading, often none"""
+    return [
+        {"sensor_id": sensor["sensor_id"], "value": value, "timestamp": timestamp}
+        for timestamp, value in history_compressor.update(
+            sensor["sensor_id"],
+            sensor.get("sensor_type"),
+            reading.value,
+            ensure_datetime(reading.timestamp),
+            force
+        )
+    ]
+
+def held_history_writes(sensor_ids) -> list:
+    """Mirror the readings held back for these sensors into history_held"""
+    writes = []
+    for sensor_id in sensor_ids:
+        held = history_compressor.pending(sensor_id)
+        if held:
+            timestamp, value = held
+            writes.append(UpdateOne(
+                {"sensor_id": sensor_id},
+                {"$set": {"timestamp": timestamp, "value": value}},
+                upsert=True
+            ))
+        else:
+            writes.append(DeleteOne({"sensor_id": sensor_id}))
+    return writes
+
+async def flush_compressed_history():
+    """Store the readings the compressor still holds back"""
+    held = history_compressor.flush()
+    if held:
+        await db.sensor_readings.insert_many(
+            [{"sensor_id": sensor_id, "value": value, "timestamp": timestamp} for sensor_id, timestamp, value in held],
+            ordered=False
+        )
+        await db.history_held.delete_many({"sensor_id": {"$in": [sensor_id for sensor_id, _, _ in held]}})
+        logger.info(f"Stored {len(held)} held back readings")
+
+async def store_held_history():
+    """Store the held back readings a previous run left in history_held
+
+    Readings already in the history, e.g. flushed before the document
+    was removed, are not stored twice.
+    """
+    held = await db.history_held.find({}, {"_id": 0}).to_list(None)
+    if not held:
+        return
+    stored = await db.sensor_readings.find(
+        {"$or": [{"sensor_id": h["sensor_id"], "timestamp": h["timestamp"]} for h in held]},
+        {"_id": 0, "sensor_id": 1, "timestamp": 1}
+    ).to_list(None)
+    stored = {(r["sensor_id"], ensure_datetime(r["timestamp"])) for r in stored}
+    missing = [h for h in held if (h["sensor_id"], ensure_datetime(h["timestamp"])) not in stored]
+    if missing:
+        await db.sensor_readings.insert_many(missing, ordered=False)
+    await db.history_held.delete_many({"sensor_id": {"$in": [h["sensor_id"] for h in held]}})
+    logger.info(f"Stored {len(missing)} readings held back by a previous run")
+
+# ============== CURRENT VALUES ==============
+
+# Latest reading per sensor, ahead of the sensors collection between writes
+current_values = CurrentValueBuffer(CURRENT_VALUE_MAX_STALENESS)
+
+def current_value_deadband(sensor: dict) -> float:
+    return CURRENT_VALUE_DEADBAND * abs(sensor["max_threshold"] - sensor["min_threshold"])
+
+def current_value_update(value: float, status: str, timestamp: datetime) -> dict:
+    return {"$set": {
+        "current_value": value,
+        "status": status,
+        "last_reading": timestamp.isoformat()
+    }}
+
+async def flush_current_values(stale_only: bool = True):
+    """Write the current values the sensors collection is behind on"""
+    taken = current_values.take_dirty(stale_only)
+    if not taken:
+        return
+    try:
+        await db.sensors.bulk_write([
+            UpdateOne({"sensor_id": sensor_id}, current_value_update(value, status, timestamp))
+            for sensor_id, value, status, timestamp in taken
+        ], ordered=False)
+    except Exception:
+        current_values.mark_dirty(sensor_id for sensor_id, *_ in taken)
+        raise
+
+async def write_current_values(updates: dict):
+    """Write current values through, handing them to the flusher if that fails
+
+    updates maps sensor ids to their UpdateOne. A value counted as
+    written by current_values.update must reach MongoDB somehow, so on
+    failure its sensor is marked dirty before the error is raised.
+    """
+    try:
+        await db.sensors.bulk_write(list(updates.values()), ordered=False)
+    except Exception:
+        current_values.mark_dirty(updates)
+        raise
+
+async def flush_current_values_periodically():
+    while True:
+        await asyncio.sleep(CURRENT_VALUE_FLUSH_INTERVAL)
+        try:
+            await flush_current_values()
+        except Exception as e:
+            logger.error(f"Current value flush failed: {e}")
+
+# ============== DEVIATION DETECTION ==============
+
+# Learns each sensor's normal behaviour from the readings it ingests
+anomaly_detector = AnomalyDetector(
+    alpha=ANOMALY_ALPHA,
+    z_threshold=ANOMALY_Z_THRESHOLD,
+    cusum_k=ANOMALY_CUSUM_K,
+    cusum_h=ANOMALY_CUSUM_H,
+    warmup=ANOMALY_WARMUP,
+    cooldown=ANOMALY_COOLDOWN
+)
+
+def deviation_alert(sensor: dict, deviation: dict) -> Alert:
+    """Build the alert for a reading that left the sensor's usual behaviour"""
+    titles = {
+        "spike": "Desvio súbito",
+        "drift_up": "Deriva ascendente",
+        "drift_down": "Deriva descendente"
+    }
+    unit = sensor.get("unit", "")
+    return Alert(
+        sector_id=sensor["sector_id"],
+        sensor_id=sensor["sensor_id"],
+        alert_type="deviation",
+        severity="high" if deviation["kind"] == "spike" else "medium",
+        title=f"{titles[deviation['kind']]} em {sensor.get('name', sensor['sensor_id'])}",
+        description=(
+            f"Leitura de {deviation['value']}{unit} fora do comportamento habitual "
+            f"(média {deviation['expected']}{unit}, desvio padrão {deviation['std']}{unit}, "
+            f"z={deviation['z_score']})"
+        ),
+        probability=deviation["probability"],
+        prescribed_action="Inspecionar o equipamento monitorado antes que atinja o limite"
+    )
+
+# ============== RULES ENGINE ==============
+
+# Compiled rules, swapped whole on every reload
+rule_engine = RuleEngine()
+
+# Work order priority for each rule severity
+RULE_PRIORITIES = {"critical": "urgent", "high": "high", "medium": "medium", "low": "low"}
+
+def shift_fields(timestamp: datetime) -> dict:
+    """Plant-local hour and shift of an event, for rule conditions"""
+    hour = ensure_datetime(timestamp).astimezone(PLANT_TIMEZONE).hour
+    if NIGHT_SHIFT_START > NIGHT_SHIFT_END:
+        night = hour >= NIGHT_SHIFT_START or hour < NIGHT_SHIFT_END
+    else:
+        night = NIGHT_SHIFT_START <= hour < NIGHT_SHIFT_END
+    return {"hour": hour, "shift": "turno_noite" if night else "turno_dia"}
+
+def reading_event(sensor: dict, reading: SensorReading, status: str) -> dict:
+    """Fields a reading exposes to rules"""
+    return {
+        "sector_id": sensor["sector_id"],
+        "sensor_id": sensor["sensor_id"],
+        "sensor_type": sensor.get("sensor_type"),
+        "value": reading.value,
+        "status": status,
+        **shift_fields(reading.timestamp)
+    }
+
+def alert_event(alert: Alert) -> dict:
+    """Fields an alert exposes to rules"""
+    return {
+        "sector_id": alert.sector_id,
+        "sensor_id": alert.sensor_id,
+        "alert_type": alert.alert_type,
+        "severity": alert.severity,
+        "probability": alert.probability,
+        **shift_fields(alert.created_at)
+    }
+
+def rule_actions(rule: dict, event: dict):
+    """Build the alert and work order a fired rule asks for"""
+    alert = None
+    order = None
+    title = (rule.get("title") or rule["name"])[:100]
+    description = f"Regra '{rule['name']}' disparada: " + ", ".join(
+        f"{c['field']} {c['op']} {c['value']}" for c in rule["conditions"]
+    )
+    if "alert" in rule["actions"]:
+        alert = Alert(
+            sector_id=event["sector_id"],
+            sensor_id=event.get("sensor_id"),
+            alert_type="rule",
+            severity=rule["severity"],
+            title=title,
+            description=description,
+            probability=event.get("probability", 100.0),
+            prescribed_action=rule["prescribed_action"]
+        )
+    if "work_order" in rule["actions"]:
+        order = WorkOrder(
+            alert_id=alert.alert_id if alert else None,
+            sector_id=event["sector_id"],
+            title=title,
+            description=rule["prescribed_action"] or description,
+            priority=RULE_PRIORITIES.get(rule["severity"], "medium")
+        )
+    return alert, order
+
+def run_rules(readings: List[tuple], alerts: List[Alert]):
+    """Evaluate reading and alert rules, returning the alerts and work orders they create
+
+    readings holds (sensor, reading, status) tuples. Alerts created by
+    rules are not fed back into the alert rules.
+    """
+    new_alerts = []
+    new_orders = []
+    
+    def fire(event_type: str, event: dict, timestamp: datetime):
+        for rule in rule_engine.evaluate(event_type, event, timestamp):
+            alert, order = rule_actions(rule, event)
+            if alert:
+                new_alerts.append(alert)
+            if order:
+                new_orders.append(order)
+    
+    for sensor, reading, status in readings:
+        fire("reading", reading_event(sensor, reading, status), ensure_datetime(reading.timestamp))
+    for alert in alerts:
+        if alert.alert_type != "rule":
+            fire("alert", alert_event(alert), alert.created_at)
+    return new_alerts, new_orders
+
+async def reload_rules():
+    """Compile every stored rule and swap the new set in"""
+    rules = await db.rules.find({}, {"_id": 0}).to_list(None)
+    rule_engine.load(rules)
+    for rule_id, error in rule_engine.errors.items():
+        logger.warning(f"Skipping invalid rule {rule_id}: {error}")
+
+async def reload_rules_periodically():
+    """Pick up rules changed through other API instances"""
+    while True:
+        await asyncio.sleep(RULES_RELOAD_INTERVAL)
+        try:
+            await reload_rules()
+        except Exception as e:
+            logger.error(f"Rule reload failed: {e}")
+
+def validate_rule(rule: Rule) -> dict:
+    """Compile a rule up front so invalid ones are rejected, not skipped"""
+    doc = rule.model_dump()
+    try:
+        CompiledRule(doc)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    unknown = set(rule.actions) - {"alert", "work_order"}
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown actions: {', '.join(sorted(unknown))}")
+    return doc
+
+@api_router.get("/rules", response_model=List[Rule])
+async def get_rules(
+    response: Response,
+    event: Optional[str] = None,
+    sector_id: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None
+):
+    """Get rules, oldest first, one page at a time"""
+    query = {}
+    if event:
+        query["event"] = event
+    if sector_id:
+        query["sector_id"] = sector_id
+    rules = await paginate(
+        db.rules, query, "rule_id", limit, cursor, response,
+        descending=False, projection=model_projection(Rule)
+    )
+    return list_response(rules, response)
+
+@api_router.post("/rules", response_model=Rule)
+async def create_rule(rule_data: RuleCreate):
+    """Create a rule and start evaluating it right away"""
+    rule = Rule(**rule_data.model_dump())
+    await db.rules.insert_one(validate_rule(rule))
+    await reload_rules()
+    return rule
+
+@api_router.put("/rules/{rule_id}", response_model=Rule)
+async def update_rule(rule_id: str, rule_data: RuleCreate):
+    """Replace a rule's definition"""
+    existing = await db.rules.find_one({"rule_id": rule_id}, {"_id": 0, "created_at": 1})
+    if not existing:
+        raise HTTPException(status_code=404, detail="Rule not found")
+    rule = Rule(rule_id=rule_id, created_at=ensure_datetime(existing["created_at"]), **rule_data.model_dump())
+    await db.rules.replace_one({"rule_id": rule_id}, validate_rule(rule))
+    await reload_rules()
+    return rule
+
+@api_router.delete("/rules/{rule_id}")
+async def delete_rule(rule_id: str):
+    """Delete a rule"""
+    result = await db.rules.delete_one({"rule_id": rule_id})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Rule not found")
+    await reload_rules()
+    return {"message": "Rule deleted"}
+
+@api_router.get("/rules/stats")
+async def get_rule_stats():
+    """Loaded rules, evaluations and matches, plus rules that failed to compile"""
+    return {**rule_engine.stats(), "errors": rule_engine.errors}
+
+# ============== WRITE-BEHIND INGESTION ==============
+
+def mongo_unreachable(error: Exception) -> bool:
+    """Whether an error means MongoDB could not be reached, not that it rejected the write"""
+    if isinstance(error, ConnectionFailure):
+        return True
+    return isinstance(error, PyMongoError) and error.has_error_label("RetryableWriteError")
+
+class WriteBehindIngest:
+    """Acknowledge readings once logged locally, commit them to MongoDB in groups
+
+    Each reading is appended to the write-ahead log and queued for the
+    batcher under one lock, so queue order matches log order and every
+    group commit covers a contiguous range of the log. A full queue
+    holds producers back.
+    
+    A group is evaluated once and only its failed write steps are
+    retried, with the steps that succeeded recorded in the log's
+    checkpoint so a replay after a crash does not repeat them either.
+    Commits are retried for as long as MongoDB is unreachable; a group
+    MongoDB keeps rejecting is moved to a dead-letter file after
+    WRITE_BEHIND_MAX_ATTEMPTS tries so it does not hold up the queue.
+    Anything else a commit raises, such as a dead-letter write failing
+    on a full disk, stops ingestion with the group still in the log, so
+    the checkpoint never moves past it.
+    """
+    
+    def __init__(self, wal: WriteAheadLog):
+        self.wal = wal
+        self.batcher = AsyncBatcher(
+            self.commit,
+            batch_size=INGEST_BATCH_SIZE,
+            linger=INGEST_LINGER,
+            max_pending=INGEST_MAX_PENDING
+        )
+        self._order = asyncio.Lock()
+        self.retries = 0
+        self.dead_lettered = 0
+    
+    async def put(self, reading: SensorReading):
+        async with self._order:
+            seq = self.wal.append(reading.model_dump(mode="json"))
+            await self.batcher.put((seq, reading))
+        await self.wal.sync(seq)
+    
+    async def commit(self, batch: List[tuple], done: Iterable[str] = ()):
+        """Commit a group of (seq, reading), skipping the write steps in done"""
+        first, last = batch[0][0], batch[-1][0]
+        plan = None
+        attempts = 0
+        delay = 0.5
+        while True:
+            try:
+                if plan is None:
+                    plan = await prepare_ingest([reading for _, reading in batch])
+                    plan.done.update(done)
+                await write_ingest(plan, on_step=lambda plan: self.wal.progress(first, last, plan.done))
+                finish_ingest(plan)
+                break
+            except Exception as e:
+                self.retries += 1
+                if not mongo_unreachable(e):
+                    attempts += 1
+                    if attempts >= WRITE_BEHIND_MAX_ATTEMPTS:
+                        path = self.wal.dead_letter(
+                            [(seq, reading.model_dump(mode="json")) for seq, reading in batch],
+                            f"{e} (steps done: {', '.join(sorted(plan.done)) if plan else 'none'})"
+                        )
+                        self.dead_lettered += len(batch)
+                        logger.error(f"Write-behind commit of readings {first}-{last} failed {attempts} times, moved to {path.name}: {e}")
+                        break
+                logger.error(f"Write-behind commit of {len(batch)} readings failed, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+        self.wal.commit(last)
+    
+    async def start(self):
+        """Commit whatever a previous run left in the log, then accept new readings"""
+        records = [(seq, SensorReading(**record)) for seq, record in self.wal.replay()]
+        replayed = len(records)
+        # The group being committed at the crash resumes with the steps it had left
+        pending = self.wal.pending_batch
+        if pending:
+            group = [(seq, reading) for seq, reading in records if pending["first"] <= seq <= pending["last"]]
+            if group:
+                await self.commit(group, pending["done"])
+            records = [(seq, reading) for seq, reading in records if seq > pending["last"]]
+        for i in range(0, len(records), INGEST_BATCH_SIZE):
+            await self.commit(records[i:i + INGEST_BATCH_SIZE])
+        if replayed:
+            logger.info(f"Replayed {replayed} readings from the write-ahead log")
+        self.batcher.start()
+    
+    async def stop(self):
+        """Commit queued readings, leaving them in the log if MongoDB is unreachable"""
+        try:
+            await asyncio.wait_for(self.batcher.stop(), WRITE_BEHIND_STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"{self.wal.stats()['uncommitted']} readings left in the write-ahead log for replay")
+        except Exception as e:
+            logger.error(
+                f"Write-behind stopped on a failed commit, {self.wal.stats()['uncommitted']} "
+                f"readings left in the write-ahead log for replay: {e}"
+            )
+        self.wal.close()
+    
+    def stats(self) -> dict:
+        return {
+            "wal": self.wal.stats(),
+            "batcher": self.batcher.stats(),
+            "retries": self.retries,
+            "dead_lettered": self.dead_lettered
+        }
+
+# Set on startup when WRITE_BEHIND is on
+write_behind = None
+
 # ============== SENSOR ROUTES ==============
 
 @api_router.get("/sensors", response_model=List[Sensor])
-async def get_sensors(sector_id: Optional[str] = None):
-    """Get all sensors, optionally filtered by sector"""
+async def get_sensors(
+    response: Response,
+    sector_id: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None
+):
+    """Get sensors, optionally filtered by sector, one page at a time"""
     query = {"sector_id": sector_id} if sector_id else {}
-    sensors = await db.sensors.find(query, {"_id": 0}).to_list(100)
-    return sensors
+    sensors = await paginate(
+        db.sensors, query, "sensor_id", limit, cursor, response,
+        descending=False, projection=model_projection(Sensor)
+    )
+    return list_response(current_values.overlay(sensors), response)
 
 @api_router.post("/sensors", response_model=Sensor)
 async def create_sensor(sensor_data: SensorCreate):
@@ -350,114 +1572,771 @@ async def create_sensor(sensor_data: SensorCreate):
     doc = sensor.model_dump()
     doc["last_reading"] = doc["last_reading"].isoformat()
     await db.sensors.insert_one(doc)
+    sensor_meta_cache.invalidate(sensor.sensor_id)
+    invalidate_dashboard_stats()
     return sensor
 
+@api_router.put("/sensors/{sensor_id}/thresholds")
+async def update_sensor_thresholds(sensor_id: str, min_threshold: float, max_threshold: float):
+    """Update sensor thresholds
+
+    Only this worker's sensor_meta_cache is invalidated; other API
+    workers and the MQTT gateway keep classifying readings against the
+    old thresholds for up to SENSOR_CACHE_TTL seconds.
+    """
+    if min_threshold >= max_threshold:
+        raise HTTPException(status_code=400, detail="min_threshold must be below max_threshold")
+    result = await db.sensors.update_one(
+        {"sensor_id": sensor_id},
+        {"$set": {"min_threshold": min_threshold, "max_threshold": max_threshold}}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Sensor not found")
+    sensor_meta_cache.invalidate(sensor_id)
+    content_version.bump()
+    return {"message": "Thresholds updated"}
+
+def classify_reading(value: float, min_threshold: float, max_threshold: float) -> str:
+    """Determine sensor status for a value based on its thresholds"""
+    if value > max_threshold:
+        return "critical"
+    if value > max_threshold * 0.8:
+        return "warning"
+    if value < min_threshold:
+        return "critical"
+    if value < min_threshold * 1.2:
+        return "warning"
+    return "normal"
+
+def publish_sensor_status(sensor: dict, reading: SensorReading, previous: Optional[str], status: str):
+    """Push a sensor status transition to event subscribers"""
+    event_broker.publish(
+        "sensor.status",
+        {
+            "sensor_id": sensor["sensor_id"],
+            "sector_id": sensor.get("sector_id"),
+            "previous_status": previous,
+            "status": status,
+            "value": reading.value,
+            "timestamp": reading.timestamp
+        },
+        sensor.get("sector_id")
+    )
+
+class IngestPlan:
+    """A batch of readings once evaluated, and the writes it still needs
+
+    Evaluating feeds the deviation detector, the history compressor, the
+    current value buffer and the rules, so a batch is evaluated once and
+    only its writes are retried. Each write step that succeeds is added
+    to done; a step that fails partway keeps only what did not go through.
+    """
+    
+    def __init__(self):
+        self.results = []
+        self.history = []
+        self.held = []
+        self.rollups = []
+        self.sensor_writes = {}
+        self.latest = {}
+        self.transitions = []
+        self.deviations = []
+        self.rule_alerts = []
+        self.rule_orders = []
+        self.thresholds = {}
+        self.accepted = 0
+        self.stored = 0
+        self.created = []
+        self.repeated = []
+        self.done = set()
+
+def failed_writes(items: list, error: BulkWriteError) -> list:
+    """Items of an unordered bulk write that MongoDB rejected"""
+    return [items[e["index"]] for e in error.details.get("writeErrors", [])]
+
+async def prepare_ingest(readings: List[SensorReading]) -> IngestPlan:
+    """Evaluate a batch of readings and build the writes they need
+
+    Readings for the same sensor must be in time order.
+    """
+    # Look up thresholds for every sensor in the batch at once
+    thresholds = await get_sensor_meta_many(list({r.sensor_id for r in readings}))
+    
+    plan = IngestPlan()
+    plan.thresholds = thresholds
+    samples = []
+    evaluated = []
+    for reading in readings:
+        sensor = thresholds.get(reading.sensor_id)
+        if not sensor:
+            READINGS_REJECTED.inc()
+            plan.results.append({"sensor_id": reading.sensor_id, "error": "Sensor not found"})
+            continue
+        
+        status = classify_reading(reading.value, sensor["min_threshold"], sensor["max_threshold"])
+        previous = plan.latest[reading.sensor_id][1] if reading.sensor_id in plan.latest else sensor.get("status")
+        if previous != status:
+            plan.transitions.append((sensor, reading, previous, status))
+        deviation = anomaly_detector.update(reading.sensor_id, reading.value, ensure_datetime(reading.timestamp))
+        if deviation:
+            plan.deviations.append(deviation_alert(sensor, deviation))
+        evaluated.append((sensor, reading, status))
+        samples.append({
+            "sensor_id": reading.sensor_id,
+            "value": reading.value,
+            "timestamp": reading.timestamp
+        })
+        # Transitions and deviations are always kept exactly
+        plan.history.extend(compress_reading(sensor, reading, previous != status or deviation is not None))
+        # Readings arrive in order, so the last one per sensor is the current value
+        plan.latest[reading.sensor_id] = (reading, status)
+        result = {"sensor_id": reading.sensor_id, "status": status, "value": reading.value}
+        if deviation:
+            result["deviation"] = deviation
+        plan.results.append(result)
+    
+    plan.accepted = len(samples)
+    plan.stored = len(plan.history)
+    plan.held = held_history_writes(
+        sensor_id for sensor_id in plan.latest if is_compressed(thresholds[sensor_id])
+    )
+    if samples:
+        plan.rollups = rollup_operations(samples)
+    
+    # Only current values that moved enough are written through
+    plan.sensor_writes = {
+        sensor_id: UpdateOne(
+            {"sensor_id": sensor_id},
+            current_value_update(reading.value, status, ensure_datetime(reading.timestamp))
+        )
+        for sensor_id, (reading, status) in plan.latest.items()
+        if current_values.update(
+            sensor_id,
+            reading.value,
+            status,
+            ensure_datetime(reading.timestamp),
+            current_value_deadband(thresholds[sensor_id])
+        )
+    }
+    
+    plan.rule_alerts, plan.rule_orders = run_rules(evaluated, plan.deviations)
+    return plan
+
+async def write_ingest(plan: IngestPlan, on_step=None):
+    """Run the write steps of a plan that have not succeeded yet
+
+    Steps run concurrently and on_step(plan) is called as each one
+    succeeds. Raises the first failure once every step has finished;
+    running the plan again then only repeats what failed.
+    """
+    async def history():
+        try:
+            await db.sensor_readings.insert_many(plan.history, ordered=False)
+        except BulkWriteError as e:
+            plan.history = failed_writes(plan.history, e)
+            raise
+    
+    async def held():
+        try:
+            await db.history_held.bulk_write(plan.held, ordered=False)
+        except BulkWriteError as e:
+            plan.held = failed_writes(plan.held, e)
+            raise
+    
+    async def rollups():
+        try:
+            await db.sensor_rollups.bulk_write(plan.rollups, ordered=False)
+        except BulkWriteError as e:
+            plan.rollups = failed_writes(plan.rollups, e)
+            raise
+    
+    async def sensors():
+        try:
+            await write_current_values(plan.sensor_writes)
+        except Exception:
+            # Marked dirty, the flusher now writes their latest values
+            plan.sensor_writes = {}
+            raise
+    
+    async def alerts():
+        plan.created, plan.repeated = await write_alerts(plan.deviations + plan.rule_alerts, plan.rule_orders)
+    
+    steps = {
+        "history": (history, plan.history),
+        "held": (held, plan.held),
+        "rollups": (rollups, plan.rollups),
+        "sensors": (sensors, plan.sensor_writes),
+        "alerts": (alerts, True)
+    }
+    
+    async def run(name, write):
+        await write()
+        plan.done.add(name)
+        if on_step:
+            on_step(plan)
+    
+    pending = []
+    for name, (write, needed) in steps.items():
+        if name in plan.done:
+            continue
+        if not needed:
+            plan.done.add(name)
+            continue
+        pending.append(run(name, write))
+    errors = [e for e in await asyncio.gather(*pending, return_exceptions=True) if isinstance(e, Exception)]
+    if errors:
+        raise errors[0]
+
+def finish_ingest(plan: IngestPlan) -> dict:
+    """Publish what a written plan changed and summarize it"""
+    READINGS_STORED.inc(plan.stored)
+    DEVIATIONS_DETECTED.inc(len(plan.deviations))
+    
+    # Keep cached statuses current and refresh stats only on transitions
+    if plan.latest:
+        content_version.bump()
+    for sensor_id, (reading, status) in plan.latest.items():
+        plan.thresholds[sensor_id]["status"] = status
+    if plan.transitions:
+        invalidate_dashboard_stats()
+    for sensor, reading, previous, status in plan.transitions:
+        publish_sensor_status(sensor, reading, previous, status)
+    publish_alerts(plan.created, plan.repeated, plan.rule_orders)
+    
+    return {
+        "accepted": plan.accepted,
+        "rejected": len(plan.results) - plan.accepted,
+        "deviations": len(plan.deviations),
+        "rule_alerts": len(plan.rule_alerts),
+        "results": plan.results
+    }
+
+async def ingest_readings(readings: List[SensorReading]) -> dict:
+    """Record a batch of readings for many sensors with batched writes
+
+    Shared by the bulk route, the MQTT gateway and write-behind. Readings
+    for the same sensor must be in time order.
+    """
+    plan = await prepare_ingest(readings)
+    await write_ingest(plan)
+    return finish_ingest(plan)
+
+@api_router.post("/sensors/readings/bulk")
+async def record_sensor_readings_bulk(readings: List[SensorReading]):
+    """Record a batch of readings for many sensors with batched writes"""
+    if len(readings) > BULK_READINGS_MAX:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {BULK_READINGS_MAX} readings per request"
+        )
+    READINGS_RECEIVED.labels("bulk").inc(len(readings))
+    # Ingest needs each sensor's readings in time order; the stable sort
+    # keeps readings with equal timestamps in the order they were sent
+    order = sorted(range(len(readings)), key=lambda i: ensure_datetime(readings[i].timestamp))
+    summary = await ingest_readings([readings[i] for i in order])
+    # Report results in request order
+    results = [None] * len(order)
+    for position, index in enumerate(order):
+        results[index] = summary["results"][position]
+    summary["results"] = results
+    return summary
+
 @api_router.post("/sensors/{sensor_id}/reading")
 async def record_sensor_reading(sensor_id: str, reading: SensorReading):
     """Record a sensor reading and update status"""
-    sensor = await db.sensors.find_one({"sensor_id": sensor_id}, {"_id": 0})
+    READINGS_RECEIVED.labels("api").inc()
+    sensor = await get_sensor_meta(sensor_id)
     if not sensor:
+        READINGS_REJECTED.inc()
         raise HTTPException(status_code=404, detail="Sensor not found")
     
-    # Determine status based on thresholds
-    status = "normal"
-    if reading.value > sensor["max_threshold"]:
-        status = "critical"
-    elif reading.value > sensor["max_threshold"] * 0.8:
-        status = "warning"
-    elif reading.value < sensor["min_threshold"]:
-        status = "critical"
-    elif reading.value < sensor["min_threshold"] * 1.2:
-        status = "warning"
-    
-    await db.sensors.update_one(
-        {"sensor_id": sensor_id},
-        {"$set": {
-            "current_value": reading.value,
-            "status": status,
-            "last_reading": reading.timestamp.isoformat()
-        }}
-    )
+    reading = SensorReading(sensor_id=sensor_id, value=reading.value, timestamp=reading.timestamp)
+    if write_behind:
+        await write_behind.put(reading)
+        status = classify_reading(reading.value, sensor["min_threshold"], sensor["max_threshold"])
+        return {"status": status, "value": reading.value, "queued": True}
     
-    # Store reading history
-    await db.sensor_readings.insert_one({
-        "sensor_id": sensor_id,
+    summary = await ingest_readings([reading])
+    result = summary["results"][0]
+    if "error" in result:
+        # Deleted since the lookup above
+        raise HTTPException(status_code=404, detail="Sensor not found")
+    return {
+        "status": result["status"],
         "value": reading.value,
-        "timestamp": reading.timestamp.isoformat()
-    })
+        "deviation": result.get("deviation"),
+        "rule_alerts": summary["rule_alerts"]
+    }
+
+@api_router.get("/sensors/{sensor_id}/detector")
+async def get_sensor_detector(sensor_id: str):
+    """Current state of a sensor's deviation detector"""
+    if not await get_sensor_meta(sensor_id):
+        raise HTTPException(status_code=404, detail="Sensor not found")
+    return anomaly_detector.state(sensor_id) or {"sensor_id": sensor_id, "readings": 0, "warmed_up": False}
+
+@api_router.get("/detectors/stats")
+async def get_detector_stats():
+    """Sensors tracked by the deviation detector and deviations reported"""
+    return anomaly_detector.stats()
+
+async def interpolated_history(sensor_id: str, start: datetime, end: datetime, step: float) -> List[dict]:
+    """Sample a sensor's value every step seconds from its stored readings
+
+    The stored readings just outside the range and the sensor's current
+    value, which the compressor may not have stored yet, bound the ends.
+    """
+    projection = {"_id": 0, "timestamp": 1, "value": 1}
+    before, inside, after, sensor = await asyncio.gather(
+        db.sensor_readings.find(
+            {"sensor_id": sensor_id, "timestamp": {"$lt": start}}, projection
+        ).sort("timestamp", -1).to_list(1),
+        db.sensor_readings.find(
+            {"sensor_id": sensor_id, "timestamp": {"$gte": start, "$lt": end}}, projection
+        ).sort("timestamp", 1).to_list(None),
+        db.sensor_readings.find(
+            {"sensor_id": sensor_id, "timestamp": {"$gte": end}}, projection
+        ).sort("timestamp", 1).to_list(1),
+        db.sensors.find_one(
+            {"sensor_id": sensor_id},
+            {"_id": 0, "sensor_id": 1, "current_value": 1, "last_reading": 1}
+        )
+    )
+    points = [(ensure_datetime(r["timestamp"]), r["value"]) for r in before + inside + after]
+    if sensor:
+        current_values.overlay([sensor])
+    if sensor and not after and sensor.get("last_reading"):
+        current_at = ensure_datetime(sensor["last_reading"])
+        if not points or current_at > points[-1][0]:
+            points.append((current_at, sensor["current_value"]))
+    
+    span = (end - start).total_seconds()
+    grid = [start + timedelta(seconds=step * i) for i in range(int(span // step) + 1) if step * i < span]
+    return [
+        {"sensor_id": sensor_id, "timestamp": t, "value": value}
+        for t, value in zip(grid, interpolate(points, grid))
+        if value is not None
+    ]
+
+def sample_spacing(buckets: List[dict], readings: int, newest_first: bool) -> Optional[float]:
+    """Average seconds between a sensor's original readings, from its 1m rollups
+
+    Rollups count every reading, including those compression dropped, and
+    last_at is the time of each bucket's last reading: the readings counted
+    in the buckets after the oldest one span from its last_at to the
+    newest one's. Only the buckets nearest the start of the list holding
+    `readings` readings are used.
+    """
+    counted = 0
+    for index in range(1, len(buckets)):
+        counted += buckets[index - 1 if newest_first else index]["count"]
+        if counted >= readings or index == len(buckets) - 1:
+            span = (ensure_datetime(buckets[index]["last_at"]) - ensure_datetime(buckets[0]["last_at"])).total_seconds()
+            return abs(span) / counted if span else None
+    return None
+
+async def reconstructed_history(
+    sensor_id: str,
+    limit: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> Optional[List[dict]]:
+    """Rebuild a compressed sensor's readings at their original spacing
+
+    Without start, the latest `limit` samples newest first; with it, the
+    first `limit` samples in [start, end) oldest first. Values are
+    interpolated from the stored readings (see interpolated_history) every
+    sample_spacing seconds. None when there are no rollups to estimate the
+    spacing from, e.g. once they have been pruned.
+    """
+    rollups = {"sensor_id": sensor_id, "resolution": "1m"}
+    projection = {"_id": 0, "count": 1, "last_at": 1}
+    if start is None:
+        latest, sensor = await asyncio.gather(
+            db.sensor_readings.find({"sensor_id": sensor_id}, {"_id": 0, "timestamp": 1})
+            .sort("timestamp", -1).to_list(1),
+            db.sensors.find_one(
+                {"sensor_id": sensor_id},
+                {"_id": 0, "sensor_id": 1, "current_value": 1, "last_reading": 1}
+            )
+        )
+        if sensor:
+            current_values.overlay([sensor])
+        times = [ensure_datetime(r["timestamp"]) for r in latest]
+        if sensor and sensor.get("last_reading"):
+            times.append(ensure_datetime(sensor["last_reading"]))
+        if not times:
+            return []
+        last_at = max(times)
+        rollups["bucket"] = {"$lte": rollup_bucket(last_at, "1m")}
+        buckets = await db.sensor_rollups.find(rollups, projection).sort("bucket", -1).to_list(limit + 1)
+        spacing = sample_spacing(buckets, limit, newest_first=True)
+        if spacing is None:
+            return None
+        # The grid ends on the latest reading
+        step = timedelta(seconds=spacing)
+        points = await interpolated_history(sensor_id, last_at - step * (limit - 1), last_at + step / 2, spacing)
+        return points[::-1][:limit]
     
-    return {"status": status, "value": reading.value}
+    rollups["bucket"] = {"$gte": rollup_bucket(start, "1m"), "$lt": end}
+    buckets = await db.sensor_rollups.find(rollups, projection).sort("bucket", 1).to_list(limit + 1)
+    spacing = sample_spacing(buckets, limit, newest_first=False)
+    if spacing is None:
+        return None
+    end = min(end, start + timedelta(seconds=spacing) * limit)
+    points = await interpolated_history(sensor_id, start, end, spacing)
+    return points[:limit]
+
+def is_compressed(sensor: Optional[dict]) -> bool:
+    """Whether some of the sensor's readings may have been left out of the history"""
+    return bool(sensor) and sensor.get("sensor_type") in history_compressor.settings
 
 @api_router.get("/sensors/{sensor_id}/history")
-async def get_sensor_history(sensor_id: str, limit: int = 50):
-    """Get sensor reading history"""
-    readings = await db.sensor_readings.find(
-        {"sensor_id": sensor_id},
+async def get_sensor_history(
+    sensor_id: str,
+    limit: int = 50,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: Optional[str] = None,
+    step: Optional[float] = Query(None, gt=0)
+):
+    """Get sensor reading history
+
+    Without a time range this returns the latest raw readings, newest first.
+    With start/end the range is returned oldest first, served from the
+    finest rollup (1m/1h/1d) that fits in `limit` points unless an explicit
+    resolution is requested ("raw" reads individual readings).
+    
+    Stored readings may be compressed (see compression.py). Raw readings of
+    compressed sensors are rebuilt at their original sample spacing, as if
+    every reading had been stored; "stored" returns only the readings kept.
+    With `step`, in seconds, the value is interpolated every step instead.
+    """
+    if resolution not in (None, "auto", "raw", "stored", *ROLLUP_RESOLUTIONS):
+        raise HTTPException(status_code=400, detail="Invalid resolution")
+    
+    if start is None and end is None and step is None and resolution in (None, "raw", "stored"):
+        if resolution != "stored" and is_compressed(await get_sensor_meta(sensor_id)):
+            readings = await reconstructed_history(sensor_id, limit)
+            if readings is not None:
+                return readings
+        readings = await db.sensor_readings.find(
+            {"sensor_id": sensor_id},
+            {"_id": 0}
+        ).sort("timestamp", -1).to_list(limit)
+        return readings
+    
+    end = ensure_datetime(end) if end else datetime.now(timezone.utc)
+    if start:
+        start = ensure_datetime(start)
+    elif step is not None:
+        start = end - timedelta(seconds=step) * limit
+    elif resolution in ROLLUP_RESOLUTIONS:
+        start = end - ROLLUP_RESOLUTIONS[resolution] * limit
+    else:
+        start = end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    
+    if step is not None:
+        if (end - start).total_seconds() / step > min(limit, HISTORY_MAX_POINTS):
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {min(limit, HISTORY_MAX_POINTS)} steps per request, raise limit or step"
+            )
+        return await interpolated_history(sensor_id, start, end, step)
+    
+    if resolution in ("raw", "stored"):
+        if resolution == "raw" and is_compressed(await get_sensor_meta(sensor_id)):
+            readings = await reconstructed_history(sensor_id, limit, start, end)
+            if readings is not None:
+                return readings
+        readings = await db.sensor_readings.find(
+            {"sensor_id": sensor_id, "timestamp": {"$gte": start, "$lt": end}},
+            {"_id": 0}
+        ).sort("timestamp", 1).to_list(limit)
+        return readings
+    
+    if resolution in (None, "auto"):
+        resolution = pick_rollup_resolution(start, end, limit)
+    
+    rollups = await db.sensor_rollups.find(
+        {
+            "sensor_id": sensor_id,
+            "resolution": resolution,
+            "bucket": {"$gte": rollup_bucket(start, resolution), "$lt": end}
+        },
         {"_id": 0}
-    ).sort("timestamp", -1).to_list(limit)
-    return readings
+    ).sort("bucket", 1).to_list(limit)
+    
+    return [
+        {
+            "sensor_id": sensor_id,
+            "timestamp": r["bucket"],
+            "resolution": resolution,
+            "min": r["min"],
+            "max": r["max"],
+            "mean": r["sum"] / r["count"],
+            "count": r["count"],
+            "last": r["last"]
+        }
+        for r in rollups
+    ]
 
 # ============== ALERT ROUTES ==============
 
 @api_router.get("/alerts", response_model=List[Alert])
-async def get_alerts(status: Optional[str] = None, sector_id: Optional[str] = None):
-    """Get all alerts"""
+async def get_alerts(
+    response: Response,
+    status: Optional[str] = None,
+    sector_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    overdue: bool = False,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None
+):
+    """Get alerts, newest first, one page at a time
+
+    since/until restrict the creation time. overdue keeps active alerts
+    not acknowledged within ALERT_ACK_DEADLINE_MINUTES.
+    """
     query = {}
     if status:
         query["status"] = status
     if sector_id:
         query["sector_id"] = sector_id
-    alerts = await db.alerts.find(query, {"_id": 0}).sort("created_at", -1).to_list(100)
-    return alerts
+    if overdue:
+        if status and status != "active":
+            raise HTTPException(status_code=400, detail="Only active alerts can be overdue")
+        query["status"] = "active"
+        deadline = datetime.now(timezone.utc) - timedelta(minutes=ALERT_ACK_DEADLINE_MINUTES)
+        until = min(ensure_datetime(until), deadline) if until else deadline
+    created_at_window(query, since, until)
+    alerts = await paginate(
+        db.alerts, query, "alert_id", limit, cursor, response,
+        projection=model_projection(Alert)
+    )
+    return list_response(alerts, response)
+
+def normalize_title(title: str) -> str:
+    """Lowercase a title and strip accents, punctuation and extra spaces"""
+    text = unicodedata.normalize("NFKD", title.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+def alert_dedup_key(alert: Alert) -> str:
+    """Identify repeats of the same concern among active alerts"""
+    parts = [alert.sector_id, alert.sensor_id or "", alert.alert_type, normalize_title(alert.title)]
+    return hashlib.sha1("\x1f".join(parts).encode()).hexdigest()
+
+def alert_document(alert: Alert) -> dict:
+    """Serialize an alert for storage, dates as BSON datetimes"""
+    doc = alert.model_dump()
+    doc["dedup_key"] = doc["dedup_key"] or alert_dedup_key(alert)
+    return doc
+
+async def upsert_alerts(alerts: List[Alert]):
+    """Store alerts, folding repeats of an active alert into its occurrence count
+
+    Alerts sharing a dedup key are coalesced before writing and all keys
+    go out in one unordered bulk upsert. Two writers inserting the same
+    new key race on the unique partial index; the loser's upserts are
+    retried and then match the winner's alert. The Alert objects are
+    updated in place with the stored alert's id and count. Returns the
+    alerts that were inserted and those that repeated an active one.
+    """
+    now = datetime.now(timezone.utc)
+    grouped = OrderedDict()
+    for alert in alerts:
+        alert.dedup_key = alert_dedup_key(alert)
+        alert.last_seen_at = now
+        grouped.setdefault(alert.dedup_key, []).append(alert)
+    keys = list(grouped)
+    
+    def upsert(key: str) -> UpdateOne:
+        doc = alert_document(grouped[key][0])
+        del doc["occurrences"], doc["last_seen_at"]
+        return UpdateOne(
+            {"dedup_key": key, "status": "active"},
+            {
+                "$setOnInsert": doc,
+                "$inc": {"occurrences": len(grouped[key])},
+                "$set": {"last_seen_at": now}
+            },
+            upsert=True
+        )
+    
+    pending = list(range(len(keys)))
+    inserted = set()
+    for attempt in range(3):
+        try:
+            result = await db.alerts.bulk_write([upsert(keys[i]) for i in pending], ordered=False)
+            inserted.update(pending[i] for i in result.upserted_ids)
+            break
+        except BulkWriteError as e:
+            inserted.update(pending[u["index"]] for u in e.details.get("upserted", []))
+            errors = e.details["writeErrors"]
+            retry = [pending[error["index"]] for error in errors if error["code"] == 11000]
+            if len(retry) < len(errors) or attempt == 2:
+                raise
+            pending = retry
+    
+    created = []
+    repeated = []
+    for i, key in enumerate(keys):
+        (created if i in inserted else repeated).append(grouped[key][0])
+    
+    stored = {}
+    if repeated:
+        stored = {
+            doc["dedup_key"]: doc
+            for doc in await db.alerts.find(
+                {"dedup_key": {"$in": [alert.dedup_key for alert in repeated]}, "status": "active"},
+                {"_id": 0, "dedup_key": 1, "alert_id": 1, "occurrences": 1, "created_at": 1}
+            ).to_list(None)
+        }
+    for key, group in grouped.items():
+        first = group[0]
+        doc = stored.get(key, {
+            "alert_id": first.alert_id,
+            "occurrences": len(group),
+            "created_at": first.created_at
+        })
+        for alert in group:
+            alert.alert_id = doc["alert_id"]
+            alert.occurrences = doc["occurrences"]
+            alert.created_at = ensure_datetime(doc["created_at"])
+    return created, repeated
+
+async def write_alerts(alerts: List[Alert], orders: List[WorkOrder]):
+    """Upsert alerts, then insert work orders pointing at the stored alerts"""
+    created, repeated = [], []
+    if alerts:
+        alert_ids = [alert.alert_id for alert in alerts]
+        created, repeated = await upsert_alerts(alerts)
+        stored_ids = dict(zip(alert_ids, (alert.alert_id for alert in alerts)))
+        for order in orders:
+            order.alert_id = stored_ids.get(order.alert_id, order.alert_id)
+    if orders:
+        await db.work_orders.insert_many([work_order_document(order) for order in orders], ordered=False)
+    return created, repeated
+
+def publish_alerts(created: List[Alert], repeated: List[Alert], orders: List[WorkOrder]):
+    """Refresh stats and push alert and work order changes to event subscribers"""
+    if created or orders:
+        invalidate_dashboard_stats()
+    for alert in created:
+        event_broker.publish("alert.created", alert.model_dump(), alert.sector_id)
+    for alert in repeated:
+        event_broker.publish(
+            "alert.repeated",
+            {
+                "alert_id": alert.alert_id,
+                "sector_id": alert.sector_id,
+                "occurrences": alert.occurrences,
+                "last_seen_at": alert.last_seen_at
+            },
+            alert.sector_id
+        )
+    for order in orders:
+        event_broker.publish("work_order.created", order.model_dump(), order.sector_id)
 
 @api_router.post("/alerts", response_model=Alert)
 async def create_alert(alert_data: AlertCreate):
-    """Create a new alert"""
+    """Create a new alert, or count a repeat of the matching active one"""
     alert = Alert(**alert_data.model_dump())
-    doc = alert.model_dump()
-    doc["created_at"] = doc["created_at"].isoformat()
-    if doc["resolved_at"]:
-        doc["resolved_at"] = doc["resolved_at"].isoformat()
-    await db.alerts.insert_one(doc)
+    rule_alerts, rule_orders = run_rules([], [alert])
+    created, repeated = await write_alerts([alert] + rule_alerts, rule_orders)
+    publish_alerts(created, repeated, rule_orders)
     return alert
 
 @api_router.put("/alerts/{alert_id}/status")
 async def update_alert_status(alert_id: str, status: str):
-    """Update alert status"""
+    """Update alert status
+
+    Reactivating an alert fails with 409 while another alert for the same
+    condition is active, since only one may be (see the dedup_key index).
+    """
     update_data = {"status": status}
     if status == "resolved":
-        update_data["resolved_at"] = datetime.now(timezone.utc).isoformat()
+        update_data["resolved_at"] = datetime.now(timezone.utc)
     
-    await db.alerts.update_one(
-        {"alert_id": alert_id},
-        {"$set": update_data}
-    )
+    try:
+        alert = await db.alerts.find_one_and_update(
+            {"alert_id": alert_id},
+            {"$set": update_data},
+            {"_id": 0, "sector_id": 1}
+        )
+    except DuplicateKeyError:
+        current = await db.alerts.find_one({"alert_id": alert_id}, {"_id": 0, "dedup_key": 1})
+        active = await db.alerts.find_one(
+            {"dedup_key": current["dedup_key"], "status": "active"},
+            {"_id": 0, "alert_id": 1}
+        ) if current else None
+        raise HTTPException(
+            status_code=409,
+            detail=f"Alert {active['alert_id']} is already active for the same condition" if active
+            else "Another alert for the same condition is already active"
+        )
+    if alert:
+        invalidate_dashboard_stats()
+        event_broker.publish(
+            "alert.status",
+            {"alert_id": alert_id, "sector_id": alert["sector_id"], "status": status},
+            alert["sector_id"]
+        )
     return {"message": "Alert status updated"}
 
 # ============== WORK ORDER ROUTES ==============
 
 @api_router.get("/work-orders", response_model=List[WorkOrder])
-async def get_work_orders(status: Optional[str] = None, sector_id: Optional[str] = None):
-    """Get all work orders"""
+async def get_work_orders(
+    response: Response,
+    status: Optional[str] = None,
+    sector_id: Optional[str] = None,
+    priority: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    overdue: bool = False,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None
+):
+    """Get work orders, newest first, one page at a time
+
+    since/until restrict the creation time. overdue keeps pending and
+    in-progress orders past their due date.
+    """
     query = {}
     if status:
         query["status"] = status
     if sector_id:
         query["sector_id"] = sector_id
-    orders = await db.work_orders.find(query, {"_id": 0}).sort("created_at", -1).to_list(100)
-    return orders
+    if priority:
+        query["priority"] = priority
+    if overdue:
+        if status and status not in OPEN_WORK_ORDER_STATUSES:
+            raise HTTPException(status_code=400, detail="Only pending or in-progress work orders can be overdue")
+        query.setdefault("status", {"$in": OPEN_WORK_ORDER_STATUSES})
+        query["due_date"] = {"$lt": datetime.now(timezone.utc)}
+    created_at_window(query, since, until)
+    orders = await paginate(
+        db.work_orders, query, "order_id", limit, cursor, response,
+        projection=model_projection(WorkOrder)
+    )
+    return list_response(orders, response)
+
+def work_order_document(order: WorkOrder) -> dict:
+    """Serialize a work order for storage, dates as BSON datetimes"""
+    return order.model_dump()
 
 @api_router.post("/work-orders", response_model=WorkOrder)
 async def create_work_order(order_data: WorkOrderCreate):
     """Create a new work order"""
     order = WorkOrder(**order_data.model_dump())
-    doc = order.model_dump()
-    doc["created_at"] = doc["created_at"].isoformat()
-    if doc["due_date"]:
-        doc["due_date"] = doc["due_date"].isoformat()
-    if doc["completed_at"]:
-        doc["completed_at"] = doc["completed_at"].isoformat()
-    await db.work_orders.insert_one(doc)
+    await db.work_orders.insert_one(work_order_document(order))
+    invalidate_dashboard_stats()
+    event_broker.publish("work_order.created", order.model_dump(), order.sector_id)
     return order
 
 @api_router.put("/work-orders/{order_id}/status")
@@ -465,12 +2344,20 @@ async def update_work_order_status(order_id: str, status: str):
     """Update work order status"""
     update_data = {"status": status}
     if status == "completed":
-        update_data["completed_at"] = datetime.now(timezone.utc).isoformat()
+        update_data["completed_at"] = datetime.now(timezone.utc)
     
-    await db.work_orders.update_one(
+    order = await db.work_orders.find_one_and_update(
         {"order_id": order_id},
-        {"$set": update_data}
+        {"$set": update_data},
+        {"_id": 0, "sector_id": 1}
     )
+    if order:
+        invalidate_dashboard_stats()
+        event_broker.publish(
+            "work_order.status",
+            {"order_id": order_id, "sector_id": order["sector_id"], "status": status},
+            order["sector_id"]
+        )
     return {"message": "Work order status updated"}
 
 # ============== CONTEXT VARIABLES ==============
@@ -490,48 +2377,42 @@ async def update_context(ctx: ContextVariables):
     doc = ctx.model_dump()
     doc["timestamp"] = doc["timestamp"].isoformat()
     await db.context_variables.insert_one(doc)
+    content_version.bump()
     return ctx
 
 # ============== BEHAVIORAL REPORTS ==============
 
 @api_router.get("/reports", response_model=List[BehavioralReport])
-async def get_behavioral_reports(sector_id: Optional[str] = None):
-    """Get behavioral reports"""
+async def get_behavioral_reports(
+    response: Response,
+    sector_id: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None
+):
+    """Get behavioral reports, newest first, one page at a time"""
     query = {"sector_id": sector_id} if sector_id else {}
-    reports = await db.behavioral_reports.find(query, {"_id": 0}).sort("created_at", -1).to_list(100)
-    return reports
+    reports = await paginate(
+        db.behavioral_reports, query, "report_id", limit, cursor, response,
+        projection=model_projection(BehavioralReport)
+    )
+    return list_response(reports, response)
 
 @api_router.post("/reports", response_model=BehavioralReport)
 async def create_behavioral_report(report_data: BehavioralReportCreate):
     """Create a new behavioral report"""
     report = BehavioralReport(**report_data.model_dump())
     doc = report.model_dump()
-    doc["created_at"] = doc["created_at"].isoformat()
     await db.behavioral_reports.insert_one(doc)
     return report
 
 # ============== AI RISK ANALYSIS ==============
 
-@api_router.post("/analyze-risk")
-async def analyze_risk(request: RiskAnalysisRequest):
-    """Use AI to analyze risk and generate prescriptive actions"""
-    sector_id = request.sector_id
-    
-    # Gather all data for the sector
-    sector = await db.sectors.find_one({"sector_id": sector_id}, {"_id": 0})
-    if not sector:
-        raise HTTPException(status_code=404, detail="Sector not found")
-    
-    sensors = await db.sensors.find({"sector_id": sector_id}, {"_id": 0}).to_list(50)
-    reports = await db.behavioral_reports.find({"sector_id": sector_id}, {"_id": 0}).sort("created_at", -1).to_list(10)
-    context = await db.context_variables.find_one({}, {"_id": 0}, sort=[("timestamp", -1)])
-    
-    if not context:
-        context = ContextVariables().model_dump()
-    
-    # Prepare data for AI analysis
+RISK_SYSTEM_MESSAGE = "Você é o GuardianFire AI, especialista em previsão de riscos industriais. Sempre responda em JSON válido."
+
+def build_risk_prompt(sector: dict, sensors: List[dict], reports: List[dict], context: dict) -> str:
+    """Build the prescriptive analysis prompt for one sector"""
     sensor_data = "\n".join([
-        f"- {s['name']} ({s['sensor_type']}): {s['current_value']}{s['unit']} (Status: {s['status']}, Max: {s['max_threshold']})"
+        f"- {s['name']} ({s['sensor_type']}): {s['current_value']}{s.get('unit', '')} (Status: {s['status']}, Max: {s['max_threshold']})"
         for s in sensors
     ])
     
@@ -540,7 +2421,7 @@ async def analyze_risk(request: RiskAnalysisRequest):
         for r in reports
     ]) or "Nenhum relato recente"
     
-    prompt = f"""Você é o GuardianFire AI, um sistema de previsão de riscos industriais. Analise os dados abaixo e forneça uma análise prescritiva.
+    return f"""Você é o GuardianFire AI, um sistema de previsão de riscos industriais. Analise os dados abaixo e forneça uma análise prescritiva.
 
 SETOR: {sector['name']}
 NÍVEL DE RISCO ATUAL: {sector['risk_level']}%
@@ -577,70 +2458,345 @@ Com base nesses dados, forneça em JSON:
 
 Seja prescritivo e específico. Não diga apenas "risco alto", diga exatamente o que fazer."""
 
-    try:
-        from emergentintegrations.llm.chat import LlmChat, UserMessage
-        
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"risk_analysis_{sector_id}_{uuid.uuid4().hex[:8]}",
-            system_message="Você é o GuardianFire AI, especialista em previsão de riscos industriais. Sempre responda em JSON válido."
-        ).with_model("gemini", "gemini-3-flash-preview")
-        
-        user_message = UserMessage(text=prompt)
+def risk_fingerprint(sector: dict, sensors: List[dict], reports: List[dict], context: dict) -> str:
+    """Hash the data that feeds the risk prompt
+
+    The sector's current risk level is left out: it is the output of the
+    previous analysis, so including it would make every repeat a miss.
+    """
+    inputs = {
+        "sector": sector["name"],
+        "sensors": sorted(
+            [s["name"], s["sensor_type"], s["current_value"], s.get("unit"), s["status"],
+             s["min_threshold"], s["max_threshold"]]
+            for s in sensors
+        ),
+        "reports": [[r["category"], r["description"], r["reporter_name"]] for r in reports],
+        "context": [
+            context.get("temperature_external", 25),
+            context.get("humidity", 50),
+            context.get("machine_load", 70),
+            context.get("team_fatigue", 30),
+            context.get("last_maintenance_days", 7)
+        ]
+    }
+    return hashlib.sha256(json.dumps(inputs, default=str).encode()).hexdigest()
+
+async def call_risk_llm(sector_id: str, prompt: str) -> dict:
+    """Ask the LLM for a risk analysis and parse its JSON answer"""
+    from emergentintegrations.llm.chat import LlmChat, UserMessage
+    
+    chat = LlmChat(
+        api_key=EMERGENT_LLM_KEY,
+        session_id=f"risk_analysis_{sector_id}_{uuid.uuid4().hex[:8]}",
+        system_message=RISK_SYSTEM_MESSAGE
+    ).with_model("gemini", "gemini-3-flash-preview")
+    
+    user_message = UserMessage(text=prompt)
+    LLM_REQUESTS.inc()
+    with LLM_FAILURES.count_exceptions(), LLM_DURATION.time():
         response = await chat.send_message(user_message)
-        
-        # Parse JSON response
-        import json
-        # Clean response if it has markdown code blocks
-        response_text = response.strip()
-        if response_text.startswith("```"):
-            response_text = response_text.split("```")[1]
-            if response_text.startswith("json"):
-                response_text = response_text[4:]
-        response_text = response_text.strip()
-        
-        analysis = json.loads(response_text)
-        
-        # Update sector risk level
-        await db.sectors.update_one(
-            {"sector_id": sector_id},
-            {"$set": {
-                "risk_level": analysis["risk_score"],
-                "status": analysis["risk_status"]
-            }}
+    
+    # Clean response if it has markdown code blocks
+    response_text = response.strip()
+    if response_text.startswith("```"):
+        response_text = response_text.split("```")[1]
+        if response_text.startswith("json"):
+            response_text = response_text[4:]
+    response_text = response_text.strip()
+    
+    return json.loads(response_text)
+
+def risk_analysis_writes(sector_id: str, analysis: dict):
+    """Build the sector risk and alerts that an analysis produces"""
+    sector_risk = {
+        "sector_id": sector_id,
+        "risk_level": analysis["risk_score"],
+        "status": analysis["risk_status"]
+    }
+    
+    # Create alerts for urgent actions
+    alerts = [
+        Alert(
+            sector_id=sector_id,
+            alert_type="prediction",
+            severity="critical" if action["priority"] == "urgent" else "high",
+            title=action["action"][:100],
+            description=action["reason"],
+            probability=analysis["confidence"],
+            prescribed_action=action["action"]
+        )
+        for action in analysis.get("prescribed_actions", [])
+        if action["priority"] in ["urgent", "high"]
+    ]
+    return sector_risk, alerts
+
+async def apply_risk_writes(sector_risks: List[dict], alerts: List[Alert]):
+    """Write sector risk updates, new alerts and what rules make of them in bulk"""
+    rule_alerts, rule_orders = run_rules([], alerts)
+    
+    writes = [write_alerts(alerts + rule_alerts, rule_orders)]
+    if sector_risks:
+        writes.append(db.sectors.bulk_write([
+            UpdateOne(
+                {"sector_id": risk["sector_id"]},
+                {"$set": {"risk_level": risk["risk_level"], "status": risk["status"]}}
+            )
+            for risk in sector_risks
+        ], ordered=False))
+    (created, repeated), *_ = await asyncio.gather(*writes)
+    
+    invalidate_dashboard_stats()
+    publish_alerts(created, repeated, rule_orders)
+    for risk in sector_risks:
+        event_broker.publish("sector.risk", risk, risk["sector_id"])
+
+def local_risk_analysis(local: dict) -> dict:
+    """Analysis built from the local risk score alone"""
+    top_sensor = local["top_sensor"]
+    if top_sensor:
+        primary_concern = (
+            f"{top_sensor['name']}: {top_sensor['current_value']}{top_sensor.get('unit', '')} "
+            f"(Faixa: {top_sensor['min_threshold']}-{top_sensor['max_threshold']}{top_sensor.get('unit', '')})"
         )
+    else:
+        primary_concern = "Nenhum sensor fora da faixa normal"
+    
+    return {
+        "risk_score": local["risk_score"],
+        "risk_status": local["risk_status"],
+        "primary_concern": primary_concern,
+        "prescribed_actions": [],
+        "prediction": "Continuar monitoramento normal",
+        "confidence": 50,
+        "source": "local"
+    }
+
+def fallback_risk_analysis(local: dict, error: Exception) -> dict:
+    """Analysis returned when the LLM is unavailable"""
+    analysis = local_risk_analysis(local)
+    analysis["prediction"] = "Análise prescritiva indisponível, verificar o sensor indicado"
+    analysis["error"] = str(error)
+    return analysis
+
+def risk_changed(sector: dict, sector_risk: dict) -> bool:
+    """Whether a sector risk update differs from what is stored"""
+    return (sector.get("risk_level"), sector.get("status")) != (sector_risk["risk_level"], sector_risk["status"])
+
+@api_router.post("/analyze-risk")
+async def analyze_risk(request: RiskAnalysisRequest):
+    """Score a sector's risk and, when it is high enough, ask the AI for actions
+
+    The score always comes from the local engine. The LLM is only called
+    from RISK_LLM_THRESHOLD up, with results cached by a fingerprint of
+    the prompt inputs so concurrent requests share one call.
+    """
+    sector_id = request.sector_id
+    
+    # Gather all data for the sector
+    sector = await db.sectors.find_one({"sector_id": sector_id}, {"_id": 0})
+    if not sector:
+        raise HTTPException(status_code=404, detail="Sector not found")
+    
+    sensors, reports, context = await asyncio.gather(
+        db.sensors.find({"sector_id": sector_id}, {"_id": 0}).to_list(50),
+        db.behavioral_reports.find({"sector_id": sector_id}, {"_id": 0}).sort("created_at", -1).to_list(10),
+        db.context_variables.find_one({}, {"_id": 0}, sort=[("timestamp", -1)])
+    )
+    
+    if not context:
+        context = ContextVariables().model_dump()
+    current_values.overlay(sensors)
+    
+    local = score_sectors([sector_id], sensors, {sector_id: len(reports)}, context)[sector_id]
+    if local["risk_score"] < RISK_LLM_THRESHOLD:
+        analysis = local_risk_analysis(local)
+        sector_risk, _ = risk_analysis_writes(sector_id, analysis)
+        if risk_changed(sector, sector_risk):
+            await apply_risk_writes([sector_risk], [])
+        return analysis
+    
+    prompt = build_risk_prompt(sector, sensors, reports, context)
+    cache_key = f"{sector_id}:{risk_fingerprint(sector, sensors, reports, context)}"
+    
+    async def run_analysis():
+        analysis = await call_risk_llm(sector_id, prompt)
+        analysis.update(risk_score=local["risk_score"], risk_status=local["risk_status"], source="llm")
+        sector_risk, alerts = risk_analysis_writes(sector_id, analysis)
+        await apply_risk_writes([sector_risk], alerts)
+        return analysis
+    
+    try:
+        return await risk_analysis_cache.get_or_load(cache_key, run_analysis)
+    except Exception as e:
+        logger.error(f"AI analysis error: {e}")
+        analysis = fallback_risk_analysis(local, e)
+        sector_risk, _ = risk_analysis_writes(sector_id, analysis)
+        if risk_changed(sector, sector_risk):
+            await apply_risk_writes([sector_risk], [])
+        return analysis
+
+async def gather_risk_inputs(sector_ids: List[str]):
+    """Load sectors, sensors, recent reports and context for many sectors at once"""
+    sectors, sensors, reports, context = await asyncio.gather(
+        db.sectors.find({"sector_id": {"$in": sector_ids}}, {"_id": 0}).to_list(len(sector_ids)),
+        db.sensors.find({"sector_id": {"$in": sector_ids}}, {"_id": 0}).to_list(None),
+        db.behavioral_reports.aggregate([
+            {"$match": {"sector_id": {"$in": sector_ids}}},
+            {"$setWindowFields": {
+                "partitionBy": "$sector_id",
+                "sortBy": {"created_at": -1},
+                "output": {"rank": {"$documentNumber": {}}}
+            }},
+            {"$match": {"rank": {"$lte": 10}}},
+            {"$sort": {"sector_id": 1, "created_at": -1}},
+            {"$project": {"_id": 0, "rank": 0}}
+        ]).to_list(None),
+        db.context_variables.find_one({}, {"_id": 0}, sort=[("timestamp", -1)])
+    )
+    
+    sensors_by_sector = defaultdict(list)
+    for sensor in current_values.overlay(sensors):
+        if len(sensors_by_sector[sensor["sector_id"]]) < 50:
+            sensors_by_sector[sensor["sector_id"]].append(sensor)
+    reports_by_sector = defaultdict(list)
+    for report in reports:
+        reports_by_sector[report["sector_id"]].append(report)
+    
+    return (
+        {s["sector_id"]: s for s in sectors},
+        sensors_by_sector,
+        reports_by_sector,
+        context or ContextVariables().model_dump()
+    )
+
+def score_local_risk(sector_ids: List[str], sensors_by_sector: dict, reports_by_sector: dict, context: dict) -> dict:
+    """Run the local risk engine over the output of gather_risk_inputs"""
+    sensors = [sensor for sector_id in sector_ids for sensor in sensors_by_sector[sector_id]]
+    report_counts = {sector_id: len(reports_by_sector[sector_id]) for sector_id in sector_ids}
+    return score_sectors(sector_ids, sensors, report_counts, context)
+
+async def run_batch_risk_analysis(sector_ids: List[str], results: asyncio.Queue):
+    """Analyze many sectors under a concurrency limit, queueing results as they finish
+
+    A sector whose analysis fails is reported with its error and does not
+    stop the others. Writes are flushed in bulk once every sector is done,
+    whether or not the client is still reading the stream, and also when
+    the batch itself fails partway.
+    """
+    semaphore = asyncio.Semaphore(RISK_ANALYSIS_CONCURRENCY)
+    sector_risks = []
+    alerts = []
+    
+    def record_local(sector: dict, analysis: dict):
+        sector_risk, _ = risk_analysis_writes(sector["sector_id"], analysis)
+        if risk_changed(sector, sector_risk):
+            sector_risks.append(sector_risk)
+    
+    async def analyze_sector(sector: dict) -> dict:
+        try:
+            return await analyze_one(sector)
+        except Exception as e:
+            logger.error(f"Risk analysis of {sector['sector_id']} failed: {e}")
+            return {"sector_id": sector["sector_id"], "error": str(e)}
+    
+    async def analyze_one(sector: dict) -> dict:
+        sector_id = sector["sector_id"]
+        local = local_scores[sector_id]
+        if local["risk_score"] < RISK_LLM_THRESHOLD:
+            analysis = local_risk_analysis(local)
+            record_local(sector, analysis)
+            return {"sector_id": sector_id, "analysis": analysis}
         
-        # Create alerts for urgent actions
-        for action in analysis.get("prescribed_actions", []):
-            if action["priority"] in ["urgent", "high"]:
-                alert = Alert(
-                    sector_id=sector_id,
-                    alert_type="prediction",
-                    severity="critical" if action["priority"] == "urgent" else "high",
-                    title=action["action"][:100],
-                    description=action["reason"],
-                    probability=analysis["confidence"],
-                    prescribed_action=action["action"]
-                )
-                doc = alert.model_dump()
-                doc["created_at"] = doc["created_at"].isoformat()
-                doc["resolved_at"] = None
-                await db.alerts.insert_one(doc)
+        sensors = sensors_by_sector[sector_id]
+        reports = reports_by_sector[sector_id]
+        prompt = build_risk_prompt(sector, sensors, reports, context)
+        cache_key = f"{sector_id}:{risk_fingerprint(sector, sensors, reports, context)}"
         
-        return analysis
+        async def run_analysis():
+            async with semaphore:
+                analysis = await call_risk_llm(sector_id, prompt)
+            analysis.update(risk_score=local["risk_score"], risk_status=local["risk_status"], source="llm")
+            sector_risk, sector_alerts = risk_analysis_writes(sector_id, analysis)
+            sector_risks.append(sector_risk)
+            alerts.extend(sector_alerts)
+            return analysis
         
+        try:
+            analysis = await risk_analysis_cache.get_or_load(cache_key, run_analysis)
+        except Exception as e:
+            logger.error(f"AI analysis error for {sector_id}: {e}")
+            analysis = fallback_risk_analysis(local, e)
+            record_local(sector, analysis)
+        return {"sector_id": sector_id, "analysis": analysis}
+    
+    try:
+        sectors, sensors_by_sector, reports_by_sector, context = await gather_risk_inputs(sector_ids)
+        for sector_id in sector_ids:
+            if sector_id not in sectors:
+                results.put_nowait({"sector_id": sector_id, "error": "Sector not found"})
+        
+        local_scores = score_local_risk(list(sectors), sensors_by_sector, reports_by_sector, context)
+        tasks = [analyze_sector(sector) for sector in sectors.values()]
+        for finished in asyncio.as_completed(tasks):
+            results.put_nowait(await finished)
     except Exception as e:
-        logger.error(f"AI analysis error: {e}")
-        # Return a simulated analysis
-        return {
-            "risk_score": sector.get("risk_level", 30),
-            "risk_status": sector.get("status", "safe"),
-            "primary_concern": "Análise automática indisponível",
-            "prescribed_actions": [],
-            "prediction": "Continuar monitoramento normal",
-            "confidence": 50,
-            "error": str(e)
+        logger.error(f"Batch risk analysis error: {e}")
+        results.put_nowait({"error": str(e)})
+    finally:
+        try:
+            await apply_risk_writes(sector_risks, alerts)
+        except Exception as e:
+            logger.error(f"Batch risk analysis writes failed: {e}")
+            results.put_nowait({"error": str(e)})
+        results.put_nowait(None)
+
+# Keeps batch analyses alive while they run detached from their request
+background_tasks = set()
+
+@api_router.post("/analyze-risk/batch")
+async def analyze_risk_batch(request: BatchRiskAnalysisRequest):
+    """Analyze many sectors concurrently, streaming NDJSON results as they finish"""
+    sector_ids = list(dict.fromkeys(request.sector_ids))
+    if len(sector_ids) > RISK_BATCH_MAX_SECTORS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {RISK_BATCH_MAX_SECTORS} sectors per request"
+        )
+    results = asyncio.Queue()
+    task = asyncio.create_task(run_batch_risk_analysis(sector_ids, results))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    
+    async def result_stream():
+        while True:
+            result = await results.get()
+            if result is None:
+                break
+            yield json.dumps(jsonable_encoder(result)) + "\n"
+    
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
+@api_router.get("/risk-scores")
+async def get_risk_scores():
+    """Score every sector with the local engine, without calling the LLM or writing"""
+    sectors = await db.sectors.find({}, {"_id": 0, "sector_id": 1}).to_list(None)
+    sector_ids = [s["sector_id"] for s in sectors]
+    _, sensors_by_sector, reports_by_sector, context = await gather_risk_inputs(sector_ids)
+    local_scores = score_local_risk(sector_ids, sensors_by_sector, reports_by_sector, context)
+    
+    return [
+        {
+            "sector_id": sector_id,
+            "risk_score": local["risk_score"],
+            "risk_status": local["risk_status"],
+            "sensor_score": local["sensor_score"],
+            "report_score": local["report_score"],
+            "context_score": local["context_score"],
+            "top_sensor_id": local["top_sensor"]["sensor_id"] if local["top_sensor"] else None
         }
+        for sector_id, local in local_scores.items()
+    ]
 
 # ============== EMAIL NOTIFICATIONS ==============
 
@@ -670,45 +2826,103 @@ async def send_alert_email(email_request: EmailRequest):
 
 # ============== DASHBOARD STATS ==============
 
-@api_router.get("/dashboard/stats")
-async def get_dashboard_stats():
-    """Get dashboard statistics"""
-    total_sectors = await db.sectors.count_documents({})
-    total_sensors = await db.sensors.count_documents({})
-    active_alerts = await db.alerts.count_documents({"status": "active"})
-    pending_orders = await db.work_orders.count_documents({"status": "pending"})
-    
-    # Get sensors by status
-    critical_sensors = await db.sensors.count_documents({"status": "critical"})
-    warning_sensors = await db.sensors.count_documents({"status": "warning"})
+async def load_dashboard_stats() -> dict:
+    """Gather dashboard statistics with one concurrent query per collection"""
+    sector_facets, sensor_statuses, active_alerts, pending_orders = await asyncio.gather(
+        db.sectors.aggregate([{"$facet": {
+            "total": [{"$count": "count"}],
+            "average_risk": [{"$group": {"_id": None, "value": {"$avg": "$risk_level"}}}],
+            "sectors": [{"$limit": 100}, {"$project": {"_id": 0}}]
+        }}]).to_list(1),
+        db.sensors.aggregate([
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ]).to_list(None),
+        db.alerts.count_documents({"status": "active"}),
+        db.work_orders.count_documents({"status": "pending"})
+    )
     
-    # Get sectors by status
-    sectors = await db.sectors.find({}, {"_id": 0}).to_list(100)
-    avg_risk = sum(s.get("risk_level", 0) for s in sectors) / max(len(sectors), 1)
+    facets = sector_facets[0]
+    sensor_counts = {s["_id"]: s["count"] for s in sensor_statuses}
+    avg_risk = facets["average_risk"][0]["value"] if facets["average_risk"] else 0
     
     return {
-        "total_sectors": total_sectors,
-        "total_sensors": total_sensors,
+        "total_sectors": facets["total"][0]["count"] if facets["total"] else 0,
+        "total_sensors": sum(sensor_counts.values()),
         "active_alerts": active_alerts,
         "pending_orders": pending_orders,
-        "critical_sensors": critical_sensors,
-        "warning_sensors": warning_sensors,
-        "average_risk": round(avg_risk, 1),
-        "sectors": sectors
+        "critical_sensors": sensor_counts.get("critical", 0),
+        "warning_sensors": sensor_counts.get("warning", 0),
+        "average_risk": round(avg_risk or 0, 1),
+        "sectors": facets["sectors"]
     }
 
+@api_router.get("/dashboard/stats")
+async def get_dashboard_stats():
+    """Get dashboard statistics, shared across viewers for a short TTL"""
+    return await dashboard_cache.get_or_load("stats", load_dashboard_stats)
+
+async def load_dashboard_snapshot() -> bytes:
+    """Build and encode everything the dashboard shows in one payload
+
+    Stats are computed afresh rather than taken from dashboard_cache,
+    which may predate the content version the snapshot is cached under.
+    """
+    stats, alerts, sensors, context = await asyncio.gather(
+        load_dashboard_stats(),
+        db.alerts.find({"status": "active"}, {"_id": 0}).sort(
+            [("created_at", DESCENDING), ("alert_id", DESCENDING)]
+        ).to_list(100),
+        db.sensors.find({}, {"_id": 0}).sort(
+            [("created_at", ASCENDING), ("sensor_id", ASCENDING)]
+        ).to_list(100),
+        get_context()
+    )
+    snapshot = {
+        "stats": stats,
+        "alerts": [Alert(**a) for a in alerts],
+        "sensors": [Sensor(**s) for s in current_values.overlay(sensors)],
+        "context": context
+    }
+    return json.dumps(jsonable_encoder(snapshot)).encode()
+
+@api_router.get("/dashboard/snapshot")
+async def get_dashboard_snapshot(request: Request):
+    """Get stats, active alerts, sensors and context with a version ETag"""
+    etag = await content_version.etag()
+    if_none_match = request.headers.get("If-None-Match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    body = await snapshot_cache.get_or_load(etag, load_dashboard_snapshot)
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": "no-cache"}
+    )
+
 # ============== SIMULATION / SEED DATA ==============
 
+def reset_plant_state():
+    """Forget what this process keeps in memory about the plant being replaced"""
+    sensor_meta_cache.clear()
+    risk_analysis_cache.clear()
+    anomaly_detector.clear()
+    history_compressor.clear()
+    current_values.clear()
+    rule_engine.clear_cooldowns()
+
 @api_router.post("/seed-demo-data")
 async def seed_demo_data():
     """Seed demo data for testing"""
     # Clear existing data
     await db.sectors.delete_many({})
     await db.sensors.delete_many({})
+    reset_plant_state()
     await db.alerts.delete_many({})
     await db.work_orders.delete_many({})
     await db.behavioral_reports.delete_many({})
     await db.context_variables.delete_many({})
+    await db.history_held.delete_many({})
     
     # Create sectors
     sectors_data = [
@@ -718,13 +2932,8 @@ async def seed_demo_data():
         {"name": "Setor D - Caldeiras", "description": "Sistema de caldeiras e vapor", "risk_level": 38, "status": "warning"},
     ]
     
-    created_sectors = []
-    for s in sectors_data:
-        sector = Sector(**s)
-        doc = sector.model_dump()
-        doc["created_at"] = doc["created_at"].isoformat()
-        await db.sectors.insert_one(doc)
-        created_sectors.append(sector)
+    created_sectors = [Sector(**s) for s in sectors_data]
+    sector_docs = [sector.model_dump() for sector in created_sectors]
     
     # Create sensors for each sector
     sensor_types = [
@@ -735,6 +2944,7 @@ async def seed_demo_data():
         {"type": "humidity", "unit": "%", "min": 30, "max": 80},
     ]
     
+    sensor_docs = []
     for sector in created_sectors:
         for st in sensor_types:
             # Generate realistic values
@@ -763,7 +2973,7 @@ async def seed_demo_data():
             )
             doc = sensor.model_dump()
             doc["last_reading"] = doc["last_reading"].isoformat()
-            await db.sensors.insert_one(doc)
+            sensor_docs.append(doc)
     
     # Create alerts for critical sector
     critical_sector = created_sectors[2]  # Setor C
@@ -797,12 +3007,7 @@ async def seed_demo_data():
         }
     ]
     
-    for a in alerts_data:
-        alert = Alert(**a)
-        doc = alert.model_dump()
-        doc["created_at"] = doc["created_at"].isoformat()
-        doc["resolved_at"] = None
-        await db.alerts.insert_one(doc)
+    alert_docs = [alert_document(Alert(**a)) for a in alerts_data]
     
     # Create work orders
     orders_data = [
@@ -822,13 +3027,7 @@ async def seed_demo_data():
         }
     ]
     
-    for o in orders_data:
-        order = WorkOrder(**o)
-        doc = order.model_dump()
-        doc["created_at"] = doc["created_at"].isoformat()
-        doc["due_date"] = None
-        doc["completed_at"] = None
-        await db.work_orders.insert_one(doc)
+    order_docs = [work_order_document(WorkOrder(**o)) for o in orders_data]
     
     # Create behavioral reports
     reports_data = [
@@ -837,11 +3036,7 @@ async def seed_demo_data():
         {"sector_id": created_sectors[1].sector_id, "reporter_name": "Pedro", "description": "Muita poeira acumulada nas caixas", "category": "visual"},
     ]
     
-    for r in reports_data:
-        report = BehavioralReport(**r)
-        doc = report.model_dump()
-        doc["created_at"] = doc["created_at"].isoformat()
-        await db.behavioral_reports.insert_one(doc)
+    report_docs = [BehavioralReport(**r).model_dump() for r in reports_data]
     
     # Create context variables (simulating hot, dry day with high load)
     context = ContextVariables(
@@ -851,12 +3046,305 @@ async def seed_demo_data():
         team_fatigue=65.0,
         last_maintenance_days=12
     )
-    doc = context.model_dump()
-    doc["timestamp"] = doc["timestamp"].isoformat()
-    await db.context_variables.insert_one(doc)
+    context_doc = context.model_dump()
+    context_doc["timestamp"] = context_doc["timestamp"].isoformat()
+    
+    # One batched write per collection
+    await asyncio.gather(
+        db.sectors.insert_many(sector_docs),
+        db.sensors.insert_many(sensor_docs),
+        db.alerts.insert_many(alert_docs),
+        db.work_orders.insert_many(order_docs),
+        db.behavioral_reports.insert_many(report_docs),
+        db.context_variables.insert_one(context_doc)
+    )
     
+    invalidate_dashboard_stats()
     return {"message": "Demo data seeded successfully", "sectors": len(created_sectors)}
 
+SYNTHETIC_ALERTS = [
+    ("deviation", "high", "Desvio súbito em {name}", "Leitura fora do comportamento habitual do sensor."),
+    ("prediction", "critical", "Risco de superaquecimento em {name}", "Tendência de alta sustentada nas últimas horas."),
+    ("rule", "medium", "Limite operacional excedido em {name}", "Regra prescritiva disparada pela leitura."),
+    ("maintenance", "low", "Inspeção preventiva de {name}", "Prazo de inspeção do equipamento se aproximando.")
+]
+
+SYNTHETIC_REPORTS = [
+    ("smell", "Cheiro de queimado perto do painel"),
+    ("noise", "Ruído anormal na esteira"),
+    ("visual", "Poeira acumulada sobre os motores"),
+    ("other", "Equipamento desligando sozinho")
+]
+
+SYNTHETIC_TEAM = ["Carlos Silva", "Ana Souza", "Equipe Manutenção", "Equipe Elétrica", None]
+
+def synthetic_sector(
+    layout: dict,
+    request: SyntheticPlantRequest,
+    times,
+    stamps: List[datetime],
+    buckets: dict
+) -> dict:
+    """Build every document of one synthetic sector
+
+    Runs in a worker thread; the NumPy parts release the GIL.
+    """
+    rng = np.random.default_rng(layout["seed"])
+    start, end = stamps[0], stamps[-1]
+    span = (end - start).total_seconds()
+    sector = Sector(
+        name=f"Setor {layout['index'] + 1:04d}",
+        description="Setor sintético para testes de carga",
+        created_at=start
+    )
+    load = synthetic.sector_load(rng, times, layout["stress"])
+    
+    sensors, readings, rollups = [], [], []
+    for number, spec in enumerate(layout["sensor_types"], 1):
+        values = synthetic.sensor_values(rng, spec, load, layout["stress"])
+        current = float(values[-1])
+        sensor = Sensor(
+            sector_id=sector.sector_id,
+            name=f"{spec['type'].title()} {number} - {sector.name}",
+            sensor_type=spec["type"],
+            unit=spec["unit"],
+            current_value=current,
+            min_threshold=spec["min"],
+            max_threshold=spec["max"],
+            status=classify_reading(current, spec["min"], spec["max"]),
+            last_reading=end,
+            created_at=start
+        )
+        doc = sensor.model_dump()
+        doc["last_reading"] = doc["last_reading"].isoformat()
+        sensors.append(doc)
+        
+        sensor_id = sensor.sensor_id
+        readings.extend(
+            {"sensor_id": sensor_id, "value": value, "timestamp": timestamp}
+            for timestamp, value in zip(stamps, values.tolist())
+        )
+        for resolution, (starts, bucket_stamps, last_stamps) in buckets.items():
+            agg = synthetic.rollup_values(values, starts)
+            rollups.extend(
+                {
+                    "sensor_id": sensor_id, "resolution": resolution, "bucket": bucket,
+                    "min": low, "max": high, "sum": total, "count": count,
+                    "last": last, "last_at": last_at
+                }
+                for bucket, low, high, total, count, last, last_at in zip(
+                    bucket_stamps, agg["min"].tolist(), agg["max"].tolist(), agg["sum"].tolist(),
+                    agg["count"].tolist(), agg["last"].tolist(), last_stamps
+                )
+            )
+    
+    def moment() -> datetime:
+        return start + timedelta(seconds=float(rng.uniform(0, span)))
+    
+    # Only one active alert per dedup key, as upsert_alerts keeps it
+    alerts, active_keys = [], set()
+    for _ in range(request.alerts_per_sector):
+        sensor = sensors[rng.integers(len(sensors))]
+        alert_type, severity, title, description = SYNTHETIC_ALERTS[rng.integers(len(SYNTHETIC_ALERTS))]
+        alert = Alert(
+            sector_id=sector.sector_id,
+            sensor_id=sensor["sensor_id"],
+            alert_type=alert_type,
+            severity=severity,
+            title=title.format(name=sensor["name"]),
+            description=description,
+            probability=round(float(rng.uniform(30, 99)), 1),
+            prescribed_action="Inspecionar o equipamento e registrar a ocorrência",
+            created_at=moment()
+        )
+        key = alert_dedup_key(alert)
+        if key in active_keys or rng.random() < 0.6:
+            alert.status = str(rng.choice(["acknowledged", "resolved"]))
+            if alert.status == "resolved":
+                alert.resolved_at = min(alert.created_at + timedelta(hours=float(rng.uniform(0.5, 48))), end)
+        else:
+            active_keys.add(key)
+        alerts.append(alert_document(alert))
+    
+    orders = []
+    for _ in range(request.work_orders_per_sector):
+        alert = alerts[rng.integers(len(alerts))] if alerts and rng.random() < 0.5 else None
+        created_at = ensure_datetime(alert["created_at"]) if alert else moment()
+        status = str(rng.choice(["pending", "in_progress", "completed", "cancelled"], p=[0.4, 0.2, 0.3, 0.1]))
+        order = WorkOrder(
+            alert_id=alert["alert_id"] if alert else None,
+            sector_id=sector.sector_id,
+            title=f"Inspeção - {alert['title']}" if alert else f"Manutenção de rotina - {sector.name}",
+            description="Ordem de serviço gerada para testes de carga",
+            priority=str(rng.choice(["low", "medium", "high", "urgent"])),
+            assigned_to=SYNTHETIC_TEAM[rng.integers(len(SYNTHETIC_TEAM))],
+            status=status,
+            due_date=created_at + timedelta(days=float(rng.uniform(1, 14))),
+            created_at=created_at,
+            completed_at=min(created_at + timedelta(hours=float(rng.uniform(1, 72))), end) if status == "completed" else None
+        )
+        orders.append(work_order_document(order))
+    
+    reports = []
+    for _ in range(request.reports_per_sector):
+        category, description = SYNTHETIC_REPORTS[rng.integers(len(SYNTHETIC_REPORTS))]
+        doc = BehavioralReport(
+            sector_id=sector.sector_id,
+            reporter_name=f"Operador {rng.integers(1, 200)}",
+            description=description,
+            category=category,
+            created_at=moment()
+        ).model_dump()
+        reports.append(doc)
+    
+    return {
+        "sector": sector.model_dump(),
+        "sensors": sensors,
+        "readings": readings,
+        "rollups": rollups,
+        "alerts": alerts,
+        "work_orders": orders,
+        "reports": reports
+    }
+
+async def seed_synthetic_plant(request: SyntheticPlantRequest) -> dict:
+    """Replace all plant data with a generated plant, written in batches
+
+    Sectors are generated one at a time in a worker thread while the
+    previous ones are written, with up to SYNTHETIC_WRITE_CONCURRENCY
+    insert_many calls of SYNTHETIC_BATCH_SIZE documents in flight.
+    Readings are stored verbatim, without history compression, and the
+    rollups are computed from them directly.
+    """
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        db[name].delete_many({})
+        for name in (
+            "sectors", "sensors", "alerts", "work_orders", "behavioral_reports", "context_variables", "history_held"
+        )
+    ])
+    await asyncio.gather(db[READINGS_COLLECTION].drop(), db.sensor_rollups.drop())
+    await ensure_readings_collection()
+    await ensure_indexes()
+    reset_plant_state()
+    
+    times = synthetic.time_grid(datetime.now(timezone.utc), request.days, request.interval_seconds)
+    stamps = synthetic.to_datetimes(times)
+    buckets = {}
+    if request.rollups:
+        for resolution, step in ROLLUP_RESOLUTIONS.items():
+            starts, bucket_times = synthetic.rollup_buckets(times, step.total_seconds())
+            last_stamps = [stamps[i - 1] for i in [*starts[1:].tolist(), len(stamps)]]
+            buckets[resolution] = (starts, synthetic.to_datetimes(bucket_times), last_stamps)
+    
+    pending = set()
+    counts = defaultdict(int)
+    
+    async def write(collection, docs: List[dict]):
+        counts[collection.name] += len(docs)
+        for i in range(0, len(docs), SYNTHETIC_BATCH_SIZE):
+            if len(pending) >= SYNTHETIC_WRITE_CONCURRENCY:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                pending.difference_update(done)
+                for task in done:
+                    task.result()
+            pending.add(asyncio.create_task(
+                collection.insert_many(docs[i:i + SYNTHETIC_BATCH_SIZE], ordered=False)
+            ))
+    
+    sectors, sensors, report_counts = [], [], {}
+    layouts = synthetic.plant_layout(request.sectors, request.sensors_per_sector, request.seed)
+    for layout in layouts:
+        generated = await asyncio.to_thread(synthetic_sector, layout, request, times, stamps, buckets)
+        sectors.append(generated["sector"])
+        sensors.extend(generated["sensors"])
+        report_counts[generated["sector"]["sector_id"]] = len(generated["reports"])
+        await write(db[READINGS_COLLECTION], generated["readings"])
+        await write(db.sensor_rollups, generated["rollups"])
+        await write(db.sensors, generated["sensors"])
+        await write(db.alerts, generated["alerts"])
+        await write(db.work_orders, generated["work_orders"])
+        await write(db.behavioral_reports, generated["reports"])
+        if (layout["index"] + 1) % max(1, len(layouts) // 10) == 0:
+            logger.info(f"Synthetic plant: {layout['index'] + 1}/{len(layouts)} sectors generated")
+    
+    # Sector risk from the generated sensors, as the local engine would score it
+    context = ContextVariables().model_dump()
+    scores = score_sectors([s["sector_id"] for s in sectors], sensors, report_counts, context)
+    for sector in sectors:
+        sector["risk_level"] = scores[sector["sector_id"]]["risk_score"]
+        sector["status"] = scores[sector["sector_id"]]["risk_status"]
+    context["timestamp"] = context["timestamp"].isoformat()
+    await write(db.sectors, sectors)
+    await write(db.context_variables, [context])
+    await asyncio.gather(*pending)
+    
+    invalidate_dashboard_stats()
+    content_version.bump()
+    return {
+        "sectors": counts["sectors"],
+        "sensors": counts["sensors"],
+        "readings": counts[READINGS_COLLECTION],
+        "rollups": counts["sensor_rollups"],
+        "alerts": counts["alerts"],
+        "work_orders": counts["work_orders"],
+        "behavioral_reports": counts["behavioral_reports"],
+        "seconds": round(time.perf_counter() - started, 2)
+    }
+
+@api_router.post("/seed-synthetic-data")
+async def seed_synthetic_data(request: SyntheticPlantRequest):
+    """Replace all plant data with a generated plant for load testing
+
+    Larger plants than SYNTHETIC_MAX_READINGS readings are generated with
+    the synthetic.py CLI instead.
+    """
+    readings = request.sectors * request.sensors_per_sector * synthetic.readings_per_sensor(
+        request.days, request.interval_seconds
+    )
+    if readings > SYNTHETIC_MAX_READINGS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"{readings} readings requested, at most {SYNTHETIC_MAX_READINGS} through the API"
+        )
+    return await seed_synthetic_plant(request)
+
+# ============== PUSH CHANNEL ==============
+
+@api_router.get("/events")
+async def stream_events(request: Request, sector_id: Optional[str] = None):
+    """Stream sensor, alert, work order and sector changes as server-sent events
+
+    Only changes made by this worker are streamed, see EventBroker.
+    """
+    queue = event_broker.subscribe(sector_id)
+    
+    async def event_stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    payload = await asyncio.wait_for(queue.get(), timeout=EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                yield payload
+        finally:
+            event_broker.unsubscribe(queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/events/stats")
+async def get_event_stats():
+    """Get push channel subscriber and delivery counters"""
+    return event_broker.stats()
+
 # ============== HEALTH CHECK ==============
 
 @api_router.get("/")
@@ -867,17 +3355,88 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now(timezone.utc).isoformat()}
 
+@api_router.get("/ingest/stats")
+async def get_ingest_stats():
+    """Ingestion queues, batching, history compression and current value writes"""
+    return {
+        "mqtt": mqtt_gateway.stats() if mqtt_gateway else None,
+        "write_behind": write_behind.stats() if write_behind else None,
+        "compression": history_compressor.stats(),
+        "current_values": current_values.stats()
+    }
+
+@api_router.get("/cache/stats")
+async def get_cache_stats():
+    """Get hit/miss counters for the in-process caches"""
+    return {name: cache.stats() for name, cache in CACHES.items()}
+
 # Include the router in the main app
 app.include_router(api_router)
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics: route and MongoDB latencies, LLM calls, ingestion"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+async def ensure_readings_collection():
+    """Create the time-series readings collection if it does not exist yet"""
+    cursor = await db.list_collections(filter={"name": READINGS_COLLECTION})
+    collections = await cursor.to_list(1)
+    if not collections:
+        await db.create_collection(READINGS_COLLECTION, timeseries=READINGS_TIMESERIES)
+        logger.info(f"Created time-series collection {READINGS_COLLECTION}")
+    elif collections[0].get("type") != "timeseries":
+        logger.warning(
+            f"{READINGS_COLLECTION} is not a time-series collection, "
+            "run `python migrations.py readings` to convert it"
+        )
+
+# Set on startup when MQTT_ENABLED runs the gateway in-process
+mqtt_gateway = None
+
+@app.on_event("startup")
+async def startup_db_client():
+    global mqtt_gateway, write_behind
+    await ensure_readings_collection()
+    await ensure_indexes()
+    await store_held_history()
+    await reload_rules()
+    for periodic in (reload_rules_periodically, flush_current_values_periodically):
+        task = asyncio.create_task(periodic())
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+    
+    if WRITE_BEHIND:
+        write_behind = WriteBehindIngest(WriteAheadLog(WAL_DIR, WAL_FSYNC, WAL_SEGMENT_BYTES))
+        await write_behind.start()
+    
+    if MQTT_ENABLED:
+        from mqtt_gateway import create_gateway
+        mqtt_gateway = create_gateway(write_behind)
+        if mqtt_gateway.ingest is not write_behind:
+            await mqtt_gateway.ingest.start()
+        task = asyncio.create_task(mqtt_gateway.run())
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if mqtt_gateway and mqtt_gateway.ingest is not write_behind:
+        await mqtt_gateway.ingest.stop()
+    if write_behind:
+        await write_behind.stop()
+    await asyncio.gather(
+        flush_compressed_history(),
+        flush_current_values(stale_only=False),
+        content_version.flush()
+    )
     client.close()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Synthetic plant data for seeding and load testing
+
+Generates the reading history of a plant with NumPy, one sector at a
+time. Sensors in a sector share its load, a daily cycle plus a slowly
+wandering AR(1) term scaled by how stressed the sector is, so their
+readings rise and fall together the way temperature, energy and
+vibration do on a real line. Each sensor adds its own offset and noise.
+The documents are assembled and written with insert_many by
+seed_synthetic_plant in server.py.
+
+Run it with the same .env as the API; it replaces all plant data:
+
+    python synthetic.py --sectors 500 --sensors-per-sector 20 --days 7 --interval 60
+
+That is 10,000 sensors and about 100M readings.
+"""
+import argparse
+import asyncio
+import math
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Value ranges follow seed_demo_data; base, load and noise are fractions
+# of max_threshold for the normal level, the swing with sector load and
+# the per-reading noise
+SENSOR_TYPES = [
+    {"type": "temperature", "unit": "°C", "min": 15, "max": 45, "base": 0.55, "load": 0.15, "noise": 0.004},
+    {"type": "vibration", "unit": "mm/s", "min": 0, "max": 10, "base": 0.35, "load": 0.25, "noise": 0.05},
+    {"type": "energy", "unit": "kW", "min": 0, "max": 500, "base": 0.5, "load": 0.3, "noise": 0.01},
+    {"type": "smoke", "unit": "ppm", "min": 0, "max": 50, "base": 0.15, "load": 0.1, "noise": 0.01},
+    {"type": "humidity", "unit": "%", "min": 30, "max": 80, "base": 0.6, "load": -0.08, "noise": 0.003},
+]
+
+# Readings of the AR(1) load term taken into account, enough for phi**n to vanish
+LOAD_MEMORY = 256
+LOAD_PHI = 0.98
+
+def readings_per_sensor(days: float, interval: float) -> int:
+    return int(days * 86400 // interval)
+
+def time_grid(end: datetime, days: float, interval: float) -> np.ndarray:
+    """Epoch seconds of every reading, oldest first, ending at end"""
+    count = readings_per_sensor(days, interval)
+    return end.timestamp() - interval * np.arange(count - 1, -1, -1)
+
+def rollup_buckets(times: np.ndarray, step: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Index of the first reading of each bucket and the buckets' start times"""
+    buckets = times // step * step
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+    return starts, buckets[starts]
+
+def rollup_values(values: np.ndarray, starts: np.ndarray) -> Dict[str, np.ndarray]:
+    """min, max, sum, count and last of each bucket of one sensor's readings"""
+    ends = np.append(starts[1:], len(values))
+    return {
+        "min": np.minimum.reduceat(values, starts),
+        "max": np.maximum.reduceat(values, starts),
+        "sum": np.add.reduceat(values, starts),
+        "count": ends - starts,
+        "last": values[ends - 1]
+    }
+
+def sector_load(rng: np.random.Generator, times: np.ndarray, stress: float) -> np.ndarray:
+    """Shared load of a sector around 0, peaking in the afternoon"""
+    daily = np.sin(2 * math.pi * ((times % 86400) / 86400 - 0.375))
+    shocks = rng.normal(0.0, math.sqrt(1 - LOAD_PHI ** 2), len(times) + LOAD_MEMORY)
+    wander = np.convolve(shocks, LOAD_PHI ** np.arange(LOAD_MEMORY), mode="valid")[1:]
+    return 0.6 * daily + 0.4 * wander + 2.0 * stress
+
+def sensor_values(
+    rng: np.random.Generator,
+    spec: dict,
+    load: np.ndarray,
+    stress: float
+) -> np.ndarray:
+    """Readings of one sensor following its sector's load"""
+    offset = rng.normal(0.0, 0.03) + 0.2 * stress
+    values = spec["max"] * (
+        spec["base"] + offset
+        + spec["load"] * load
+        + rng.normal(0.0, spec["noise"], len(load))
+    )
+    return np.round(np.maximum(values, 0.0), 2)
+
+def plant_layout(sectors: int, sensors_per_sector: int, seed: int) -> List[dict]:
+    """Sector stress and sensor types, reproducible for a seed
+
+    Most sectors run calm, a few run hot enough to reach warning or
+    critical readings.
+    """
+    rng = np.random.default_rng(seed)
+    stress = rng.beta(1.2, 8.0, sectors)
+    return [
+        {
+            "index": i,
+            "stress": float(stress[i]),
+            "sensor_types": [SENSOR_TYPES[j % len(SENSOR_TYPES)] for j in range(sensors_per_sector)],
+            "seed": int(rng.integers(2 ** 32))
+        }
+        for i in range(sectors)
+    ]
+
+def to_datetimes(times: np.ndarray) -> List[datetime]:
+    return [datetime.fromtimestamp(t, tz=timezone.utc) for t in times.tolist()]
+
+async def main():
+    parser = argparse.ArgumentParser(description="Replace plant data with a synthetic plant")
+    parser.add_argument("--sectors", type=int, default=100)
+    parser.add_argument("--sensors-per-sector", type=int, default=20)
+    parser.add_argument("--days", type=float, default=7)
+    parser.add_argument("--interval", type=float, default=60, help="Seconds between readings")
+    parser.add_argument("--alerts-per-sector", type=int, default=10)
+    parser.add_argument("--work-orders-per-sector", type=int, default=5)
+    parser.add_argument("--reports-per-sector", type=int, default=5)
+    parser.add_argument("--no-rollups", action="store_true", help="Skip precomputed history rollups")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from server import SyntheticPlantRequest, seed_synthetic_plant, client
+
+    request = SyntheticPlantRequest(
+        sectors=args.sectors,
+        sensors_per_sector=args.sensors_per_sector,
+        days=args.days,
+        interval_seconds=args.interval,
+        alerts_per_sector=args.alerts_per_sector,
+        work_orders_per_sector=args.work_orders_per_sector,
+        reports_per_sector=args.reports_per_sector,
+        rollups=not args.no_rollups,
+        seed=args.seed
+    )
+    try:
+        result = await seed_synthetic_plant(request)
+    finally:
+        client.close()
+    for key, value in result.items():
+        print(f"{key}: {value}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
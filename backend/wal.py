@@ -0,0 +1,212 @@
+"""Append-only write-ahead log for records not yet committed to MongoDB
+
+Records are numbered and written as JSON lines to segment files named
+after their first sequence number. Once every record of a segment is
+committed the segment is deleted, so the log only holds what MongoDB
+does not have yet and replaying it after a crash is all that is needed.
+
+The highest committed sequence is kept in a checkpoint file, so replay
+skips records of the open segment that were already committed. While a
+group of records is being committed, the checkpoint also names the
+group and the steps of its commit that succeeded, so a replay can pick
+up the group where it stopped. Groups that cannot be committed are
+moved to dead-letter files next to the segments.
+
+With fsync off, an appended record survives a crash of the process but
+not of the machine. With fsync on, appenders wait for the data to reach
+the disk, and appenders arriving during one fsync share the next.
+"""
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".wal"
+DEAD_LETTER_SUFFIX = ".dead"
+CHECKPOINT_FILE = "checkpoint.json"
+
+class WriteAheadLog:
+    """Segmented JSON-lines log with group fsync"""
+
+    def __init__(self, directory: Path, fsync: bool = False, segment_bytes: int = 64 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.fsync = fsync
+        self.segment_bytes = segment_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        # (first_seq, last_seq, path) of closed segments, oldest first
+        self._closed: List[Tuple[int, int, Path]] = []
+        self._file = None
+        self._path = None
+        self._first_seq = 0
+        self._size = 0
+        self._seq = 0
+        self._committed = 0
+        self._synced = 0
+        self._sync_lock = asyncio.Lock()
+        self._unsynced_files = []
+        self.appended = 0
+        self.dead_lettered = 0
+        # Group being committed when the previous run stopped, see progress
+        self.pending_batch = None
+
+    def segments(self) -> List[Path]:
+        return sorted(self.directory.glob(f"*{SEGMENT_SUFFIX}"))
+
+    def replay(self) -> List[Tuple[int, dict]]:
+        """Read every record left over from a previous run, in order
+
+        A torn last line, from a crash mid-write, is skipped, as are
+        records the checkpoint marks as committed. New records are
+        numbered after the highest sequence found.
+        """
+        records = []
+        for path in self.segments():
+            last = int(path.stem) - 1
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"Skipping torn record in {path.name}")
+                        continue
+                    records.append((entry["seq"], entry["record"]))
+                    last = entry["seq"]
+            self._closed.append((int(path.stem), last, path))
+            self._seq = max(self._seq, last)
+
+        checkpoint = self._read_checkpoint()
+        committed = checkpoint.get("committed", 0)
+        records = [(seq, record) for seq, record in records if seq > committed]
+        batch = checkpoint.get("batch")
+        self.pending_batch = batch if batch and batch["last"] > committed else None
+        self._seq = max(self._seq, committed)
+        self._committed = self._synced = self._seq if not records else records[0][0] - 1
+        self.commit(self._committed)
+        return records
+
+    def append(self, record: dict) -> int:
+        """Write one record and return its sequence number"""
+        if self._file is None or self._size >= self.segment_bytes:
+            self._rotate()
+        self._seq += 1
+        line = json.dumps({"seq": self._seq, "record": record}, default=str).encode() + b"\n"
+        self._file.write(line)
+        # Hand the line to the OS so it outlives the process
+        self._file.flush()
+        self._size += len(line)
+        self.appended += 1
+        return self._seq
+
+    async def sync(self, seq: int):
+        """Wait until the record seq is on disk, sharing fsyncs between callers"""
+        if not self.fsync:
+            return
+        async with self._sync_lock:
+            if self._synced >= seq or self._committed >= seq:
+                return
+            target = self._seq
+            files = self._unsynced_files + [self._file]
+            self._unsynced_files = []
+            await asyncio.to_thread(_fsync_all, files)
+            self._synced = target
+
+    def progress(self, first: int, last: int, done):
+        """Record which steps of the commit of records first..last succeeded"""
+        self._write_checkpoint({
+            "committed": self._committed,
+            "batch": {"first": first, "last": last, "done": sorted(done)}
+        })
+
+    def commit(self, seq: int):
+        """Mark records up to seq as stored and delete the segments they fill"""
+        self._committed = max(self._committed, seq)
+        self._write_checkpoint({"committed": self._committed})
+        while self._closed and self._closed[0][1] <= self._committed:
+            _, _, path = self._closed.pop(0)
+            path.unlink(missing_ok=True)
+
+        # Start a fresh segment when the open one holds only committed records
+        if self._file is not None and self._seq <= self._committed and not self._sync_lock.locked():
+            self._file.close()
+            self._path.unlink(missing_ok=True)
+            self._file = None
+
+    def dead_letter(self, records: List[Tuple[int, dict]], error: str) -> Path:
+        """Set records aside in a dead-letter file, for inspection and manual replay
+
+        The records still have to be committed to leave the log.
+        """
+        path = self.directory / f"{records[0][0]:020d}{DEAD_LETTER_SUFFIX}"
+        with open(path, "ab") as f:
+            for seq, record in records:
+                f.write(json.dumps({"seq": seq, "record": record, "error": error}, default=str).encode() + b"\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        self.dead_lettered += len(records)
+        return path
+
+    def _read_checkpoint(self) -> dict:
+        try:
+            with open(self.directory / CHECKPOINT_FILE) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logger.warning(f"Ignoring unreadable {CHECKPOINT_FILE}, replaying the whole log")
+            return {}
+
+    def _write_checkpoint(self, checkpoint: dict):
+        """Replace the checkpoint atomically"""
+        path = self.directory / CHECKPOINT_FILE
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(checkpoint, f)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _rotate(self):
+        if self._file is not None:
+            self._closed.append((self._first_seq, self._seq, self._path))
+            if self.fsync:
+                # Closed once a sync has flushed it to disk
+                self._unsynced_files.append(self._file)
+            else:
+                self._file.close()
+        self._first_seq = self._seq + 1
+        self._path = self.directory / f"{self._first_seq:020d}{SEGMENT_SUFFIX}"
+        self._file = open(self._path, "ab")
+        self._size = 0
+
+    def close(self):
+        for f in self._unsynced_files:
+            f.close()
+        self._unsynced_files = []
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self) -> dict:
+        return {
+            "appended": self.appended,
+            "last_seq": self._seq,
+            "committed_seq": self._committed,
+            "uncommitted": self._seq - self._committed,
+            "segments": len(self._closed) + (1 if self._file is not None else 0),
+            "dead_lettered": self.dead_lettered,
+            "fsync": self.fsync
+        }
+
+def _fsync_all(files):
+    """fsync the open segment and close rotated ones once they are on disk"""
+    for f in files:
+        os.fsync(f.fileno())
+    for f in files[:-1]:
+        f.close()
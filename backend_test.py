@@ -2,7 +2,8 @@
 import requests
 import sys
 import json
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlencode
 import time
 
 class GuardianFireAPITester:
@@ -104,6 +105,22 @@ class GuardianFireAPITester:
         """Test sensors CRUD operations"""
         return self.test_api_call("Get Sensors", "GET", "sensors")
 
+    def test_invalid_thresholds_rejected(self):
+        """Threshold updates need min below max and an existing sensor"""
+        success, sensors = self.test_api_call("Get Sensors For Thresholds", "GET", "sensors?limit=1")
+        if not success or not sensors:
+            return False
+        sensor_id = sensors[0]["sensor_id"]
+        inverted, _ = self.test_api_call(
+            "Inverted Thresholds Rejected", "PUT",
+            f"sensors/{sensor_id}/thresholds?min_threshold=50&max_threshold=10", 400
+        )
+        missing, _ = self.test_api_call(
+            "Thresholds For Unknown Sensor", "PUT",
+            "sensors/sensor_missing/thresholds?min_threshold=10&max_threshold=50", 404
+        )
+        return inverted and missing
+
     def test_alerts_crud(self):
         """Test alerts CRUD operations"""
         success, data = self.test_api_call("Get Alerts", "GET", "alerts")
@@ -130,6 +147,109 @@ class GuardianFireAPITester:
         """Test behavioral reports endpoint"""
         return self.test_api_call("Get Behavioral Reports", "GET", "reports")
 
+    def get_temperature_sensor(self):
+        """A temperature sensor of the demo data, or None"""
+        success, sensors = self.test_api_call("Get Sensors for Ingestion Tests", "GET", "sensors?limit=1000")
+        if not success:
+            return None
+        return next((s for s in sensors if s.get("sensor_type") == "temperature"), None)
+
+    def test_interpolated_history_buffered(self):
+        """Interpolated history reaches a reading held only in the current-value buffer"""
+        sensor = self.get_temperature_sensor()
+        if not sensor:
+            self.log_test("Interpolated History Includes Buffered Value", False, None, "No temperature sensor")
+            return False
+        sensor_id = sensor["sensor_id"]
+        # Future timestamps so both readings are newer than the seeded one;
+        # the second moves less than the deadband and stays in memory
+        base = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(minutes=10)
+        value = round((sensor["min_threshold"] + sensor["max_threshold"]) / 2, 2)
+        for offset, reading in ((0, value), (60, value + 0.01)):
+            self.test_api_call(
+                f"Record Reading +{offset}s", "POST", f"sensors/{sensor_id}/reading",
+                data={"sensor_id": sensor_id, "value": reading, "timestamp": (base + timedelta(seconds=offset)).isoformat()}
+            )
+
+        query = urlencode({
+            "start": base.isoformat(),
+            "end": (base + timedelta(seconds=120)).isoformat(),
+            "step": 10
+        })
+        success, history = self.test_api_call("Get Interpolated History", "GET", f"sensors/{sensor_id}/history?{query}")
+        if not success:
+            return False
+        last = datetime.fromisoformat(history[-1]["timestamp"].replace("Z", "+00:00")) if history else None
+        reached = last is not None and last >= base + timedelta(seconds=60)
+        self.log_test(
+            "Interpolated History Includes Buffered Value", reached, history[-3:],
+            None if reached else f"History ends at {last}, buffered reading is at +60s"
+        )
+        return reached
+
+    def test_bulk_readings_out_of_order(self):
+        """A bulk batch sent newest first still leaves the newest reading current"""
+        success, sensors = self.test_api_call("Get Sensors for Bulk Test", "GET", "sensors?limit=1000")
+        sensor = next((s for s in sensors if s.get("sensor_type") == "humidity"), None) if success else None
+        if not sensor:
+            self.log_test("Bulk Readings Out Of Order", False, None, "No humidity sensor")
+            return False
+        sensor_id = sensor["sensor_id"]
+        base = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(minutes=20)
+        normal = round((sensor["min_threshold"] + sensor["max_threshold"]) / 2, 2)
+        critical = round(sensor["max_threshold"] * 1.5, 2)
+        # Oldest normal, newest critical, sent in reverse
+        batch = [
+            {"sensor_id": sensor_id, "value": value, "timestamp": (base + timedelta(seconds=offset)).isoformat()}
+            for offset, value in ((0, normal), (30, normal), (60, critical))
+        ][::-1]
+        success, summary = self.test_api_call("Record Reversed Bulk Readings", "POST", "sensors/readings/bulk", data=batch)
+        if not success:
+            return False
+        success, sensors = self.test_api_call("Get Sensors After Bulk", "GET", "sensors?limit=1000")
+        if not success:
+            return False
+        stored = next((s for s in sensors if s["sensor_id"] == sensor_id), {})
+        in_order = [result["value"] for result in summary["results"]] == [reading["value"] for reading in batch]
+        current = stored.get("current_value") == critical and stored.get("status") == "critical"
+        passed = in_order and current
+        self.log_test(
+            "Bulk Readings Out Of Order", passed,
+            {"status": stored.get("status"), "current_value": stored.get("current_value")},
+            None if passed else f"Expected current value {critical} (critical) with results in request order"
+        )
+        return passed
+
+    def test_history_reconstructed(self):
+        """Latest history of a compressed sensor comes back at its sample spacing"""
+        success, sensors = self.test_api_call("Get Sensors for History Test", "GET", "sensors?limit=1000")
+        sensor = next((s for s in sensors if s.get("sensor_type") == "energy"), None) if success else None
+        if not sensor:
+            self.log_test("History Rebuilt At Sample Spacing", False, None, "No energy sensor")
+            return False
+        sensor_id = sensor["sensor_id"]
+        # A steady signal every 20s, which compression stores only a few points of
+        base = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(minutes=30)
+        value = round((sensor["min_threshold"] + sensor["max_threshold"]) / 2, 2)
+        batch = [
+            {"sensor_id": sensor_id, "value": value + 0.1 * (i % 2), "timestamp": (base + timedelta(seconds=20 * i)).isoformat()}
+            for i in range(12)
+        ]
+        success, _ = self.test_api_call("Record Steady Readings", "POST", "sensors/readings/bulk", data=batch)
+        if not success:
+            return False
+        success, history = self.test_api_call("Get Latest History", "GET", f"sensors/{sensor_id}/history?limit=6")
+        if not success:
+            return False
+        times = [datetime.fromisoformat(point["timestamp"].replace("Z", "+00:00")) for point in history]
+        expected = [base + timedelta(seconds=20 * i) for i in range(11, 5, -1)]
+        passed = times == expected
+        self.log_test(
+            "History Rebuilt At Sample Spacing", passed, history[:2],
+            None if passed else f"Expected 6 points 20s apart ending at {expected[0]}, got {times}"
+        )
+        return passed
+
     def test_ai_risk_analysis(self):
         """Test AI risk analysis (with fallback expected)"""
         # First get a sector ID
@@ -155,6 +275,14 @@ class GuardianFireAPITester:
         self.log_test("AI Risk Analysis", False, None, "No sectors available for testing")
         return False, {}
 
+    def test_risk_batch_too_large(self):
+        """Batch risk analysis rejects more sectors than RISK_BATCH_MAX_SECTORS"""
+        success, _ = self.test_api_call(
+            "Batch Risk Analysis Over Limit", "POST", "analyze-risk/batch", 413,
+            data={"sector_ids": [f"sector_{i}" for i in range(101)]}
+        )
+        return success
+
     def run_full_test_suite(self):
         """Run all tests in sequence"""
         print("🔥 GuardianFire AI API Testing Suite")
@@ -180,6 +308,7 @@ class GuardianFireAPITester:
         self.test_dashboard_stats()
         self.test_sectors_crud()
         self.test_sensors_crud()
+        self.test_invalid_thresholds_rejected()
         self.test_alerts_crud()
         self.test_work_orders_crud()
         
@@ -188,9 +317,16 @@ class GuardianFireAPITester:
         self.test_context_variables()
         self.test_behavioral_reports()
         
+        # Ingestion paths
+        print("\n📈 Ingestion")
+        self.test_interpolated_history_buffered()
+        self.test_bulk_readings_out_of_order()
+        self.test_history_reconstructed()
+        
         # AI Integration (may use fallback)
         print("\n🤖 AI Integration")
         self.test_ai_risk_analysis()
+        self.test_risk_batch_too_large()
         
         # Print final results
         print("\n" + "=" * 50)
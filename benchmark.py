@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""Benchmark the hot API routes in-process and compare against a baseline
+
+Runs the FastAPI app through httpx's ASGI transport, so no server or
+network is involved, against a local MongoDB (MONGO_URL from
+backend/.env) or an in-memory stand-in (mongomock-motor, pinned in
+backend/requirements.txt). The LLM and
+Resend are stubbed. The database named by --db-name is replaced with a
+synthetic plant before the run.
+
+    python benchmark.py                                   # local mongod
+    python benchmark.py --in-memory                       # no MongoDB needed
+    python benchmark.py --in-memory --save-baseline       # refresh the baseline
+    python benchmark.py --baseline other_baseline.json
+    python benchmark.py --fast-lists                      # orjson list responses
+
+Each route gets --requests requests from --concurrency concurrent
+clients. Throughput, p50/p95/p99 latency and the process CPU time per
+request are reported per route; the list_* routes fetch --list-limit
+items per page, so comparing a run with and without --fast-lists shows
+the CPU saved by skipping response model validation. The bulk readings
+route posts --bulk-size readings per request, and its readings/s are
+reported against single reading requests, where the aim is at least
+BULK_SPEEDUP_TARGET times as many. With a baseline, a
+route regresses when its p95 latency or CPU time grows or its throughput
+drops by more than --tolerance, and the run exits with 1.
+
+benchmark_baseline.json holds an --in-memory run with the default
+settings and is compared against by default when the run is in the same
+mode (--no-baseline skips it). Timings depend on the machine, so refresh
+it with --in-memory --save-baseline on the machine that runs the
+comparison, and commit it along with changes meant to move the numbers.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+DEFAULT_BASELINE = Path(__file__).parent / "benchmark_baseline.json"
+
+# Readings/s the bulk route should reach relative to single reading requests
+BULK_SPEEDUP_TARGET = 10
+
+def stub_llm_analysis(prompt: str) -> dict:
+    """Answer shaped like the LLM's, enough to exercise the alert writes"""
+    return {
+        "risk_score": 75,
+        "risk_status": "critical",
+        "primary_concern": "Temperatura acima do limite",
+        "prescribed_actions": [
+            {"action": "Reduzir a carga da linha", "priority": "urgent", "reason": "Temperatura elevada"},
+            {"action": "Agendar inspeção elétrica", "priority": "medium", "reason": "Consumo instável"}
+        ],
+        "prediction": "Risco de incêndio em 2 horas sem intervenção",
+        "confidence": 85
+    }
+
+class ApiBenchmark:
+    def __init__(self, server, args):
+        self.server = server
+        self.args = args
+        self.sensor_ids = []
+        self.sector_ids = []
+        self.results = {}
+
+    def routes(self):
+        """(name, request factory) for every benchmarked route"""
+        now = datetime.now(timezone.utc)
+        history_start = (now - timedelta(days=self.args.days)).isoformat()
+        return [
+            ("record_sensor_reading", lambda: (
+                "POST", f"/api/sensors/{random.choice(self.sensor_ids)}/reading",
+                {"json": {"sensor_id": "", "value": round(random.uniform(20, 30), 2)}}
+            )),
+            ("record_sensor_readings_bulk", lambda: (
+                "POST", "/api/sensors/readings/bulk",
+                {"json": [
+                    {"sensor_id": random.choice(self.sensor_ids), "value": round(random.uniform(20, 30), 2)}
+                    for _ in range(self.args.bulk_size)
+                ]}
+            )),
+            ("get_sensor_history", lambda: (
+                "GET", f"/api/sensors/{random.choice(self.sensor_ids)}/history",
+                {"params": {"start": history_start, "limit": 200}}
+            )),
+            ("get_dashboard_stats", lambda: ("GET", "/api/dashboard/stats", {})),
+            ("get_alerts", lambda: ("GET", "/api/alerts", {"params": {"limit": 50}})),
+            ("analyze_risk", lambda: (
+                "POST", "/api/analyze-risk", {"json": {"sector_id": random.choice(self.sector_ids)}}
+            )),
+            ("list_sensors", lambda: ("GET", "/api/sensors", {"params": {"limit": self.args.list_limit}})),
+            ("list_alerts", lambda: ("GET", "/api/alerts", {"params": {"limit": self.args.list_limit}})),
+            ("list_work_orders", lambda: ("GET", "/api/work-orders", {"params": {"limit": self.args.list_limit}}))
+        ]
+
+    async def run_route(self, client, name, make_request):
+        latencies = []
+        errors = 0
+
+        async def worker(count):
+            nonlocal errors
+            for _ in range(count):
+                method, url, kwargs = make_request()
+                started = time.perf_counter()
+                response = await client.request(method, url, **kwargs)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    errors += 1
+
+        # Warm caches and connection pools outside the measurement
+        await asyncio.gather(*[worker(1) for _ in range(self.args.warmup)])
+        latencies.clear()
+        errors = 0
+
+        concurrency = self.args.concurrency
+        counts = [self.args.requests // concurrency + (i < self.args.requests % concurrency) for i in range(concurrency)]
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        await asyncio.gather(*[worker(count) for count in counts if count])
+        cpu = time.process_time() - cpu_started
+        elapsed = time.perf_counter() - started
+
+        p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+        self.results[name] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "throughput": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+            "cpu_ms": round(cpu * 1000 / len(latencies), 2)
+        }
+
+    async def run(self):
+        server = self.server
+        print("🔥 GuardianFire API Benchmark")
+        print("=" * 50)
+
+        plant = await server.seed_synthetic_plant(server.SyntheticPlantRequest(
+            sectors=self.args.sectors,
+            sensors_per_sector=self.args.sensors_per_sector,
+            days=self.args.days,
+            interval_seconds=self.args.interval,
+            alerts_per_sector=self.args.alerts_per_sector,
+            work_orders_per_sector=self.args.work_orders_per_sector,
+            seed=self.args.seed
+        ))
+        print(
+            f"Plant: {plant['sectors']} sectors, {plant['sensors']} sensors, "
+            f"{plant['readings']} readings, {plant['alerts']} alerts, "
+            f"{plant['work_orders']} work orders ({plant['seconds']}s to seed)"
+        )
+        sensors = await server.db.sensors.find({}, {"_id": 0, "sensor_id": 1}).to_list(None)
+        sectors = await server.db.sectors.find({}, {"_id": 0, "sector_id": 1}).to_list(None)
+        self.sensor_ids = [s["sensor_id"] for s in sensors]
+        self.sector_ids = [s["sector_id"] for s in sectors]
+
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as client:
+            for name, make_request in self.routes():
+                if self.args.routes and name not in self.args.routes:
+                    continue
+                await self.run_route(client, name, make_request)
+                self.print_result(name)
+
+        speedup = self.bulk_speedup()
+        if speedup is not None:
+            print(
+                f"Bulk ingestion: {speedup}x the readings/s of single requests "
+                f"({'meets' if speedup >= BULK_SPEEDUP_TARGET else 'below'} the {BULK_SPEEDUP_TARGET}x target)"
+            )
+
+    def bulk_speedup(self):
+        """Readings/s of the bulk route over single reading requests, if both ran"""
+        single = self.results.get("record_sensor_reading")
+        bulk = self.results.get("record_sensor_readings_bulk")
+        if not single or not bulk:
+            return None
+        return round(bulk["throughput"] * self.args.bulk_size / single["throughput"], 1)
+
+    def print_result(self, name):
+        r = self.results[name]
+        print(
+            f"{name:<28} {r['throughput']:>9.1f} req/s  p50 {r['p50_ms']:>8.2f} ms  "
+            f"p95 {r['p95_ms']:>8.2f} ms  p99 {r['p99_ms']:>8.2f} ms  "
+            f"cpu {r['cpu_ms']:>7.2f} ms/req  errors {r['errors']}"
+        )
+
+    def compare(self, baseline: dict) -> list:
+        """Routes whose p95 or throughput got worse than the tolerance allows"""
+        tolerance = self.args.tolerance
+        regressions = []
+        for name, result in self.results.items():
+            base = baseline.get("results", {}).get(name)
+            if not base:
+                continue
+            if result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{name}: p95 {base['p95_ms']} -> {result['p95_ms']} ms")
+            if result["throughput"] < base["throughput"] * (1 - tolerance):
+                regressions.append(f"{name}: throughput {base['throughput']} -> {result['throughput']} req/s")
+            if "cpu_ms" in base and result["cpu_ms"] > base["cpu_ms"] * (1 + tolerance):
+                regressions.append(f"{name}: cpu {base['cpu_ms']} -> {result['cpu_ms']} ms/req")
+        return regressions
+
+def load_server(args):
+    """Import server.py against the benchmark database with external services stubbed"""
+    os.environ["DB_NAME"] = args.db_name
+    sys.path.insert(0, str(Path(__file__).parent / "backend"))
+    import server
+
+    if args.in_memory:
+        from mongomock_motor import AsyncMongoMockClient
+        server.client = AsyncMongoMockClient(tz_aware=True)
+        server.db = server.client[args.db_name]
+
+        # mongomock has no time-series collections, readings go to a plain
+        # one, and ignores partial filters, which would make the active
+        # alert dedup index reject resolved repeats
+        async def ensure_readings_collection():
+            pass
+        server.ensure_readings_collection = ensure_readings_collection
+        server.INDEXES["alerts"] = [
+            index for index in server.INDEXES["alerts"]
+            if "partialFilterExpression" not in index.document
+        ]
+
+    async def call_risk_llm(sector_id, prompt):
+        await asyncio.sleep(args.llm_latency / 1000)
+        return stub_llm_analysis(prompt)
+
+    server.call_risk_llm = call_risk_llm
+    server.FAST_LIST_RESPONSES = args.fast_lists
+    server.resend.Emails.send = lambda params: {"id": "benchmark"}
+    return server
+
+async def run(args):
+    server = load_server(args)
+    await server.startup_db_client()
+    try:
+        benchmark = ApiBenchmark(server, args)
+        await benchmark.run()
+    finally:
+        await server.shutdown_db_client()
+    return benchmark
+
+def main():
+    parser = argparse.ArgumentParser(description="GuardianFire API benchmark")
+    parser.add_argument("--in-memory", action="store_true", help="Use mongomock-motor instead of MongoDB")
+    parser.add_argument("--db-name", default="guardianfire_benchmark", help="Database replaced by the run")
+    parser.add_argument("--requests", type=int, default=500, help="Measured requests per route")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per route")
+    parser.add_argument("--routes", nargs="*", help="Only these routes")
+    parser.add_argument("--sectors", type=int, help="Sectors to seed (default 10, 2 in memory)")
+    parser.add_argument("--sensors-per-sector", type=int, default=10)
+    parser.add_argument("--days", type=float, help="History length (default 1, 0.02 in memory)")
+    parser.add_argument("--interval", type=float, default=60, help="Seconds between seeded readings")
+    parser.add_argument("--alerts-per-sector", type=int, default=100)
+    parser.add_argument("--work-orders-per-sector", type=int, default=100)
+    parser.add_argument("--bulk-size", type=int, default=100, help="Readings per bulk request")
+    parser.add_argument("--list-limit", type=int, default=1000, help="Page size of the list_* routes")
+    parser.add_argument("--fast-lists", action="store_true", help="Serve list routes through FAST_LIST_RESPONSES")
+    parser.add_argument("--llm-latency", type=float, default=0, help="Stubbed LLM call time in ms")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--baseline", type=Path,
+        help=f"Compare against this baseline (default {DEFAULT_BASELINE.name} when recorded in the same mode)"
+    )
+    parser.add_argument("--no-baseline", action="store_true", help="Skip the default baseline comparison")
+    parser.add_argument(
+        "--save-baseline", type=Path, nargs="?", const=DEFAULT_BASELINE,
+        help=f"Store the results as a baseline (default {DEFAULT_BASELINE.name})"
+    )
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown")
+    args = parser.parse_args()
+    if args.days is None:
+        # mongomock checks unique indexes by scanning, keep its history short
+        args.days = 0.02 if args.in_memory else 1
+    if args.sectors is None:
+        # mongomock also scans the whole collection on every upsert
+        args.sectors = 2 if args.in_memory else 10
+    random.seed(args.seed)
+
+    benchmark = asyncio.run(run(args))
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "mode": "in-memory" if args.in_memory else "mongodb",
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "sectors": args.sectors,
+            "sensors_per_sector": args.sensors_per_sector,
+            "days": args.days,
+            "interval": args.interval,
+            "alerts_per_sector": args.alerts_per_sector,
+            "work_orders_per_sector": args.work_orders_per_sector,
+            "list_limit": args.list_limit,
+            "bulk_size": args.bulk_size,
+            "llm_latency": args.llm_latency,
+            "fast_lists": args.fast_lists
+        },
+        "results": benchmark.results,
+        "bulk_speedup": benchmark.bulk_speedup()
+    }
+
+    with open('/tmp/benchmark_results.json', 'w') as f:
+        json.dump(report, f, indent=2)
+    print("\n📁 Detailed results saved to /tmp/benchmark_results.json")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"📌 Baseline saved to {args.save_baseline}")
+
+    exit_code = 1 if any(r["errors"] for r in benchmark.results.values()) else 0
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    elif not args.no_baseline and not args.save_baseline and DEFAULT_BASELINE.exists():
+        with open(DEFAULT_BASELINE) as f:
+            baseline = json.load(f)
+        args.baseline = DEFAULT_BASELINE
+        if baseline.get("mode") != report["mode"]:
+            print(f"\nℹ️  {DEFAULT_BASELINE.name} was recorded {baseline.get('mode')}, not comparing")
+            baseline = None
+    if baseline:
+        if baseline.get("mode") != report["mode"] or baseline.get("config") != report["config"]:
+            print("⚠️  Baseline was recorded with different settings, comparison is indicative only")
+        regressions = benchmark.compare(baseline)
+        print("\n" + "=" * 50)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for regression in regressions:
+                print(f"    {regression}")
+            exit_code = 1
+        else:
+            print(f"✅ No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -33,17 +33,13 @@ const Dashboard = ({ user }) => {
 
   const fetchData = useCallback(async () => {
     try {
-      const [statsRes, alertsRes, sensorsRes, contextRes] = await Promise.all([
-        axios.get(`${API}/dashboard/stats`, { withCredentials: true }),
-        axios.get(`${API}/alerts?status=active`, { withCredentials: true }),
-        axios.get(`${API}/sensors`, { withCredentials: true }),
-        axios.get(`${API}/context`, { withCredentials: true })
-      ]);
+      // The browser revalidates this with If-None-Match and reuses its copy on 304
+      const response = await axios.get(`${API}/dashboard/snapshot`, { withCredentials: true });
       
-      setStats(statsRes.data);
-      setAlerts(alertsRes.data);
-      setSensors(sensorsRes.data);
-      setContext(contextRes.data);
+      setStats(response.data.stats);
+      setAlerts(response.data.alerts);
+      setSensors(response.data.sensors);
+      setContext(response.data.context);
     } catch (error) {
       console.error("Error fetching data:", error);
       if (error.response?.status === 401) {
@@ -61,6 +57,26 @@ const Dashboard = ({ user }) => {
     return () => clearInterval(interval);
   }, [fetchData]);
 
+  useEffect(() => {
+    // Refresh as soon as the server pushes a change, batching bursts of events
+    const events = new EventSource(`${API}/events`, { withCredentials: true });
+    let pending = null;
+    const scheduleRefresh = () => {
+      if (!pending) {
+        pending = setTimeout(() => {
+          pending = null;
+          fetchData();
+        }, 1000);
+      }
+    };
+    ["sensor.status", "alert.created", "alert.status", "work_order.created", "work_order.status", "sector.risk"]
+      .forEach((type) => events.addEventListener(type, scheduleRefresh));
+    return () => {
+      clearTimeout(pending);
+      events.close();
+    };
+  }, [fetchData]);
+
   const handleSeedData = async () => {
     try {
       await axios.post(`${API}/seed-demo-data`, {}, { withCredentials: true });
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""Publish readings over MQTT and check the gateway ingests them all
+
+Uses the MONGO_URL / DB_NAME and MQTT_* settings from backend/.env and
+needs sensors in the database (POST /api/seed-demo-data). The readings
+it publishes are stored like any others.
+
+    python mqtt_gateway_test.py                  # broker at MQTT_HOST:MQTT_PORT
+    python mqtt_gateway_test.py --in-process     # starts an amqtt broker
+
+The requirement is tens of thousands of readings per second through an
+external broker; the default target of 10000/s has not been measured
+against Mosquitto yet, so whether the gateway meets it is unknown. amqtt
+tops out at a few hundred messages per second (230-470/s measured on a
+development machine), so --in-process only checks a floor of 200/s to
+catch regressions, not the production target.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+import aiomqtt  # noqa: E402
+
+from server import db, WriteBehindIngest, MQTT_HOST, MQTT_PORT, MQTT_TOPIC_PREFIX  # noqa: E402
+from mqtt_gateway import create_gateway  # noqa: E402
+from wal import WriteAheadLog  # noqa: E402
+
+# QoS 1 publishes awaited together by the test publisher
+PUBLISH_WINDOW = 1000
+
+async def start_broker(port: int):
+    """Start an in-process amqtt broker, for machines without Mosquitto"""
+    from amqtt.broker import Broker
+
+    broker = Broker({
+        "listeners": {"default": {"type": "tcp", "bind": f"127.0.0.1:{port}"}},
+        "auth": {"allow-anonymous": True},
+        "sys_interval": 0
+    })
+    await broker.start()
+    return broker
+
+class MqttGatewayTester:
+    def __init__(self, host, port, messages, min_rate):
+        self.host = host
+        self.port = port
+        self.messages = messages
+        self.min_rate = min_rate
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.test_results = []
+
+    def log_test(self, name, success, details="", error=None):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+
+        self.test_results.append({
+            "test_name": name,
+            "success": success,
+            "details": details,
+            "error": str(error) if error else None
+        })
+
+        status = "✅ PASS" if success else "❌ FAIL"
+        print(f"{status} - {name}")
+        if details:
+            print(f"    {details}")
+        if error:
+            print(f"    Error: {error}")
+
+    async def publish(self, sensor_ids):
+        """Publish readings round-robin over the sensors, plus one malformed message"""
+        async with aiomqtt.Client(
+            self.host,
+            self.port,
+            identifier=f"gf-test-{uuid.uuid4().hex[:8]}",
+            max_inflight_messages=PUBLISH_WINDOW
+        ) as client:
+            await client.publish(f"{MQTT_TOPIC_PREFIX}/{sensor_ids[0]}/reading", b"not a reading", qos=1)
+            # QoS 1 publishes wait for their ack, so keep a window of them in flight
+            for start in range(0, self.messages, PUBLISH_WINDOW):
+                await asyncio.gather(*[
+                    client.publish(
+                        f"{MQTT_TOPIC_PREFIX}/{sensor_ids[i % len(sensor_ids)]}/reading",
+                        json.dumps({"value": round(random.uniform(20, 30), 2)}),
+                        qos=1
+                    )
+                    for i in range(start, min(start + PUBLISH_WINDOW, self.messages))
+                ])
+
+    async def run_full_test_suite(self):
+        """Run the gateway against the broker and measure end-to-end ingestion"""
+        print("🔥 GuardianFire MQTT Gateway Tests")
+        print("=" * 50)
+
+        sensors = await db.sensors.find({}, {"_id": 0, "sensor_id": 1}).to_list(1000)
+        if not sensors:
+            self.log_test("Find sensors", False, error="No sensors, seed demo data first")
+            return 1
+        sensor_ids = [s["sensor_id"] for s in sensors]
+
+        # A fresh log, so nothing left by an earlier run is replayed into the counts
+        wal_dir = tempfile.TemporaryDirectory(prefix="gf-mqtt-wal-")
+        gateway = create_gateway(
+            WriteBehindIngest(WriteAheadLog(Path(wal_dir.name))),
+            host=self.host,
+            port=self.port,
+            client_id=f"gf-gateway-test-{uuid.uuid4().hex[:8]}"
+        )
+        await gateway.ingest.start()
+        gateway_task = asyncio.create_task(gateway.run())
+
+        try:
+            for _ in range(50):
+                if gateway.connected:
+                    break
+                await asyncio.sleep(0.1)
+            self.log_test("Gateway connects and subscribes", gateway.connected, f"{self.host}:{self.port}")
+            if not gateway.connected:
+                return 1
+
+            started = time.perf_counter()
+            await self.publish(sensor_ids)
+
+            ingest = gateway.ingest
+            batcher = ingest.batcher
+            deadline = time.monotonic() + max(30, self.messages / 1000)
+            while batcher.flushed < self.messages and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            elapsed = time.perf_counter() - started
+            committed = batcher.flushed - ingest.dead_lettered
+            rate = committed / elapsed if elapsed else 0.0
+
+            self.log_test(
+                "All readings ingested",
+                committed == self.messages,
+                f"{committed}/{self.messages} committed, {ingest.dead_lettered} dead-lettered, "
+                f"{ingest.retries} retries, {batcher.batches} batches (avg {batcher.stats()['avg_batch']})"
+            )
+            self.log_test("Malformed payload rejected", gateway.malformed == 1, f"{gateway.malformed} malformed")
+            self.log_test(
+                f"Throughput of at least {self.min_rate:.0f} readings/s",
+                rate >= self.min_rate,
+                f"{rate:.0f} readings/s end to end"
+            )
+        finally:
+            gateway_task.cancel()
+            await gateway.ingest.stop()
+            wal_dir.cleanup()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} passed")
+        return 0 if self.tests_passed == self.tests_run else 1
+
+async def run(args):
+    broker = await start_broker(args.port) if args.in_process else None
+    try:
+        tester = MqttGatewayTester(args.host, args.port, args.messages, args.min_rate)
+        return await tester.run_full_test_suite(), tester
+    finally:
+        if broker:
+            await broker.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="GuardianFire MQTT gateway tests")
+    parser.add_argument("--host", default=MQTT_HOST)
+    parser.add_argument("--port", type=int, default=MQTT_PORT)
+    parser.add_argument("--in-process", action="store_true", help="Start an amqtt broker on --port")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument(
+        "--min-rate",
+        type=float,
+        help="Readings/s to reach end to end (default 10000, 200 with --in-process)"
+    )
+    args = parser.parse_args()
+    if args.in_process:
+        args.host = "127.0.0.1"
+    if args.min_rate is None:
+        args.min_rate = 200 if args.in_process else 10000
+
+    exit_code, tester = asyncio.run(run(args))
+
+    with open('/tmp/mqtt_gateway_results.json', 'w') as f:
+        json.dump({
+            "timestamp": datetime.now().isoformat(),
+            "detailed_results": tester.test_results
+        }, f, indent=2)
+
+    print("\n📁 Detailed results saved to /tmp/mqtt_gateway_results.json")
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
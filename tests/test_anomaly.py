@@ -0,0 +1,97 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from anomaly import AnomalyDetector
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+def feed(detector, values, sensor_id="sensor", start=0):
+    """Feed one reading per second, returning the reported deviations"""
+    deviations = []
+    for i, value in enumerate(values, start):
+        deviation = detector.update(sensor_id, value, START + timedelta(seconds=i))
+        if deviation:
+            deviations.append((i, deviation))
+    return deviations
+
+def noise(count, seed=1, mean=10.0, std=0.1):
+    rng = random.Random(seed)
+    return [rng.gauss(mean, std) for _ in range(count)]
+
+def test_defaults_match_documented_sensitivity():
+    import server
+    detector = AnomalyDetector()
+    assert (detector.alpha, detector.z_threshold, detector.cusum_k, detector.cusum_h) == (0.05, 4.0, 0.5, 8.0)
+    assert (detector.warmup, detector.cooldown) == (30, 300.0)
+    assert (server.ANOMALY_ALPHA, server.ANOMALY_Z_THRESHOLD, server.ANOMALY_CUSUM_K, server.ANOMALY_CUSUM_H,
+            server.ANOMALY_WARMUP, server.ANOMALY_COOLDOWN) == (0.05, 4.0, 0.5, 8.0, 30, 300.0)
+
+def test_steady_noise_false_positive_rate():
+    # The EWMA variance makes z heavier tailed than a normal, gaussian
+    # noise reports roughly one spike per 3000 readings with the defaults
+    detector = AnomalyDetector()
+    deviations = feed(detector, noise(20000))
+    assert len(deviations) <= 10
+    assert all(deviation["kind"] == "spike" for _, deviation in deviations)
+
+def test_no_drift_reported_when_warmup_ends():
+    detector = AnomalyDetector()
+    assert feed(detector, noise(200)) == []
+
+def test_nothing_reported_during_warmup():
+    detector = AnomalyDetector()
+    values = noise(29)
+    values[20] = 50.0
+    assert feed(detector, values) == []
+    assert not detector.state("sensor")["warmed_up"]
+
+def test_spike_after_warmup():
+    detector = AnomalyDetector()
+    values = noise(100) + [12.0]
+    deviations = feed(detector, values)
+    assert [i for i, _ in deviations] == [100]
+    deviation = deviations[0][1]
+    assert deviation["kind"] == "spike"
+    assert deviation["z_score"] > detector.z_threshold
+    assert deviation["probability"] > 99.9
+
+def test_slow_drift_caught_by_cusum_not_zscore():
+    detector = AnomalyDetector()
+    ramp = [value + 0.01 * i for i, value in enumerate(noise(200, seed=2))]
+    deviations = feed(detector, noise(100) + ramp)
+    assert deviations
+    first = deviations[0][1]
+    assert first["kind"] == "drift_up"
+    assert abs(first["z_score"]) <= detector.z_threshold
+
+def test_drift_down():
+    detector = AnomalyDetector()
+    ramp = [value - 0.01 * i for i, value in enumerate(noise(200, seed=2))]
+    deviations = feed(detector, noise(100) + ramp)
+    assert deviations[0][1]["kind"] == "drift_down"
+
+@pytest.mark.parametrize("gap, reported", [(60, False), (299, False), (300, True), (600, True)])
+def test_cooldown_suppresses_repeats(gap, reported):
+    detector = AnomalyDetector()
+    feed(detector, noise(100))
+    assert detector.update("sensor", 12.0, START + timedelta(seconds=100))
+    feed(detector, noise(gap - 1, seed=3), start=101)
+    second = detector.update("sensor", 12.0, START + timedelta(seconds=100 + gap))
+    assert bool(second) is reported
+    assert detector.stats()["deviations"] == (2 if reported else 1)
+
+def test_sensors_scored_independently():
+    detector = AnomalyDetector()
+    feed(detector, noise(100), sensor_id="a")
+    feed(detector, noise(100, mean=500.0, std=5.0), sensor_id="b")
+    assert detector.update("a", 12.0, START + timedelta(seconds=100))["kind"] == "spike"
+    assert detector.update("b", 505.0, START + timedelta(seconds=100)) is None
+
+def test_clear_restarts_warmup():
+    detector = AnomalyDetector()
+    feed(detector, noise(100))
+    detector.clear()
+    assert detector.state("sensor") is None
+    assert feed(detector, noise(29) + [12.0]) == []
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from batching import AsyncBatcher
+
+def test_batches_in_order():
+    flushed = []
+
+    async def flush(batch):
+        flushed.append(list(batch))
+
+    async def main():
+        batcher = AsyncBatcher(flush, batch_size=3, linger=0.01)
+        batcher.start()
+        for i in range(7):
+            await batcher.put(i)
+        await batcher.stop()
+
+    asyncio.run(main())
+    assert [item for batch in flushed for item in batch] == list(range(7))
+    assert all(len(batch) <= 3 for batch in flushed)
+
+def test_failed_flush_stops_the_writer():
+    flushed = []
+
+    async def flush(batch):
+        if 3 in batch:
+            raise OSError("No space left on device")
+        flushed.extend(batch)
+
+    async def main():
+        batcher = AsyncBatcher(flush, batch_size=2, linger=0.01, max_pending=2)
+        batcher.start()
+        for i in range(4):
+            await batcher.put(i)
+        # Later items are refused rather than flushed past the failed batch
+        with pytest.raises(RuntimeError):
+            for i in range(4, 20):
+                await batcher.put(i)
+        with pytest.raises(OSError):
+            await batcher.stop()
+        return batcher
+
+    batcher = asyncio.run(main())
+    assert flushed == [0, 1]
+    assert isinstance(batcher.error, OSError)
+    assert batcher.stats()["failed"] == 2
+
+def test_blocked_producer_released_when_writer_fails():
+    async def main():
+        gate = asyncio.Event()
+
+        async def flush(batch):
+            await gate.wait()
+            raise OSError("No space left on device")
+
+        batcher = AsyncBatcher(flush, batch_size=1, linger=0, max_pending=1)
+        batcher.start()
+        await batcher.put(0)
+        await asyncio.sleep(0)
+        await batcher.put(1)
+        # Queue full, so this waits on the writer
+        blocked = asyncio.create_task(batcher.put(2))
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+        gate.set()
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(blocked, 1)
+        with pytest.raises(OSError):
+            await batcher.stop()
+
+    asyncio.run(main())
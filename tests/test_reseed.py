@@ -0,0 +1,34 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+@pytest.fixture
+def server(monkeypatch):
+    import server
+    monkeypatch.setattr(server, "db", AsyncMongoMockClient(tz_aware=True)["test"])
+    server.sensor_meta_cache.clear()
+    return server
+
+def test_seed_demo_data_forgets_previous_plant(server):
+    asyncio.run(server.seed_demo_data())
+    sensor = asyncio.run(server.db.sensors.find_one({}, {"_id": 0}))
+    readings = [
+        server.SensorReading(sensor_id=sensor["sensor_id"], value=sensor["current_value"] or 1.0)
+        for _ in range(3)
+    ]
+    asyncio.run(server.ingest_readings(readings))
+    server.risk_analysis_cache.set("sector", {"risk_score": 50})
+    server.rule_engine._last_fired[("rule", sensor["sensor_id"])] = datetime.now(timezone.utc)
+    assert server.anomaly_detector.stats()["sensors"] > 0
+    assert server.current_values.get(sensor["sensor_id"]) is not None
+
+    asyncio.run(server.seed_demo_data())
+
+    assert server.anomaly_detector.stats()["sensors"] == 0
+    assert server.history_compressor.stats()["sensors"] == 0
+    assert server.current_values.get(sensor["sensor_id"]) is None
+    assert server.risk_analysis_cache.get("sector") is None
+    assert server.rule_engine._last_fired == {}
+    assert server.sensor_meta_cache.get(sensor["sensor_id"]) is None
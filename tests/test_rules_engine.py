@@ -0,0 +1,122 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from rules_engine import RuleEngine, CompiledRule, OPERATORS
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+def reading_rule(rule_id, *conditions, **extra):
+    return {
+        "rule_id": rule_id,
+        "event": "reading",
+        "conditions": [{"field": f, "op": op, "value": v} for f, op, v in conditions],
+        **extra
+    }
+
+def fired_ids(engine, data, timestamp=NOW, event="reading"):
+    return sorted(rule["rule_id"] for rule in engine.evaluate(event, data, timestamp))
+
+@pytest.mark.parametrize("op,bound,value,fires", [
+    (">", 50, 50, False),
+    (">", 50, 50.001, True),
+    (">=", 50, 50, True),
+    (">=", 50, 49.999, False),
+    ("<", 50, 50, False),
+    ("<", 50, 49.999, True),
+    ("<=", 50, 50, True),
+    ("<=", 50, 50.001, False),
+])
+def test_single_bound_edges(op, bound, value, fires):
+    engine = RuleEngine()
+    engine.load([reading_rule("r", ("value", op, bound))])
+    assert fired_ids(engine, {"value": value, "sensor_id": "s"}) == (["r"] if fires else [])
+
+@pytest.mark.parametrize("value,fires", [
+    (10, True), (9.999, False), (20, False), (19.999, True), (15, True)
+])
+def test_two_sided_bounds_edges(value, fires):
+    engine = RuleEngine()
+    engine.load([reading_rule("r", ("value", ">=", 10), ("value", "<", 20))])
+    assert fired_ids(engine, {"value": value, "sensor_id": "s"}) == (["r"] if fires else [])
+
+def test_two_sided_rule_indexed_by_both_bounds():
+    rule = CompiledRule(reading_rule("r", ("value", ">", 1), ("value", "<=", 2)))
+    assert rule.lower == (1.0, False)
+    assert rule.upper == (2.0, True)
+    assert rule.predicates == []
+
+def test_matches_brute_force():
+    """Indexed candidates fire exactly the rules a plain scan would"""
+    rng = random.Random(7)
+    ops = [">", ">=", "<", "<="]
+    rules = []
+    for i in range(300):
+        conditions = [("value", rng.choice(ops), rng.randint(0, 20)) for _ in range(rng.randint(1, 2))]
+        rules.append(reading_rule(f"r{i}", *conditions))
+    engine = RuleEngine()
+    engine.load(rules)
+
+    for value in [v / 2 for v in range(-2, 44)]:
+        expected = sorted(
+            rule["rule_id"] for rule in rules
+            if all(OPERATORS[c["op"]](value, c["value"]) for c in rule["conditions"])
+        )
+        assert fired_ids(engine, {"value": value, "sensor_id": f"s{value}"}) == expected
+
+@pytest.mark.parametrize("op,shift,fires", [
+    ("in", "turno_noite", True),
+    ("in", "turno_dia", False),
+    ("not_in", "turno_noite", False),
+    ("not_in", "turno_dia", True),
+])
+def test_membership_operators(op, shift, fires):
+    engine = RuleEngine()
+    engine.load([reading_rule("r", ("shift", op, ["turno_noite", "turno_tarde"]))])
+    assert fired_ids(engine, {"value": 1, "shift": shift, "sensor_id": "s"}) == (["r"] if fires else [])
+
+def test_membership_needs_list():
+    engine = RuleEngine()
+    engine.load([reading_rule("r", ("shift", "in", "turno_noite"))])
+    assert engine.rules == 0
+    assert "r" in engine.errors
+
+def test_missing_field_does_not_fire():
+    engine = RuleEngine()
+    engine.load([reading_rule("r", ("shift", "not_in", ["turno_noite"]))])
+    assert fired_ids(engine, {"value": 1, "sensor_id": "s"}) == []
+
+def test_cooldown_per_subject():
+    engine = RuleEngine()
+    engine.load([reading_rule("r", ("value", ">", 50), cooldown_seconds=60)])
+
+    assert fired_ids(engine, {"value": 60, "sensor_id": "a"}) == ["r"]
+    # Held back for the same sensor, not for another one
+    assert fired_ids(engine, {"value": 60, "sensor_id": "a"}, NOW + timedelta(seconds=59)) == []
+    assert fired_ids(engine, {"value": 60, "sensor_id": "b"}, NOW + timedelta(seconds=59)) == ["r"]
+    assert fired_ids(engine, {"value": 60, "sensor_id": "a"}, NOW + timedelta(seconds=60)) == ["r"]
+
+def test_cooldown_survives_reload_of_same_rule():
+    engine = RuleEngine()
+    rule = reading_rule("r", ("value", ">", 50), cooldown_seconds=60)
+    engine.load([rule])
+    assert fired_ids(engine, {"value": 60, "sensor_id": "a"}) == ["r"]
+    engine.load([rule])
+    assert fired_ids(engine, {"value": 60, "sensor_id": "a"}, NOW + timedelta(seconds=1)) == []
+    # Dropped with the rule
+    engine.load([])
+    engine.load([rule])
+    assert fired_ids(engine, {"value": 60, "sensor_id": "a"}, NOW + timedelta(seconds=2)) == ["r"]
+
+def test_scoped_rules():
+    engine = RuleEngine()
+    engine.load([
+        reading_rule("any", ("value", ">", 0)),
+        reading_rule("sector", ("value", ">", 0), sector_id="A"),
+        reading_rule("type", ("value", ">", 0), sector_id="A", sensor_type="temperature"),
+    ])
+    data = {"value": 1, "sector_id": "A", "sensor_type": "temperature", "sensor_id": "s"}
+    assert fired_ids(engine, data) == ["any", "sector", "type"]
+    data = {"value": 1, "sector_id": "B", "sensor_type": "temperature", "sensor_id": "t"}
+    assert fired_ids(engine, data) == ["any"]
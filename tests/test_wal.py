@@ -0,0 +1,72 @@
+import json
+
+from wal import WriteAheadLog, CHECKPOINT_FILE, SEGMENT_SUFFIX
+
+def append_all(wal, count):
+    return [wal.append({"n": i}) for i in range(count)]
+
+def test_replay_skips_torn_last_line(tmp_path):
+    wal = WriteAheadLog(tmp_path)
+    wal.replay()
+    append_all(wal, 3)
+    wal.close()
+    segment = next(tmp_path.glob(f"*{SEGMENT_SUFFIX}"))
+    with open(segment, "ab") as f:
+        f.write(b'{"seq": 4, "rec')
+
+    wal = WriteAheadLog(tmp_path)
+    records = wal.replay()
+    assert [seq for seq, _ in records] == [1, 2, 3]
+    # Numbering carries on after the last complete record
+    assert wal.append({"n": 3}) == 4
+
+def test_replay_skips_committed_records(tmp_path):
+    wal = WriteAheadLog(tmp_path)
+    wal.replay()
+    append_all(wal, 5)
+    wal.commit(2)
+    wal.close()
+
+    wal = WriteAheadLog(tmp_path)
+    assert [seq for seq, _ in wal.replay()] == [3, 4, 5]
+    assert wal.append({}) == 6
+
+def test_checkpoint_stays_before_uncommitted_group(tmp_path):
+    wal = WriteAheadLog(tmp_path)
+    wal.replay()
+    append_all(wal, 6)
+    wal.commit(3)
+    # Crash while committing 4..6, with its history step done
+    wal.progress(4, 6, {"history"})
+    wal.close()
+
+    checkpoint = json.loads((tmp_path / CHECKPOINT_FILE).read_text())
+    assert checkpoint == {"committed": 3, "batch": {"first": 4, "last": 6, "done": ["history"]}}
+
+    wal = WriteAheadLog(tmp_path)
+    records = wal.replay()
+    assert [seq for seq, _ in records] == [4, 5, 6]
+    assert wal.pending_batch == {"first": 4, "last": 6, "done": ["history"]}
+    # Replay rewrites the checkpoint without moving it
+    assert json.loads((tmp_path / CHECKPOINT_FILE).read_text())["committed"] == 3
+    assert wal.stats()["committed_seq"] == 3
+
+def test_finished_group_is_not_pending(tmp_path):
+    wal = WriteAheadLog(tmp_path)
+    wal.replay()
+    append_all(wal, 3)
+    wal.progress(1, 3, {"history", "rollups", "sensors", "alerts"})
+    wal.commit(3)
+    wal.close()
+
+    wal = WriteAheadLog(tmp_path)
+    assert wal.replay() == []
+    assert wal.pending_batch is None
+
+def test_committed_segments_are_deleted(tmp_path):
+    wal = WriteAheadLog(tmp_path, segment_bytes=64)
+    wal.replay()
+    append_all(wal, 10)
+    assert len(list(tmp_path.glob(f"*{SEGMENT_SUFFIX}"))) > 1
+    wal.commit(10)
+    assert list(tmp_path.glob(f"*{SEGMENT_SUFFIX}")) == []
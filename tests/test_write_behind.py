@@ -0,0 +1,109 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from wal import WriteAheadLog, CHECKPOINT_FILE
+
+@pytest.fixture
+def server(monkeypatch):
+    import server
+    monkeypatch.setattr(server, "db", AsyncMongoMockClient(tz_aware=True)["test"])
+    server.sensor_meta_cache.clear()
+    return server
+
+def add_sensor(server) -> str:
+    sensor_id = f"sensor_{uuid.uuid4().hex[:8]}"
+    asyncio.run(server.db.sensors.insert_one({
+        "sensor_id": sensor_id,
+        "sector_id": "sector_test",
+        "name": "Sensor de teste",
+        "sensor_type": "pressure",
+        "unit": "bar",
+        "min_threshold": 1,
+        "max_threshold": 10,
+        "status": "normal"
+    }))
+    return sensor_id
+
+def log_readings(server, wal, sensor_id, count):
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return [
+        wal.append(server.SensorReading(
+            sensor_id=sensor_id, value=5 + i * 0.1, timestamp=start + timedelta(seconds=i)
+        ).model_dump(mode="json"))
+        for i in range(count)
+    ]
+
+def test_resume_skips_done_steps(server, tmp_path):
+    sensor_id = add_sensor(server)
+    wal = WriteAheadLog(tmp_path)
+    wal.replay()
+    seqs = log_readings(server, wal, sensor_id, 3)
+    # The previous run wrote history and rollups for the group, then crashed
+    wal.progress(seqs[0], seqs[-1], {"history", "rollups"})
+    wal.close()
+
+    async def main():
+        ingest = server.WriteBehindIngest(WriteAheadLog(tmp_path))
+        await ingest.start()
+        await ingest.stop()
+
+    asyncio.run(main())
+
+    async def counts():
+        return (
+            await server.db.sensor_readings.count_documents({"sensor_id": sensor_id}),
+            await server.db.sensor_rollups.count_documents({"sensor_id": sensor_id}),
+            await server.db.sensors.find_one({"sensor_id": sensor_id})
+        )
+
+    readings, rollups, sensor = asyncio.run(counts())
+    assert (readings, rollups) == (0, 0)
+    # The steps left over did run
+    assert sensor["current_value"] == pytest.approx(5.2)
+    assert json.loads((tmp_path / CHECKPOINT_FILE).read_text()) == {"committed": seqs[-1]}
+
+def test_failed_commit_keeps_checkpoint(server, tmp_path, monkeypatch):
+    sensor_id = add_sensor(server)
+    monkeypatch.setattr(server, "WRITE_BEHIND_MAX_ATTEMPTS", 1)
+    monkeypatch.setattr(server, "INGEST_LINGER", 0.01)
+
+    write_ingest = server.write_ingest
+    calls = []
+
+    async def first_rejected(plan, on_step=None):
+        # Only the first group is rejected, later ones would go through
+        calls.append(plan)
+        if len(calls) == 1:
+            raise server.PyMongoError("Document failed validation")
+        await write_ingest(plan, on_step)
+
+    def disk_full(records, error):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(server, "write_ingest", first_rejected)
+
+    async def main():
+        wal = WriteAheadLog(tmp_path)
+        monkeypatch.setattr(wal, "dead_letter", disk_full)
+        ingest = server.WriteBehindIngest(wal)
+        await ingest.start()
+        reading = server.SensorReading(sensor_id=sensor_id, value=5)
+        await ingest.put(reading)
+        # Ingestion stops once the failed group cannot be set aside
+        with pytest.raises(RuntimeError):
+            for _ in range(100):
+                await ingest.put(reading)
+                await asyncio.sleep(0.01)
+        await ingest.stop()
+
+    asyncio.run(main())
+    assert len(calls) == 1
+    assert json.loads((tmp_path / CHECKPOINT_FILE).read_text()).get("committed", 0) == 0
+    # Everything logged is replayed on the next start
+    wal = WriteAheadLog(tmp_path)
+    assert len(wal.replay()) >= 1